@@ -0,0 +1,7 @@
+# -*- coding:utf-8 -*-
+
+import os
+import sys
+
+# translation/ のモジュールは同じフォルダのモジュールを直接 import するので、パスに加えておく
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'translation'))
@@ -0,0 +1,51 @@
+# -*- coding:utf-8 -*-
+
+import random
+import threading
+import time
+
+from async_dispatcher import dispatch_translations
+
+
+class StubProvider:
+    """
+    少し待ってから訳を返し、同時に何件処理しているかの最大値を記録するスタブ
+    """
+
+    def __init__(self, suffix):
+        self.suffix = suffix
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text, count):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # 終わる順番をばらばらにする
+        time.sleep(random.uniform(0, 0.01))
+        with self._lock:
+            self.in_flight -= 1
+        return f"{text}{self.suffix}"
+
+
+def test_results_keep_input_order_and_respect_concurrency():
+    gpt, deepl = StubProvider("_GPT"), StubProvider("_Deepl")
+    jobs = [("gpt" if i % 3 else "deepl", f"text {i}") for i in range(60)]
+
+    finished = []
+    results = dispatch_translations(jobs, {"gpt": gpt, "deepl": deepl}, {"gpt": 4, "deepl": 2},
+                                    on_result=lambda index, result: finished.append(index))
+
+    assert results == [text + ("_GPT" if provider == "gpt" else "_Deepl") for provider, text in jobs]
+    assert sorted(finished) == list(range(len(jobs)))
+    assert 1 <= gpt.max_in_flight <= 4
+    assert 1 <= deepl.max_in_flight <= 2
+
+
+def test_unused_providers_and_empty_jobs():
+    gpt = StubProvider("_GPT")
+    # 使わないプロバイダーのハンドラーは無くてもよい
+    assert dispatch_translations([("gpt", "a"), ("gpt", "b")], {"gpt": gpt}, {"gpt": 1}) == ["a_GPT", "b_GPT"]
+    assert gpt.max_in_flight == 1
+    assert dispatch_translations([], {}) == []
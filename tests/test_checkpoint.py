@@ -0,0 +1,28 @@
+# -*- coding:utf-8 -*-
+
+from checkpoint import TranslationJournal
+
+
+def test_resume_skips_recorded_keys_and_changed_sources(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with TranslationJournal(path) as journal:
+        journal.record("a", "Hello", "こんにちは")
+        journal.record("b", "World", "世界")
+
+    # 途中で落ちて書きかけの行が残った
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('{"k": "c", "s": ')
+
+    with TranslationJournal(path, resume=True) as journal:
+        # b は原文が変わったので使わない。書きかけの c の行は読み飛ばす
+        assert journal.load({"a": "Hello", "b": "World!", "c": "Again"}) == {"a": "こんにちは"}
+        journal.record("c", "Again", "もう一度")
+        assert journal.load({"a": "Hello", "c": "Again"}) == {"a": "こんにちは", "c": "もう一度"}
+
+
+def test_without_resume_the_journal_starts_over(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with TranslationJournal(path) as journal:
+        journal.record("a", "Hello", "こんにちは")
+    with TranslationJournal(path) as journal:
+        assert journal.load() == {}
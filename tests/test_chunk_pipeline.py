@@ -0,0 +1,31 @@
+# -*- coding:utf-8 -*-
+
+from chunk_pipeline import prepare_jobs, shard_records
+from masking import MaskingEngine, DEFAULT_PATTERNS
+
+
+def test_prepared_jobs_restore_with_the_output_engine():
+    records = [
+        ("a", "Fly to Port Olisar\\nthen ~mission(Location)"),
+        ("b", "Plain text"),
+        ("c", "Hurston Dynamics; hiring"),
+        ("skip_me", "Skipped"),
+    ]
+    jobs, invalid = prepare_jobs(records, ["skip_"], set(), workers=1,
+                                 glossary_terms={"Port Olisar": "", "Hurston Dynamics": ""})
+
+    # 翻訳結果を戻す Gpt_Translator と同じ設定のエンジンで、そのまま元の文に戻る
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    values = dict(records)
+    assert invalid == []
+    assert [key for key, _, _, _ in jobs] == ["a", "b", "c"]
+    for key, masked, placeholders, _ in jobs:
+        assert engine.restore(masked, placeholders) == values[key]
+    assert "Port Olisar" not in jobs[0][1]
+
+
+def test_shard_records_keeps_order():
+    records = [(str(i), str(i)) for i in range(10)]
+    chunks = shard_records(records, 3)
+    assert [len(chunk) for chunk in chunks] == [4, 3, 3]
+    assert [record for chunk in chunks for record in chunk] == records
@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+
+import functools
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+import version_store
+
+TRANSLATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'translation')
+
+
+def test_help_does_not_import_the_translators():
+    # --help は翻訳スクリプトも SDK も読み込まずに返る
+    code = (
+        "import sys, cli\n"
+        "for argv in (['--help'], ['translate', '--help'], ['validate', '--help']):\n"
+        "    try:\n"
+        "        cli.main(argv)\n"
+        "    except SystemExit:\n"
+        "        pass\n"
+        "loaded = {'openai', 'deepl', 'dotenv', 'Gpt_Translator', 'Gpt_Translator_CSV', 'Gpt_Translator_bat'}\n"
+        "print(sorted(loaded & set(sys.modules)))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=TRANSLATION_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.mark.parametrize("engine", ["csv", "batch"])
+def test_main_only_options_are_rejected_for_other_engines(engine, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        cli.main(["translate", "v3.16.1", "--engine", engine, "--output", "out.ini", "--languages", "ja", "ko"])
+    assert excinfo.value.code == 2
+    assert "--output, --languages" in capsys.readouterr().err
+
+
+def test_validate_exit_codes(tmp_path):
+    source = tmp_path / "global_en.ini.txt"
+    source.write_text("a=Go to ~mission(Location)\nb=Hello\n", encoding="utf-8")
+    good = tmp_path / "good.ini"
+    good.write_text("a=~mission(Location) へ行く\nb=こんにちは\n", encoding="utf-8")
+    bad = tmp_path / "bad.ini"
+    bad.write_text("a=どこかへ行く\nb=こんにちは\n", encoding="utf-8")
+    failed = tmp_path / "failed_keys.txt"
+
+    assert cli.main(["validate", str(source), str(good), "--workers", "1"]) == 0
+    assert cli.main(["validate", str(source), str(bad), "--workers", "1", "--failed-keys", str(failed)]) == 1
+    assert failed.read_text(encoding="utf-8").split() == ["a"]
+
+
+def test_diff_exit_codes(tmp_path, monkeypatch, capsys):
+    # リポジトリの cache にストアを書かないようにする
+    monkeypatch.setattr(version_store, "load_or_build_store",
+                        functools.partial(version_store.load_or_build_store, cache_dir=str(tmp_path / "cache")))
+    old, new = tmp_path / "old", tmp_path / "new"
+    old.mkdir()
+    new.mkdir()
+    (old / "global_en.ini.txt").write_text("a=Hello\nb=Old\n", encoding="utf-8")
+    (new / "global_en.ini.txt").write_text("a=Hello\nb=New\nc=Added\n", encoding="utf-8")
+
+    assert cli.main(["diff", str(new), str(old), "--list"]) == 0
+    output = capsys.readouterr().out
+    assert "added\tc" in output and "changed\tb" in output
+    # 英語原文が無い version とは比べられない
+    assert cli.main(["diff", str(new), str(tmp_path / "missing")]) == 1
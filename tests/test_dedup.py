@@ -0,0 +1,19 @@
+# -*- coding:utf-8 -*-
+
+from dedup import fan_out, group_by_source
+
+
+def test_duplicates_are_translated_once_and_fanned_out():
+    jobs = [("Hello", True), ("World", False), ("Hello", True), ("Hello", False), ("World", False)]
+    unique_jobs, groups = group_by_source(jobs)
+    # 同じ文でも use_gpt が違えば別のジョブ
+    assert unique_jobs == [("Hello", True), ("World", False), ("Hello", False)]
+    assert groups == [[0, 2], [1, 4], [3]]
+
+    results = fan_out(["こんにちは", "世界", "やあ"], groups, len(jobs))
+    assert results == ["こんにちは", "世界", "こんにちは", "やあ", "世界"]
+
+
+def test_empty_jobs():
+    assert group_by_source([]) == ([], [])
+    assert fan_out([], [], 0) == []
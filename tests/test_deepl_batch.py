@@ -0,0 +1,13 @@
+# -*- coding:utf-8 -*-
+
+from deepl_batch import DEEPL_REQUEST_OVERHEAD, pack_deepl_batches, request_size
+
+
+def test_pack_deepl_batches_splits_on_count_and_bytes():
+    texts = [f"text {i}" for i in range(7)]
+    assert pack_deepl_batches(texts, max_texts=3) == [[0, 1, 2], [3, 4, 5], [6]]
+
+    big = "é" * 100
+    max_bytes = DEEPL_REQUEST_OVERHEAD + 2 * request_size(big)
+    batches = pack_deepl_batches([big] * 5, max_bytes=max_bytes)
+    assert batches == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,34 @@
+# -*- coding:utf-8 -*-
+
+from fuzzy_tm import FuzzyIndex, plan_fuzzy, transfer_numbers
+
+
+def test_transfer_numbers():
+    assert transfer_numbers("Deliver 3 boxes", "Deliver 5 boxes", "箱を 3 個届ける") == "箱を 5 個届ける"
+    # 訳の中の数字が原文と対応しなければ差し替えない
+    assert transfer_numbers("Deliver 3 boxes", "Deliver 5 boxes", "箱を三個届ける") is None
+    assert transfer_numbers("Deliver 3 boxes", "Collect 5 boxes", "箱を 3 個届ける") is None
+
+
+def test_plan_fuzzy_reuses_exact_and_number_changes_and_edits_near_matches():
+    index = FuzzyIndex([
+        ("Deliver 3 boxes to Port Olisar", "ポート・オリサーに箱を 3 個届ける"),
+        ("Scan the wreckage near the asteroid field", "小惑星帯の近くの残骸をスキャンする"),
+        ("Hello", "こんにちは"),
+    ])
+    values = {
+        "exact": "Hello",
+        "number": "Deliver 12 boxes to Port Olisar",
+        "edit": "Scan the wreckage near the asteroid belt",
+        "new": "Completely unrelated sentence here",
+    }
+    reused, edits = plan_fuzzy(values, index)
+    assert reused == {"exact": "こんにちは", "number": "ポート・オリサーに箱を 12 個届ける"}
+    assert list(edits) == ["edit"]
+    source, translation, score = edits["edit"]
+    assert source == "Scan the wreckage near the asteroid field"
+    assert translation == "小惑星帯の近くの残骸をスキャンする"
+    assert 0.85 <= score < 1.0
+
+    # edit_keys に含まれない key は直してもらわない
+    assert plan_fuzzy(values, index, edit_keys=set())[1] == {}
@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+
+import re
+
+from chunk_pipeline import prepare_jobs
+from glossary import Glossary, mine_terms, read_glossary_file
+from masking import MaskingEngine, DEFAULT_PATTERNS
+
+TERMS = {"Port Olisar": "ポート・オリサー", "Hurston Dynamics": "", "Hurston": ""}
+
+
+def fake_japanese_provider(text):
+    # 日本語の訳のように、プレースホルダーの前後の空白を詰めて返す
+    text = text.replace("Fly to", "に飛ぶ").replace("Land at", "に着陸する")
+    return re.sub(r"\s*(#\d+)\s*", r"\1", text).strip()
+
+
+def test_term_restored_when_provider_strips_spaces():
+    glossary = Glossary(TERMS)
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    jobs, invalid = prepare_jobs([("k", "Fly to Port Olisar")], [], set(), workers=1, glossary_terms=glossary.terms)
+    assert invalid == []
+    (_, masked, placeholders, use_gpt), = jobs
+    assert not use_gpt
+    assert "Port Olisar" not in masked
+
+    translated = fake_japanese_provider(masked)
+    assert " #0 " not in translated
+
+    assert engine.restore(translated, glossary.force(placeholders)) == "に飛ぶポート・オリサー"
+    # 決まった訳を使わない言語では英語のまま戻る
+    assert engine.restore(translated, placeholders) == "に飛ぶPort Olisar"
+
+
+def test_restore_ignores_unknown_indices():
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    assert engine.restore("#0に着陸する #7", [(" #0 ", "Hurston")]) == "Hurstonに着陸する #7"
+
+
+def test_find_prefers_longest_match_on_word_boundaries():
+    glossary = Glossary(TERMS)
+    text = "Hurston Dynamics owns Hurstonia and Hurston."
+    spans = [text[start:end] for start, end in glossary.find(text)]
+    assert spans == ["Hurston Dynamics", "Hurston"]
+
+
+def test_mask_appends_placeholders_after_existing_ones():
+    glossary = Glossary(TERMS)
+    placeholders = [(" #0 ", "%ls")]
+    masked = glossary.mask("Pay  #0  at Port Olisar", placeholders)
+    assert masked == "Pay  #0  at  #1 "
+    assert placeholders[1] == (" #1 ", "Port Olisar")
+    assert glossary.force(placeholders) == [(" #0 ", "%ls"), (" #1 ", "ポート・オリサー")]
+
+
+def test_term_only():
+    glossary = Glossary(TERMS)
+    placeholders = []
+    masked = glossary.mask("Hurston Dynamics", placeholders)
+    assert glossary.term_only(masked, placeholders)
+    assert not glossary.term_only(glossary.mask("Visit Hurston", []), [(" #0 ", "Hurston")])
+
+
+def test_mine_terms_uses_reference_translation():
+    sources = {
+        "Stanton2_Orison": "Orison",
+        "vehicle_NameAEGS_Avenger_Titan": "Aegis Avenger Titan",
+        "vehicle_NameWIP": "Something WIP",
+        "mission_text": "Go To Orison Now",
+    }
+    reference = {"vehicle_NameAEGS_Avenger_Titan": "イージス アベンジャー タイタン", "Stanton2_Orison": "Orison"}
+    assert mine_terms(sources, reference) == {"Orison": "", "Aegis Avenger Titan": "イージス アベンジャー タイタン"}
+
+
+def test_read_glossary_file(tmp_path):
+    path = tmp_path / "glossary.tsv"
+    path.write_text("# comment\nUEE Navy\tUEE海軍\nLanding Services\t\n\n", encoding="utf-8")
+    assert read_glossary_file(str(path)) == {"UEE Navy": "UEE海軍", "Landing Services": ""}
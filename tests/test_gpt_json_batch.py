@@ -0,0 +1,43 @@
+# -*- coding:utf-8 -*-
+
+import json
+
+from gpt_json_batch import build_batch_messages, parse_batch_reply, translate_batch_json
+
+
+def reply_with(items):
+    return lambda messages: json.dumps({"items": items}, ensure_ascii=False)
+
+
+def test_parse_batch_reply_drops_duplicates_and_reads_code_blocks():
+    reply = '```json\n{"items": [{"id": 0, "text": "a"}, {"id": "1", "text": "b"}, {"id": 0, "text": "c"}]}\n```'
+    assert parse_batch_reply(reply) == {1: "b"}
+    assert parse_batch_reply("not json") == {}
+
+
+def test_build_batch_messages_uses_list_indexes():
+    messages = build_batch_messages(["x", "y"], "prompt")
+    assert json.loads(messages[1]["content"]) == {"items": [{"id": 0, "text": "x"}, {"id": 1, "text": "y"}]}
+
+
+def test_invalid_batch_items_are_retried_one_by_one():
+    texts = ["Go to PLACEHOLDER_0", "Hello", "Bye"]
+    request = reply_with([{"id": 0, "text": "PLACEHOLDER_0 に行く"}, {"id": 1, "text": ""}])
+    retried = []
+
+    def single(text):
+        retried.append(text)
+        return {"Hello": "こんにちは", "Bye": "さようなら"}[text]
+
+    assert translate_batch_json(texts, request, single, "prompt") == ["PLACEHOLDER_0 に行く", "こんにちは", "さようなら"]
+    assert retried == ["Hello", "Bye"]
+
+
+def test_single_retry_results_are_validated():
+    texts = ["Go to PLACEHOLDER_0", "Hello"]
+    request = reply_with([])
+
+    # 1 文ずつの翻訳でプレースホルダーが消えた・空だった結果は使わない
+    single = {"Go to PLACEHOLDER_0": "どこかに行く", "Hello": "  "}.get
+    assert translate_batch_json(texts, request, single, "prompt") == [None, None]
+    assert translate_batch_json(texts, lambda messages: None, lambda text: None, "prompt") == [None, None]
@@ -0,0 +1,37 @@
+# -*- coding:utf-8 -*-
+
+from masking import MaskingEngine, DEFAULT_PATTERNS
+
+
+def test_restore_round_trips_newline_and_mission_token():
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    value = "Deliver the cargo to ~mission(Destination|Address).\\nReturn when done; payment on arrival."
+
+    masked, placeholders, use_gpt = engine.mask(value)
+
+    assert use_gpt
+    assert "~mission" not in masked
+    assert engine.restore(masked, placeholders) == value
+
+
+def test_restore_converts_newline_token_without_placeholders():
+    # DeepL に回る文（プレースホルダーが無い文）も改行記号を戻す
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    value = "First line\\nSecond line"
+
+    masked, placeholders, use_gpt = engine.mask(value)
+
+    assert not use_gpt
+    assert masked == "First line |~ Second line"
+    assert engine.restore(masked, placeholders) == value
+
+
+def test_restore_newline_inside_restored_original():
+    # 行全体を覆うパターン（.*;.*）の元の文字列には改行記号が入っている
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    value = "Status: armed\\nweapons; ready"
+
+    masked, placeholders, _ = engine.mask(value)
+
+    assert any(engine.newline_token in original for _, original in placeholders)
+    assert engine.restore(masked, placeholders) == value
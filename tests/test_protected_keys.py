@@ -0,0 +1,50 @@
+# -*- coding:utf-8 -*-
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import protected_keys
+from protected_keys import index_path, file_hash, load_protected_keys
+
+
+def test_protected_keys_are_cached(tmp_path):
+    reference = tmp_path / "global_cn.ini.txt"
+    reference.write_text("a=中文\nb=UI_Button\nc=\nd=翻译\n", encoding="utf-8-sig")
+    cache_dir = str(tmp_path / "cache")
+
+    assert load_protected_keys(str(reference), "cn", cache_dir) == ["b", "c"]
+    cached = index_path(file_hash(str(reference)), "cn", cache_dir)
+    assert os.path.exists(cached)
+    # 2 回目は索引から読む
+    assert load_protected_keys(str(reference), "cn", cache_dir) == ["b", "c"]
+
+
+def test_missing_reference_warns_or_raises(tmp_path, capsys):
+    missing = str(tmp_path / "global_cn.ini.txt")
+    assert load_protected_keys(missing, "cn", str(tmp_path)) == []
+    assert "警告" in capsys.readouterr().out
+    with pytest.raises(FileNotFoundError):
+        load_protected_keys(missing, "cn", str(tmp_path), required=True)
+
+
+def test_file_hash_matches_sha256_of_the_whole_file(tmp_path, monkeypatch):
+    data = bytes(range(256)) * 100
+    path = tmp_path / "reference.bin"
+    path.write_bytes(data)
+    # 決まった大きさずつ読んでも、まとめて計算したハッシュと同じになる
+    monkeypatch.setattr(protected_keys, "HASH_CHUNK_SIZE", 1000)
+    assert file_hash(str(path)) == hashlib.sha256(data).hexdigest()
+
+
+def test_concurrent_index_writes_leave_one_index(tmp_path):
+    reference = tmp_path / "global_cn.ini.txt"
+    reference.write_text("".join(f"key_{i}=UI_{i}\n" for i in range(500)), encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: load_protected_keys(str(reference), "cn", str(cache_dir)), range(8)))
+    assert all(len(keys) == 500 for keys in results)
+    assert [path.suffix for path in cache_dir.iterdir()] == [".idx"]
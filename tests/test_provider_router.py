@@ -0,0 +1,84 @@
+# -*- coding:utf-8 -*-
+
+import threading
+import time
+
+from provider_router import FAILURE_THRESHOLD, HEDGE_MIN_SAMPLES, ProviderHealth, ProviderRouter
+
+
+class StubBackend:
+    """
+    決まった訳を返す（空文字なら失敗）スタブ。呼ばれた回数を数え、delay 秒待ってから返す
+    """
+
+    def __init__(self, result, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text, count, **options):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.result
+
+
+def test_failover_follows_backend_order():
+    gpt, deepl, spare = StubBackend(""), StubBackend(""), StubBackend("spare")
+    router = ProviderRouter({"gpt": gpt, "deepl": deepl, "spare": spare})
+
+    assert router.translate("Hello", 0, "deepl") == "spare"
+    # preferred を先頭に、残りは backends に書いた順番で試す
+    assert (deepl.calls, gpt.calls, spare.calls) == (1, 1, 1)
+    assert router.failovers == 2
+
+    # exclude したプロバイダーは試さない
+    assert router.translate("Hello", 0, "gpt", exclude=("spare",)) == ""
+    assert spare.calls == 1
+
+
+def test_failing_provider_is_moved_last_until_cooldown_ends():
+    gpt, deepl = StubBackend(""), StubBackend("deepl")
+    router = ProviderRouter({"gpt": gpt, "deepl": deepl})
+    router.health["gpt"] = ProviderHealth(cooldown=0.2)
+
+    for _ in range(FAILURE_THRESHOLD):
+        assert router.translate("Hello", 0, "gpt") == "deepl"
+    assert gpt.calls == FAILURE_THRESHOLD
+    assert router.order("gpt") == ["deepl", "gpt"]
+
+    # 止めている間は gpt を呼ばずに deepl で翻訳する
+    assert router.translate("Hello", 0, "gpt") == "deepl"
+    assert gpt.calls == FAILURE_THRESHOLD
+
+    time.sleep(0.25)
+    assert router.order("gpt") == ["gpt", "deepl"]
+
+
+def test_slow_request_is_hedged_to_the_next_provider():
+    gpt, deepl = StubBackend("gpt", delay=0.5), StubBackend("deepl")
+    router = ProviderRouter({"gpt": gpt, "deepl": deepl}, hedge_percentile=50)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        router.record("gpt", True, 0.01)
+
+    start = time.perf_counter()
+    assert router.translate("Hello", 0, "gpt") == "deepl"
+    assert time.perf_counter() - start < 0.4
+    assert router.hedged == 1
+
+
+def test_cache_hits_do_not_count_as_calls():
+    gpt = StubBackend("api")
+    cache = {"Hello": "cached"}
+    router = ProviderRouter({"gpt": gpt}, hedge_percentile=50,
+                            lookups={"gpt": lambda text, **options: cache.get(text)})
+
+    assert router.translate("Hello", 0, "gpt") == "cached"
+    assert gpt.calls == 0
+    # 翻訳メモリから返した訳はレイテンシにも成功数にも入らない
+    assert router.health["gpt"].successes == 0 and not router.health["gpt"].latencies
+
+    assert router.translate("World", 0, "gpt") == "api"
+    assert gpt.calls == 1 and router.health["gpt"].successes == 1
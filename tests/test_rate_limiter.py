@@ -0,0 +1,139 @@
+# -*- coding:utf-8 -*-
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from providers import DummyChatProvider, DummyDeepLProvider, HttpChatProvider, HttpDeepLProvider, ProviderHTTPError
+from rate_limiter import (AdaptiveRateLimiter, UnlimitedRateLimiter, call_with_retry, classify_openai_error,
+                          limiter_for, parse_retry_after)
+
+
+class FakeClock:
+    """
+    sleep で進むだけの時計（待った秒数も記録する）
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def fake_limiter(rate, clock, **kwargs):
+    return AdaptiveRateLimiter(rate, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_offline_providers_are_not_rate_limited():
+    assert isinstance(limiter_for(DummyChatProvider(), 3, max_rate=50), UnlimitedRateLimiter)
+    assert isinstance(limiter_for(DummyDeepLProvider(), 3, max_rate=50), UnlimitedRateLimiter)
+
+
+def test_network_providers_keep_the_adaptive_limiter():
+    limiter = limiter_for(HttpChatProvider(), 3, max_rate=50)
+    assert isinstance(limiter, AdaptiveRateLimiter)
+    assert isinstance(limiter_for(HttpDeepLProvider(), 3), AdaptiveRateLimiter)
+
+
+def test_tokens_refill_at_the_current_rate():
+    clock = FakeClock()
+    limiter = fake_limiter(2, clock, burst=1)
+    limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert clock.now == pytest.approx(0.5)
+
+
+def test_rate_limited_halves_the_rate_and_honors_retry_after():
+    clock = FakeClock()
+    limiter = fake_limiter(4, clock, burst=1, min_rate=1.5)
+    limiter.acquire()
+    limiter.on_rate_limited(retry_after=10)
+    assert limiter.rate == 2
+    # Retry-After の 10 秒は止まり、その後はトークンが 1 つ貯まるまで（半分にした速度で 0.5 秒）待つ
+    limiter.acquire()
+    assert clock.now == pytest.approx(10.5)
+
+    # 下限より下には落とさない
+    limiter.on_rate_limited()
+    assert limiter.rate == 1.5
+
+
+def test_success_increases_the_rate_up_to_max_rate():
+    limiter = fake_limiter(1, FakeClock(), max_rate=1.12, increase=0.05)
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(1.05)
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.12)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-3") == 0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    # HTTP の日付は秒単位なので、丸めの分だけ幅を持たせる
+    assert 28 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30.5
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0
+
+
+class RecordingLimiter(UnlimitedRateLimiter):
+    def __init__(self):
+        self.events = []
+
+    def on_success(self):
+        self.events.append("success")
+
+    def on_rate_limited(self, retry_after=None):
+        self.events.append(("rate_limited", retry_after))
+
+
+def failing(errors, result="ok"):
+    # errors を順番に投げ、投げ終わったら result を返す関数
+    errors = list(errors)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    return func, calls
+
+
+def test_call_with_retry_honors_rate_limits_and_recovers():
+    clock = FakeClock()
+    limiter = RecordingLimiter()
+    func, calls = failing([ProviderHTTPError(429, "slow down", {"Retry-After": "7"}), ProviderHTTPError(503, "busy")])
+    assert call_with_retry(func, limiter, classify_openai_error, base_delay=1.0, sleep=clock.sleep) == "ok"
+    assert len(calls) == 3
+    assert limiter.events == [("rate_limited", 7.0), "success"]
+    # Retry-After があるときは少しずらすだけ、無いときは指数バックオフ（2 回目は 2 秒まで）
+    assert clock.sleeps[0] <= 1.0 and clock.sleeps[1] <= 2.0
+
+
+def test_call_with_retry_does_not_retry_request_errors():
+    clock = FakeClock()
+    func, calls = failing([ProviderHTTPError(400, "bad request")])
+    with pytest.raises(ProviderHTTPError):
+        call_with_retry(func, RecordingLimiter(), classify_openai_error, sleep=clock.sleep)
+    assert len(calls) == 1 and clock.sleeps == []
+
+
+def test_call_with_retry_gives_up_after_max_retries():
+    clock = FakeClock()
+    func, calls = failing([ProviderHTTPError(500, "down")] * 10)
+    with pytest.raises(ProviderHTTPError):
+        call_with_retry(func, RecordingLimiter(), classify_openai_error, max_retries=3, base_delay=1.0,
+                        max_delay=3.0, sleep=clock.sleep)
+    assert len(calls) == 4
+    assert len(clock.sleeps) == 3 and max(clock.sleeps) <= 3.0
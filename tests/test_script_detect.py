@@ -0,0 +1,51 @@
+# -*- coding:utf-8 -*-
+
+import csv
+
+from script_detect import classify_column, contains_chinese, contains_japanese, japanese_ratio
+from WIP_csv_for_key import detect_columns, extract_english_keys_from_csv
+
+
+def test_contains_japanese_handles_control_characters():
+    assert contains_japanese("ポート")
+    assert contains_japanese("漢字")
+    assert not contains_japanese("Port\x00\x1f")
+    assert contains_chinese("中文")
+
+
+def test_classify_column_reports_ratio():
+    assert classify_column(["日本語", "English", "日本 ab", ""]) == [
+        (True, 1.0), (False, 0.0), (True, 0.5), (False, 0.0)]
+    assert japanese_ratio("123") == 0.0
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows(rows)
+
+
+def test_extract_english_keys_with_default_columns(tmp_path):
+    path = str(tmp_path / "WIP_ini.csv")
+    write_csv(path, [["no", "file", "key", "translation"],
+                     ["1", "f", "a", "こんにちは"],
+                     ["2", "f", "b", "Hello"],
+                     ["3", "f", "c", "Mostly English 訳"]])
+
+    assert extract_english_keys_from_csv(path) == (["b"], ["Hello"], ["こんにちは", "Mostly English 訳"])
+    # 英語が大半の訳も翻訳し直す
+    english_keys, _, _ = extract_english_keys_from_csv(path, min_ratio=0.3)
+    assert english_keys == ["b", "c"]
+
+
+def test_detect_columns_finds_japanese_column(tmp_path):
+    # 見出しの無い表で、訳が既定（4 列目）ではなく 5 列目にある
+    path = str(tmp_path / "sheet.csv")
+    write_csv(path, [["1", "f", "label", "en text", "jp text"],
+                     ["2", "f", "a", "Hello", "こんにちは"],
+                     ["3", "f", "b", "World", "World"],
+                     ["4", "f", "c", "Ship", "船"]])
+
+    assert detect_columns(path) == {"key": 2, "translation": 4}
+    english_keys, _, jap = extract_english_keys_from_csv(path)
+    assert english_keys == ["b"]
+    assert jap == ["こんにちは", "船"]
@@ -0,0 +1,60 @@
+# -*- coding:utf-8 -*-
+
+import zipfile
+
+from sheet_import import iter_entries, iter_sheet_pairs, read_sheet_translations
+
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def write_xlsx(path, rows, sheet_name="Sheet1"):
+    # 共有文字列を使う、見出しの無い最小限の xlsx を書く
+    strings = []
+    sheet_rows = []
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, value in enumerate(row):
+            if value is None:
+                continue
+            strings.append(value)
+            cells.append(f'<c r="{chr(ord("A") + c)}{r}" t="s"><v>{len(strings) - 1}</v></c>')
+        sheet_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/workbook.xml',
+                         f'<workbook xmlns="{MAIN}" xmlns:r="{REL}"><sheets>'
+                         f'<sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        archive.writestr('xl/_rels/workbook.xml.rels',
+                         f'<Relationships xmlns="{PACKAGE_REL}">'
+                         f'<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        archive.writestr('xl/sharedStrings.xml',
+                         f'<sst xmlns="{MAIN}">' + "".join(f'<si><t>{s}</t></si>' for s in strings) + '</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml',
+                         f'<worksheet xmlns="{MAIN}"><sheetData>{"".join(sheet_rows)}</sheetData></worksheet>')
+
+
+def test_xlsx_without_header_uses_default_columns(tmp_path):
+    path = str(tmp_path / "日本語ローカライズ_v3.17.2.xlsx")
+    write_xlsx(path, [
+        ["item_Name_01", "Quantum Drive", "量子ドライブ"],
+        ["item_Name_02", "Hull", "Hull"],
+        ["item_Name_03", "Cargo", None],
+        [None, "No key", "キー無し"],
+    ])
+    entries = list(iter_entries(path))
+    assert [entry["key"] for entry in entries] == ["item_Name_01", "item_Name_02", "item_Name_03"]
+    assert entries[2] == {"key": "item_Name_03", "source": "Cargo", "translation": ""}
+
+    # 英語のままの訳と空の訳は日本語訳として読まない
+    assert read_sheet_translations(path) == {"item_Name_01": "量子ドライブ"}
+    assert list(iter_sheet_pairs(path)) == [("Quantum Drive", "量子ドライブ")]
+
+
+def test_csv_with_header_names(tmp_path):
+    path = tmp_path / "WIP_ini.csv"
+    path.write_text("memo,Key,English,Japanese\n"
+                    ",ui_Accept,Accept,承諾\n"
+                    ",ui_Cancel,Cancel,\n", encoding="utf-8-sig")
+    assert read_sheet_translations(str(path)) == {"ui_Accept": "承諾"}
+    assert list(iter_sheet_pairs(str(path))) == [("Accept", "承諾")]
@@ -0,0 +1,21 @@
+# -*- coding:utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+
+import skip_filter
+from skip_filter import load_or_build_filter
+
+
+def test_concurrent_cache_writes_do_not_collide(tmp_path, monkeypatch):
+    monkeypatch.setattr(skip_filter, "ahocorasick", None)
+    keywords = frozenset(f"key_{i}" for i in range(200))
+    cache_dir = str(tmp_path)
+
+    # 同時に何プロセスも書いても、一時ファイルが残らず、読み込めるキャッシュが 1 つだけできる
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        filters = list(executor.map(lambda _: load_or_build_filter(keywords, cache_dir), range(8)))
+    assert all(key_filter.matches("prefix_key_42_suffix") for key_filter in filters)
+    assert [path.suffix for path in tmp_path.iterdir()] == [".marshal"]
+
+    cached = load_or_build_filter(keywords, cache_dir)
+    assert cached.matches("key_199") and not cached.matches("other")
@@ -0,0 +1,26 @@
+# -*- coding:utf-8 -*-
+
+from token_budget import approximate_tokens, pack_batches
+
+
+def test_pack_batches_respects_limit_and_keeps_every_item():
+    sizes = [70, 10, 40, 30, 60, 20, 90, 5]
+    batches = pack_batches(sizes, 100)
+    assert sorted(index for batch in batches for index in batch) == list(range(len(sizes)))
+    assert all(sum(sizes[index] for index in batch) <= 100 for batch in batches)
+    assert all(batch == sorted(batch) for batch in batches)
+    # best-fit decreasing なら合計 325 を 4 つのバッチに詰められる
+    assert len(batches) == 4
+
+
+def test_pack_batches_oversized_items_and_max_items():
+    batches = pack_batches([150, 10, 10, 10], 100, max_items=2)
+    assert [0] in batches
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sorted(index for batch in batches for index in batch) == [0, 1, 2, 3]
+
+
+def test_approximate_tokens():
+    # "Quantum"=2, "Drive"=1, "12345"=2, "!"=1
+    assert approximate_tokens("Quantum Drive 12345!") == 6
+    assert approximate_tokens("") == 0
@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+
+import importlib
+
+import pytest
+
+from providers import create_providers
+from rate_limiter import limiter_for
+from translation_memory import TranslationMemory
+from validator import validate_files, failing_keys
+
+# 翻訳・検証・--requeue を dummy プロバイダーで通す（openai / deepl / dotenv が入っている環境だけ）
+pytest.importorskip("dotenv")
+
+SOURCE = (
+    "mission_desc=Deliver the cargo to ~mission(Destination).\\nReturn to Port Olisar when done.\n"
+    "plain=Welcome aboard.\\nEnjoy your flight.\n"
+    "reward=Reward: %ls aUEC\n"
+    "tagged=<EM4>Warning</EM4>\\nShields down\n"
+    "name=Port Olisar\n"
+)
+
+
+@pytest.fixture(scope="module")
+def translator(tmp_path_factory):
+    tm_path = str(tmp_path_factory.mktemp("tm") / "tm.sqlite3")
+    # 環境変数と差し替えたモジュールの変数は、このモジュールのテストが終わったら元に戻す
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("TRANSLATOR_PROVIDER", "dummy")
+        monkeypatch.setenv("TRANSLATION_MEMORY_PATH", tm_path)
+        module = importlib.import_module("Gpt_Translator")
+        # 先に読み込まれていても、リポジトリの cache の翻訳メモリや本物の API を使わないようにする
+        gpt_provider, deepl_provider = create_providers("dummy", model=module.gpt_model)
+        monkeypatch.setattr(module, "gpt_provider", gpt_provider)
+        monkeypatch.setattr(module, "deepl_provider", deepl_provider)
+        monkeypatch.setattr(module, "gpt_limiter", limiter_for(gpt_provider, module.gpt_rate))
+        monkeypatch.setattr(module, "deepl_limiter", limiter_for(deepl_provider, module.deepl_rate))
+        tm = TranslationMemory(tm_path)
+        monkeypatch.setattr(module, "tm", tm)
+        yield module
+        tm.close()
+
+
+def test_translate_validate_requeue_converges(translator, tmp_path):
+    source = tmp_path / "global_en.ini"
+    output = tmp_path / "translated_global.ini"
+    source.write_text(SOURCE, encoding="utf-8")
+
+    summary = translator.translate_ini_file(str(tmp_path), source_path=str(source), output_path=str(output),
+                                            workers=1, glossary_path=None)
+    assert summary["counts"]["failed_validation"] == 0
+    assert failing_keys(validate_files(str(source), str(output), workers=1)) == []
+
+    # 検証で弾かれた key が無くても、--requeue で翻訳し直した結果が壊れないこと
+    summary = translator.translate_ini_file(str(tmp_path), source_path=str(source), output_path=str(output),
+                                            workers=1, glossary_path=None, requeue_keys=["mission_desc", "plain"])
+    assert summary["counts"]["failed_validation"] == 0
+    assert failing_keys(validate_files(str(source), str(output), workers=1)) == []
+
+
+def test_fuzzy_edit_must_match_new_source_tokens(translator):
+    new_source = "Deliver ~mission(Item1) to ~mission(Destination).\\nDone."
+    assert translator.is_valid_edit(new_source, "~mission(Item1) を ~mission(Destination) に届ける。\\n完了。")
+    # 前の原文の ~mission(Item3) が残っている・改行記号が足りない訳は使わない
+    assert not translator.is_valid_edit(new_source, "~mission(Item1) と ~mission(Item3) を ~mission(Destination) に届ける。\\n完了。")
+    assert not translator.is_valid_edit(new_source, "~mission(Item1) を ~mission(Destination) に届ける。完了。")
+
+
+def test_languages_fan_out_to_per_language_files(translator, tmp_path):
+    source = tmp_path / "global_en.ini"
+    source.write_text(SOURCE, encoding="utf-8")
+    single = tmp_path / "single" / "translated_global.ini.txt"
+    multi = tmp_path / "multi" / "translated_global.ini.txt"
+    single.parent.mkdir()
+    multi.parent.mkdir()
+
+    translator.translate_ini_file(str(tmp_path), source_path=str(source), output_path=str(single),
+                                  workers=1, glossary_path=None)
+    translator.translate_ini_file(str(tmp_path), source_path=str(source), output_path=str(multi),
+                                  workers=1, glossary_path=None, languages=["ja", "ko"])
+
+    # 既定の言語（日本語）は 1 言語だけで翻訳したときと同じファイルになる
+    assert multi.read_bytes() == single.read_bytes()
+    korean = multi.parent / "translated_global_ko.ini.txt"
+    assert korean.exists()
+    assert (multi.parent / "translated_global.journal.jsonl").exists()
+    # 言語ごとに別のジャーナルに書く
+    assert (multi.parent / "translated_global_ko.journal.jsonl").read_text(encoding="utf-8").strip()
+    for output in (multi, korean):
+        assert failing_keys(validate_files(str(source), str(output), workers=1)) == []
@@ -0,0 +1,48 @@
+# -*- coding:utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+
+from translation_memory import TranslationMemory, prompt_version
+
+
+def test_translations_are_keyed_by_language_provider_and_prompt(tmp_path):
+    tm = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    version = prompt_version("Translate to Japanese.", "gpt-3.5-turbo")
+    tm.put("Hello #0 ", "こんにちは #0 ", "Japanese", "gpt", version)
+
+    assert tm.get("Hello #0 ", "Japanese", "gpt", version) == "こんにちは #0 "
+    # 言語・プロバイダー・プロンプト（モデル）が違えば別の訳
+    assert tm.get("Hello #0 ", "Korean", "gpt", version) is None
+    assert tm.get("Hello #0 ", "Japanese", "deepl", version) is None
+    assert tm.get("Hello #0 ", "Japanese", "gpt", prompt_version("Translate to Japanese.", "gpt-4")) is None
+    assert (tm.hits, tm.misses) == (1, 3)
+    tm.close()
+
+    # 作り直しても残っている
+    tm = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    assert tm.get("Hello #0 ", "Japanese", "gpt", version) == "こんにちは #0 "
+    tm.close()
+
+
+def test_empty_translations_are_not_cached(tmp_path):
+    tm = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    tm.put("Hello", "", "JA", "deepl")
+    assert tm.get("Hello", "JA", "deepl") is None
+    tm.close()
+
+
+def test_counters_are_exact_under_concurrency(tmp_path):
+    tm = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+    tm.put("hit", "ヒット", "JA", "deepl")
+    texts = ["hit" if i % 2 else f"miss {i}" for i in range(2000)]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda text: tm.get(text, "JA", "deepl"), texts))
+    assert (tm.hits, tm.misses) == (1000, 1000)
+    tm.close()
+
+
+def test_path_from_environment_is_read_when_created(tmp_path, monkeypatch):
+    path = tmp_path / "env_tm.sqlite3"
+    monkeypatch.setenv("TRANSLATION_MEMORY_PATH", str(path))
+    TranslationMemory().close()
+    assert path.exists()
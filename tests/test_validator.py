@@ -0,0 +1,47 @@
+# -*- coding:utf-8 -*-
+
+from validator import check_value, failing_keys, read_failing_keys, validate_files, write_failing_keys
+
+
+def test_check_value_accepts_matching_tokens():
+    source = "Go to ~mission(Location)\\nReward: %ls <EM4>now</EM4>"
+    translated = "~mission(Location)へ行く\\n報酬: %ls <EM4>今すぐ</EM4>"
+    assert check_value(source, translated) == []
+
+
+def test_check_value_reports_each_problem():
+    source = "Go to ~mission(Location)\\nReward: %ls"
+    assert check_value(source, "行く\\n報酬: %ls") == ["function"]
+    assert check_value(source, "~mission(Location)へ行く 報酬: %ls") == ["newline"]
+    assert check_value(source, "~mission(Location)へ行く\\n報酬: %ls |~") == ["leftover-mask"]
+
+
+def test_check_value_catches_bare_placeholder():
+    # 前後の空白が落ちて戻らなかったプレースホルダー
+    assert check_value("Fly to Port Olisar", "#0に飛ぶ") == ["leftover-mask"]
+    # 原文にもある #1 は残っていてよい
+    assert check_value("Rank #1 pilot", "ランク #1 のパイロット") == []
+
+
+def test_check_value_encoding():
+    assert check_value("Hello", "こんにちは�") == ["encoding"]
+
+
+def test_validate_files_and_failing_keys(tmp_path):
+    source = tmp_path / "global_en.ini"
+    translated = tmp_path / "translated.ini"
+    source.write_text("a=Hello %s\nb=Line\\nbreak\nc=Same\nd=Gone\n", encoding="utf-8")
+    translated.write_text("a=こんにちは\nb=改行\\nあり\nc=Same\nc=Same\ne=Extra\n", encoding="utf-8")
+
+    report = validate_files(str(source), str(translated), workers=1)
+
+    assert report["missing"] == ["d"]
+    assert report["extra"] == ["e"]
+    assert report["duplicates"] == ["c"]
+    assert report["failures"] == {"a": ["format"]}
+    keys = failing_keys(report)
+    assert set(keys) == {"a", "d"}
+
+    path = tmp_path / "failed_keys.txt"
+    write_failing_keys(keys, str(path))
+    assert set(read_failing_keys(str(path))) == {"a", "d"}
@@ -0,0 +1,65 @@
+# -*- coding:utf-8 -*-
+
+import os
+
+import pytest
+
+from ini_stream import read_ini_dict
+from chunk_pipeline import find_split_files
+from version_diff import diff_versions, fuzzy_references_for, load_previous_version, plan_incremental
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def test_diff_versions():
+    old = {"a": "A", "b": "B", "gone": "X"}
+    new = {"b": "B2", "a": "A", "new": "N"}
+    assert diff_versions(new, old) == {"added": ["new"], "removed": ["gone"], "changed": ["b"], "unchanged": ["a"]}
+
+
+def test_plan_incremental_with_split_files(tmp_path):
+    # v3.16.1 と同じ、分割済みの global_en_0x / global_ja_0x の並び
+    (tmp_path / "global_en_00").write_text("a=Hello\nb=Old text\n", encoding="utf-8-sig")
+    (tmp_path / "global_en_01").write_text("c=Untranslated\n", encoding="utf-8")
+    (tmp_path / "global_ja_00").write_text("a=こんにちは\nb=古い文\n", encoding="utf-8-sig")
+    (tmp_path / "global_ja_01").write_text("c=Untranslated\n", encoding="utf-8")
+
+    carried, to_translate, diff = plan_incremental({"a": "Hello", "b": "New text", "c": "Untranslated", "d": "Added"},
+                                                   str(tmp_path))
+
+    assert carried == {"a": "こんにちは"}
+    assert to_translate == {"b", "c", "d"}
+    assert diff["changed"] == ["b"] and diff["added"] == ["d"]
+
+
+def test_plan_incremental_prefers_translated_output(tmp_path):
+    (tmp_path / "global_en.ini.txt").write_text("a=Hello\n", encoding="utf-8")
+    (tmp_path / "translated_global.ini.txt").write_text("a=やあ\n", encoding="utf-8")
+    (tmp_path / "global_ja.txt").write_text("a\tこんにちは\n", encoding="cp932")
+
+    carried, to_translate, _ = plan_incremental({"a": "Hello"}, str(tmp_path))
+    assert carried == {"a": "やあ"}
+    assert to_translate == set()
+
+
+def test_untranslated_lines_in_translated_output_are_retried(tmp_path):
+    # 前回の翻訳で失敗した・飛ばした行は英語のまま書き出されている
+    (tmp_path / "global_en.ini.txt").write_text("a=Hello\nb=World\n", encoding="utf-8")
+    (tmp_path / "translated_global.ini.txt").write_text("a=やあ\nb=World\n", encoding="utf-8")
+
+    carried, to_translate, _ = plan_incremental({"a": "Hello", "b": "World"}, str(tmp_path))
+    assert carried == {"a": "やあ"}
+    assert to_translate == {"b"}
+
+
+def test_missing_previous_version(tmp_path):
+    assert load_previous_version(str(tmp_path)) is None
+    assert fuzzy_references_for(str(tmp_path)) == []
+
+
+@pytest.mark.skipif(not find_split_files(os.path.join(ROOT, 'v3.16.1')), reason="v3.16.1 がありません")
+def test_load_previous_version_v3_16_1():
+    old_en, old_ja = load_previous_version(os.path.join(ROOT, 'v3.16.1'))
+    assert old_en == read_ini_dict(find_split_files(os.path.join(ROOT, 'v3.16.1')))
+    assert len(old_ja) > 50000
+    assert set(old_ja) <= set(old_en)
@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+
+from version_diff import diff_versions
+from version_store import VersionStore, load_or_build_store
+
+OLD = {"a": "Hello", "b": "Old text", "gone": "Removed"}
+NEW = {"b": "New text", "a": "Hello", "added": "Added"}
+NEWER = {"a": "Hello", "b": "Old text"}
+
+
+def build_store():
+    store = VersionStore()
+    for name, values in (("v1", OLD), ("v2", NEW), ("v3", NEWER)):
+        store.add_version(name, values.items())
+    return store
+
+
+def test_diff_matches_diff_versions():
+    store = build_store()
+    assert store.diff("v2", "v1") == diff_versions(NEW, OLD)
+    assert store.changed_keys("v2", "v1") == ["added", "b"]
+    # 前の version と同じ値に戻ったものは unchanged
+    assert store.diff("v3", "v1") == diff_versions(NEWER, OLD)
+
+
+def test_history_and_interning():
+    store = build_store()
+    assert store.history("b") == [("v1", "Old text"), ("v2", "New text"), ("v3", "Old text")]
+    assert store.history("gone") == [("v1", "Removed"), ("v2", None), ("v3", None)]
+    assert store.get("v1", "missing", "default") == "default"
+    # 同じ key・同じ値は 1 回だけ持つ
+    assert sorted(store.keys) == ["a", "added", "b", "gone"]
+    assert sorted(store.pool) == ["Added", "Hello", "New text", "Old text", "Removed"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = build_store()
+    path = str(tmp_path / "store.marshal")
+    store.save(path)
+
+    loaded = VersionStore.load(path)
+    assert loaded.versions == ["v1", "v2", "v3"]
+    for name, values in (("v1", OLD), ("v2", NEW), ("v3", NEWER)):
+        assert loaded.to_dict(name) == values
+        assert loaded.keys_of(name) == list(values)
+    assert loaded.diff("v2", "v1") == store.diff("v2", "v1")
+    assert [p.name for p in tmp_path.iterdir()] == ["store.marshal"]
+
+
+def test_concurrent_builds_leave_one_cache(tmp_path):
+    version = tmp_path / "v1"
+    version.mkdir()
+    (version / "global_en.ini.txt").write_text("a=Hello\nb=World\n", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        stores = list(executor.map(lambda _: load_or_build_store([str(version)], str(cache_dir)), range(8)))
+    assert all(store.to_dict(store.versions[0]) == {"a": "Hello", "b": "World"} for store in stores)
+    assert [path.suffix for path in cache_dir.iterdir()] == [".marshal"]
@@ -2,16 +2,40 @@ using HTTP
 using JSON3
 using Printf
 
-function deepL_translate(value)
+# DeepL は 1 リクエストで最大 50 テキストまで受け付ける
+const MAX_TEXTS = 50
+# 429 や 5xx が返ってきたときの再試行回数
+const MAX_RETRIES = 6
+
+function deepL_translate(values)
     deepLurl = "https://api.deepl.com/v2/translate"
     authKey = "<NEED TO GET YOUR AUTH KEY>"
     
 #    params = Dict( "auth_key" => authKey, "source_lang" => "EN", "target_lang" => "JA", "text" => value)
 #    res = HTTP.get(deepLurl; require_ssl_verification = false, query = params)
-    params = @sprintf("auth_key=%s&source_lang=EN&target_lang=JA&text=%s", authKey, value)
-    res = HTTP.request("POST", deepLurl, ["Content-type" => "application/x-www-form-urlencoded"], params)
+    params = @sprintf("auth_key=%s&source_lang=EN&target_lang=JA", authKey)
+    for value in values
+        params *= "&text=" * HTTP.escapeuri(value)
+    end
+
+    # 429 と 5xx は Retry-After があればその秒数、無ければジッター付きの指数バックオフで待って再試行する
+    res = nothing
+    for attempt in 0:MAX_RETRIES
+        res = HTTP.request("POST", deepLurl, ["Content-type" => "application/x-www-form-urlencoded"], params;
+                           status_exception = false, retry = false)
+        if (res.status == 429 || res.status >= 500) && attempt < MAX_RETRIES
+            delay = tryparse(Float64, HTTP.header(res, "Retry-After", ""))
+            if delay === nothing
+                delay = rand() * min(60.0, 2.0^attempt)
+            end
+            sleep(delay)
+            continue
+        end
+        break
+    end
+
     if res.status != 200
-        println("Invalit result status code : " + res.status)
+        println("Invalit result status code : " * string(res.status))
         return nothing
     end
 
@@ -19,6 +43,29 @@ function deepL_translate(value)
     return result
 end
 
+# 溜めた行をまとめて翻訳して、元の順番で出力する
+function flush_batch(keys, values)
+    if isempty(keys)
+        return
+    end
+
+    res = deepL_translate(values)
+    for (i, key) in enumerate(keys)
+        print(key)
+        print("=")
+        if res !== nothing
+            trans = res["translations"][i]
+            resurrect = replace(trans["text"], "\n" => "\\n")
+            println(resurrect)
+        else
+            println("%TRANSLATION ERROR%")
+        end
+    end
+
+    empty!(keys)
+    empty!(values)
+end
+
 #println(@sprintf("ARGS = %d", length(ARGS)))
 
 for (index, arg) in enumerate(ARGS)
@@ -29,29 +76,23 @@ for (index, arg) in enumerate(ARGS)
         exit()
     end
 
+    batch_keys = String[]
+    batch_values = String[]
+
     for buff in eachline(ini_io)
         keywords = split(buff, "="; limit=2)
         if length(keywords) == 2
-            value = replace(keywords[2], "\\n" => "\n")
-            res = deepL_translate(value)
-            if res !== nothing
-                trans = res["translations"][1]
-                resurrect = replace(trans["text"], "\n" => "\\n")
-                print(keywords[1])
-    #            print("\t")
-    #            print(keywords[2])
-                print("=")
-                println(resurrect)
-            else
-                print(keywords[1])
-                print("=")
-                println("%TRANSLATION ERROR%")
+            push!(batch_keys, keywords[1])
+            push!(batch_values, replace(keywords[2], "\\n" => "\n"))
+            if length(batch_keys) >= MAX_TEXTS
+                flush_batch(batch_keys, batch_values)
             end
         else
+            flush_batch(batch_keys, batch_values)
             print("Failed to match line : " * buff)
         end
-        sleep(0.5)
     end
+    flush_batch(batch_keys, batch_values)
 
     close(ini_io)
 end
@@ -4,18 +4,35 @@ import configparser
 import re
 import sys
 import os
-import openai
-import deepl
+import time
+from contextlib import ExitStack
 from dotenv import load_dotenv
+from async_dispatcher import dispatch_translations
+from deepl_batch import pack_deepl_batches
+from dedup import group_by_source, fan_out, print_dedup_report
+from checkpoint import TranslationJournal
+from ini_stream import read_ini_dict, write_translated_ini
+from translation_memory import TranslationMemory, prompt_version
+from rate_limiter import limiter_for, call_with_retry, classify_openai_error, classify_deepl_error
+from chunk_pipeline import find_split_files, prepare_jobs
+from protected_keys import load_protected_keys, reference_path
+from masking import MaskingEngine, DEFAULT_PATTERNS
+from version_diff import plan_incremental, print_diff_summary, fuzzy_references_for, PREVIOUS_JA_NAME
+from fuzzy_tm import build_fuzzy_index, plan_fuzzy, build_edit_prompt, build_edit_messages
+from providers import create_providers, DEFAULT_GPT_MODEL
+from provider_router import ProviderRouter, route_by_rules
+from metrics import StageTimer, ProgressLine, build_summary, write_summary, print_stage_summary
+from validator import check_value, validate_files, failing_keys, write_failing_keys, print_report
+from glossary import Glossary, load_glossary, DEFAULT_GLOSSARY_PATH
 
 load_dotenv()  # .env ファイルから環境変数を読み込む
-openai_api_key = os.getenv("OPENAI_API_KEY")
-deepl_api_key = os.getenv("DEEPL_API_KEY")
 
-# OpenAI APIキーを設定します
-openai.api_key = openai_api_key
-# DeepL API の設定
-translator = deepl.Translator(deepl_api_key)
+# OpenAI のモデル（環境変数 OPENAI_MODEL で変えられる）
+gpt_model = os.getenv("OPENAI_MODEL", DEFAULT_GPT_MODEL)
+# 翻訳プロバイダー（環境変数 TRANSLATOR_PROVIDER で sdk / http / dummy を切り替える。API キーは .env から読む）
+gpt_provider, deepl_provider = create_providers(model=gpt_model)
+# 翻訳メモリ（過去に翻訳した文はAPIを呼ばずに再利用する）
+tm = TranslationMemory()
 
 # OpenAI 翻訳の前後
 LangFrom = "English"    # 翻訳前
@@ -24,8 +41,71 @@ LangTo   = "Japanese"   # 翻訳語
 # DeepL 翻訳先
 target_lang = "JA"
 
+# 複数の言語にまとめて翻訳するときの言語コード → (OpenAI に伝える言語名, DeepL の target_lang)
+TARGET_LANGUAGES = {
+    "ja": (LangTo, target_lang),
+    "ko": ("Korean", "KO"),
+    "zh": ("Simplified Chinese", "ZH"),
+    "de": ("German", "DE"),
+    "fr": ("French", "FR"),
+    "es": ("Spanish", "ES"),
+    "it": ("Italian", "IT"),
+    "pt": ("Brazilian Portuguese", "PT-BR"),
+    "pl": ("Polish", "PL"),
+}
+# 言語を指定しないときの翻訳先（過去の訳や前バージョンの translated_global.ini.txt はこの言語のもの）
+DEFAULT_LANGUAGE = "ja"
+
+# プロバイダーごとの同時リクエスト数
+gpt_concurrency   = 8
+deepl_concurrency = 4
+
+# プロバイダーごとのリクエスト数/秒（429 が返ってきたら自動で下げ、成功が続けば max まで上げる）
+gpt_rate   = 3
+gpt_max_rate   = 50
+deepl_rate = 2
+deepl_max_rate = 10
+gpt_limiter   = limiter_for(gpt_provider, gpt_rate, max_rate=gpt_max_rate)
+deepl_limiter = limiter_for(deepl_provider, deepl_rate, max_rate=deepl_max_rate)
+
+# 振り分けのルール（上から順に見て、最初に当てはまったプロバイダーを使う）
+# プレースホルダーを含む文は GPT、それ以外は DeepL
+route_rules = [
+    (lambda text, use_gpt: use_gpt, "gpt"),
+]
+# 翻訳に失敗したら別のプロバイダーで翻訳し直す。
+# hedge_percentile（例: 95）を決めると、直近のレイテンシのその分位を過ぎても返ってこないリクエストは別のプロバイダーにも送る
+hedge_percentile = None
+
+# 船・メーカー・場所の名前は用語集でプレースホルダーにして、GPT にも DeepL にも翻訳させない
+# 日本語では Japanese.pak と glossary.tsv の決まった訳に差し替え、それ以外の言語では英語のまま残す
+use_glossary = True
+
 # 初期プロンプト
-initial_prompt = f'You are a helpful assistant that translates {LangFrom} to {LangTo}. Retain proper nouns and specialized terms in their original English form. Keep placeholders in the format " #[number] " (e.g., "#0", "#1", "#2", and so on) or " |~ " or "%I" of "%Is" unchanged.'
+def build_initial_prompt(lang_to):
+    return f'You are a helpful assistant that translates {LangFrom} to {lang_to}. Retain proper nouns and specialized terms in their original English form. Keep placeholders in the format " #[number] " (e.g., "#0", "#1", "#2", and so on) or " |~ " or "%I" of "%Is" unchanged.'
+
+initial_prompt = build_initial_prompt(LangTo)
+gpt_prompt_version = prompt_version(initial_prompt, gpt_model)
+
+
+def language_settings(language=None):
+    """
+    言語コードから (OpenAI に伝える言語名, DeepL の target_lang, 初期プロンプト, プロンプトのバージョン) を返す関数
+    省略時は LangTo / target_lang / initial_prompt をそのまま使う
+    """
+    if language is None or language == DEFAULT_LANGUAGE:
+        return LangTo, target_lang, initial_prompt, gpt_prompt_version
+    lang_to, deepl_lang = TARGET_LANGUAGES[language]
+    prompt = build_initial_prompt(lang_to)
+    return lang_to, deepl_lang, prompt, prompt_version(prompt, gpt_model)
+
+# 過去の訳に近い文を直してもらうときのプロンプト
+edit_prompt = build_edit_prompt(LangFrom, LangTo)
+edit_prompt_version = prompt_version(edit_prompt, gpt_model)
+
+# 翻訳してはいけないプレースホルダーをマスクするエンジン（正規表現は一度だけコンパイル）
+masking_engine = MaskingEngine(DEFAULT_PATTERNS)
 
 # バッチ処理に使うトークンカウンター
 def count_tokens(text):
@@ -34,213 +114,503 @@ def count_tokens(text):
     return len(re.findall(r'\w+|\S', text))
 
 
+# GPT の訳を翻訳メモリから引く（無ければ None）
+def cached_text_GPT(text, language=None):
+    lang_to, _, _, version = language_settings(language)
+    return tm.get(text, lang_to, gpt_provider.name, version)
+
+
 # chat GPT 節約のためのバッチ処理を削除して、順次翻訳をする関数に変更
-def translate_text_GPT(text,count):
+def translate_text_GPT(text,count,language=None):
     """
-    単一の文章を受け取り、翻訳を実行し、翻訳結果を返す関数
+    単一の文章を受け取り、翻訳を実行し、翻訳結果を返す関数（language は TARGET_LANGUAGES の言語コード）
+    翻訳メモリは引かない（ルーターが先に cached_text_GPT で引く）。翻訳結果は翻訳メモリに保存する
     """
+    lang_to, _, prompt, version = language_settings(language)
     messages = [
-        {"role": "system", "content": initial_prompt},
+        {"role": "system", "content": prompt},
         {"role": "user", "content": f'{text}'}
     ]
 
     try:
-        response = openai.ChatCompletion.create(
-          model="gpt-3.5-turbo",
-          messages=messages
-        )
-        translated_text = response['choices'][0]['message']['content']
-    except openai.error.OpenAIError as e:
+        # レート制限に合わせて待ち、429 や一時的なエラーは再試行する
+        translated_text = call_with_retry(
+            lambda: gpt_provider.chat(messages),
+            gpt_limiter, classify_openai_error)
+    except Exception as e:
         print(f"Error with OpenAI API call: {str(e)}")
         print('エラー発生：', count + 1, "行目の翻訳が上手くいっていません。")
         return ""
     
     # 改行を取り除く
     translated_text = translated_text.replace("\n", " ")
+    tm.put(text, translated_text, lang_to, gpt_provider.name, version)
     return translated_text
 
 
-# DeepL API を使って翻訳
-def translate_text_Deepl(text,count):
+# DeepL の訳を翻訳メモリから引く（無ければ None）
+def cached_text_Deepl(text, language=None):
+    _, deepl_lang, _, _ = language_settings(language)
+    return tm.get(text, deepl_lang, deepl_provider.name)
+
+
+# DeepL API を使って翻訳（翻訳メモリは引かない。ルーターが先に cached_text_Deepl で引く）
+def translate_text_Deepl(text,count,language=None):
+    _, deepl_lang, _, _ = language_settings(language)
     try:
-        translated_text = translator.translate_text(text, target_lang=target_lang)
-    except deepl.DeepLException as e:
+        translated_text = call_with_retry(
+            lambda: deepl_provider.translate([text], deepl_lang)[0],
+            deepl_limiter, classify_deepl_error)
+        tm.put(text, translated_text, deepl_lang, deepl_provider.name)
+    except Exception as e:
         errorMessage = str(e)
         print(errorMessage)
         print('エラー発生：', count + 1, "行目の翻訳が上手くいっていません。")
+        return ""
     return translated_text
 
 
+# DeepL API に複数の文をまとめて 1 回のリクエストで送って翻訳（翻訳メモリは呼び出し側で引く）
+def translate_batch_Deepl(texts, count, language=None):
+    _, deepl_lang, _, _ = language_settings(language)
+    try:
+        translated_texts = call_with_retry(
+            lambda: deepl_provider.translate(texts, deepl_lang),
+            deepl_limiter, classify_deepl_error)
+    except Exception as e:
+        print(str(e))
+        print('エラー発生：', count + 1, "番目のDeepLバッチの翻訳が上手くいっていません。")
+        translated_texts = [""] * len(texts)
 
-# プレースホルダーに対するパターンを判別
-def extract_and_replace_patterns(value, patterns):
-    placeholders = []
-    placeholder_counter = 0
-    use_gpt = False
-    # 改行記号を |~ に置き換えてあげる
-    value = value.replace("\\n", " |~ ")
+    for text, translated_text in zip(texts, translated_texts):
+        tm.put(text, translated_text, deepl_lang, deepl_provider.name)
+    return translated_texts
 
-    def replacer(match):
-        nonlocal placeholder_counter
-        placeholder = f" #{placeholder_counter} "
-        placeholders.append((placeholder, match.group(0)))
-        placeholder_counter += 1
-        return placeholder
 
-    for pattern in patterns:
-        value = re.sub(pattern, replacer, value)
+# 過去の訳を新しい原文に合わせて直してもらう（失敗したら空文字を返す）
+def translate_edit_GPT(edit, count):
+    previous_source, previous_translation, new_source = edit
+    cache_text = "\n".join(edit)
+    cached = tm.get(cache_text, LangTo, gpt_provider.name + "_edit", edit_prompt_version)
+    if cached is not None:
+        return cached
 
-    if placeholder_counter > 0:
-        use_gpt = True
-    
-    return value, placeholders, use_gpt
+    messages = build_edit_messages(edit_prompt, previous_source, previous_translation, new_source)
+    try:
+        translated_text = call_with_retry(
+            lambda: gpt_provider.chat(messages),
+            gpt_limiter, classify_openai_error)
+    except Exception as e:
+        print(f"Error with OpenAI API call: {str(e)}")
+        print('エラー発生：', count + 1, "件目の訳の修正が上手くいっていません。")
+        return ""
+
+    # 改行を取り除く
+    translated_text = translated_text.strip().replace("\n", " ")
+    tm.put(cache_text, translated_text, LangTo, gpt_provider.name + "_edit", edit_prompt_version)
+    return translated_text
+
+
+# 過去の訳を使った訳（そのまま使う・直してもらう）を、翻訳後の検証（validator）と同じ基準で確認する
+# 新しい原文と関数・書式・タグ・改行記号が過不足なく一致しなければ使わない（前の原文の ~mission(Item3) が残っているなど）
+def is_valid_edit(new_source, translated_text):
+    return not check_value(new_source, translated_text)
 
 
-def restore_patterns(value, placeholders):
-    for placeholder, original in placeholders:
-        value = value.replace(placeholder, original)
-    return value
+# 過去の訳に近い文を GPT に直してもらい、確認を通った訳だけを {key: 訳} で返す
+def translate_edits(edits, sources):
+    keys = list(edits)
+    tasks = [("gpt", (edits[key][0], edits[key][1], sources[key])) for key in keys]
+    results = dispatch_translations(tasks, {"gpt": translate_edit_GPT}, {"gpt": gpt_concurrency})
+    return {key: translated_text for key, translated_text in zip(keys, results)
+            if translated_text and is_valid_edit(sources[key], translated_text)}
 
 
+# 1 文ずつの翻訳をプロバイダーに振り分けるルーター（GPT で失敗したら DeepL、DeepL で失敗したら GPT で翻訳し直す）
+# 翻訳メモリに訳があれば API を呼ばずに返し、レイテンシには数えない
+router = ProviderRouter({"gpt": translate_text_GPT, "deepl": translate_text_Deepl},
+                        hedge_percentile=hedge_percentile,
+                        max_hedge_workers=2 * (gpt_concurrency + deepl_concurrency),
+                        lookups={"gpt": cached_text_GPT, "deepl": cached_text_Deepl})
+
+
+# job は (マスク済みの文, 言語コード)
+def translate_text_routed(job, count):
+    text, language = job
+    return router.translate(text, count, "gpt", language=language)
+
+
+# DeepL のバッチを翻訳し、失敗した文はルーター経由でほかのプロバイダーで翻訳し直す
+# batch は (マスク済みの文のリスト, 言語コード)
+def translate_batch_routed(batch, count):
+    texts, language = batch
+    translated_texts = [cached_text_Deepl(text, language) for text in texts]
+    pending = [i for i, translated_text in enumerate(translated_texts) if translated_text is None]
+    # DeepL が続けて失敗している間は、翻訳メモリに無い文を 1 文ずつほかのプロバイダーで翻訳する
+    if pending and router.choose("deepl") == "deepl":
+        start = time.perf_counter()
+        results = translate_batch_Deepl([texts[i] for i in pending], count, language)
+        # 翻訳メモリから返した分は数えず、API を呼んだときだけ記録する
+        router.record("deepl", all(results), time.perf_counter() - start)
+        for i, translated_text in zip(pending, results):
+            translated_texts[i] = translated_text
+    return [translated_text or router.translate(text, count, "gpt", exclude=("deepl",), language=language)
+            for text, translated_text in zip(texts, translated_texts)]
+
+
+# GPT は 1 文ずつ、DeepL はバッチにまとめて並行に翻訳する
+def translate_jobs(jobs, on_result=None):
+    """
+    (マスク済みの文, use_gpt) か (マスク済みの文, use_gpt, 言語コード) のリストを受け取り、同じ順番で翻訳結果のリストを返す関数
+    どちらのプロバイダーで翻訳するかは route_rules で決める。言語の違うジョブも 1 回の dispatch でまとめて翻訳する
+    on_result(index, translated) を渡すと、1 件終わるごとに呼び出す
+    """
+    languages = [job[2] if len(job) > 2 else None for job in jobs]
+    routes = [route_by_rules(route_rules, job[0], job[1], "deepl") for job in jobs]
+    gpt_indices = [i for i, route in enumerate(routes) if route == "gpt"]
+    deepl_indices = [i for i, route in enumerate(routes) if route != "gpt"]
+    # DeepL は 1 回のリクエストで 1 つの言語にしか翻訳できないので、言語ごとにバッチを作る
+    deepl_batches = []
+    for language in dict.fromkeys(languages[i] for i in deepl_indices):
+        indices = [i for i in deepl_indices if languages[i] == language]
+        deepl_batches += [[indices[j] for j in batch] for batch in pack_deepl_batches([jobs[i][0] for i in indices])]
+
+    tasks = [("gpt", (jobs[i][0], languages[i])) for i in gpt_indices]
+    tasks += [("deepl", ([jobs[i][0] for i in batch], languages[batch[0]])) for batch in deepl_batches]
+
+    def task_done(task_index, result):
+        if on_result is None:
+            return
+        if task_index < len(gpt_indices):
+            on_result(gpt_indices[task_index], result)
+        else:
+            for i, translated_value in zip(deepl_batches[task_index - len(gpt_indices)], result):
+                on_result(i, translated_value)
 
-# txt ファイルを読み込み
+    # プロバイダーごとに同時リクエスト数を制限しながら並行に翻訳を実行
+    results = dispatch_translations(
+        tasks,
+        {"gpt": translate_text_routed, "deepl": translate_batch_routed},
+        {"gpt": gpt_concurrency, "deepl": deepl_concurrency},
+        on_result=task_done,
+    )
+
+    translated_values = [None] * len(jobs)
+    for i, translated_value in zip(gpt_indices, results):
+        translated_values[i] = translated_value
+    for batch, batch_values in zip(deepl_batches, results[len(gpt_indices):]):
+        for i, translated_value in zip(batch, batch_values):
+            translated_values[i] = translated_value
+    return translated_values
+
+
+
+# txt ファイルを読み込み（BOM を key に含めないように ini_stream で読む）
 def read_txt_as_dict(txt_path):
-    data_dict = {}
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.strip()
-            if '=' in line:
-                key, value = line.split('=', 1)
-                data_dict[key] = value
-    return data_dict
+    return read_ini_dict(txt_path)
 
 
 # 中国語の global.ini.txt から触っちゃいけない key を判別する。
+# 参照リソースのハッシュごとに索引をキャッシュしておき、2 回目以降は索引を読むだけにする（ファイルが無ければ空のリスト）
 def extract_keys_without_chinese_characters(version):
-    # テキストファイルを読み取る
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    txt_path = os.path.join(script_dir, '..', version, 'global_cn.ini.txt')
+    return load_protected_keys(reference_path(version, "cn"), "cn")
 
-    # ファイルが存在するかチェック
-    if not os.path.exists(txt_path):
-        print(f"File {txt_path} does not exist!")
-        return
 
-    # ファイルを読み込む
-    try:
-        data_dict = read_txt_as_dict(txt_path)
-    except Exception as e:
-        print(f"Error reading {txt_path}: {str(e)}")
-        return
-    
-    keys_without_chinese = []
-    for key, value in data_dict.items():
-        if not re.search(r'[\u4e00-\u9fff]', value):
-            keys_without_chinese.append(key)
-    
-    return keys_without_chinese
+
+# 翻訳結果のプレースホルダーと改行記号を元に戻す（glossary を渡すと、用語は決まった訳に差し替える）
+# 改行記号は GPT・DeepL のどちらの訳にも入っているので、どちらで翻訳したかに関係なく戻す
+def finalize_translation(translated_value, placeholders, glossary=None):
+    if glossary is not None:
+        placeholders = glossary.force(placeholders)
+    return masking_engine.restore(translated_value, placeholders)
 
 
+# 言語ごとの書き出し先（既定の言語はそのまま、それ以外は translated_global_ko.ini.txt のように言語コードを付ける）
+def language_output_path(path, language):
+    if language == DEFAULT_LANGUAGE:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, rest = name.partition('.')
+    return os.path.join(directory, f"{stem}_{language}{dot}{rest}")
+
 
 # main処理
-def translate_ini_file(version):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    txt_path = os.path.join(script_dir, '..', version, 'global_en.ini.txt')
-    
-    # ファイルが存在するかチェック
-    if not os.path.exists(txt_path):
-        print(f"File {txt_path} does not exist!")
+def translate_ini_file(version, previous_version=None, resume=False, workers=None, source_path=None, output_path=None,
+                       progress=False, metrics_path=None, fuzzy_references=None, requeue_keys=None, languages=None,
+                       glossary_path=DEFAULT_GLOSSARY_PATH):
+    """
+    version フォルダの global_en.ini.txt を翻訳して translated_global.ini.txt に書き出す関数
+    source_path / output_path を渡すと、別の場所のファイル（分割済みファイルのリストも可）を翻訳して書き出す
+    段階ごとの時間・レイテンシ・使用量・概算費用を translated_global.metrics.json（metrics_path）に書き出し、その辞書を返す
+    progress=True なら翻訳の進み具合を 1 行で表示する
+    fuzzy_references（[(英語原文, 日本語訳), ...]）の過去の訳に近い文は、そのまま使うか GPT に直してもらう
+    省略して previous_version を渡した場合は前バージョンの訳を使う
+    requeue_keys を渡すと、その key だけを翻訳し直す（それ以外は書き出し先にある前回の訳をそのまま使う）
+    書き出した後に原文と照合し、翻訳し直すべき key を translated_global.failed_keys.txt に書き出す
+    languages（["ja", "ko", ...]）を渡すと、読み込み・スキップ判定・マスク・重複除去は 1 回だけ行い、
+    全言語のジョブを同じ dispatch で翻訳して言語ごとのファイル（translated_global_ko.ini.txt など）に書き出す
+    過去の訳（fuzzy_references）は既定の言語（日本語）にだけ使う
+    use_glossary が True なら、原文の名前の key と glossary_path（"英語<TAB>訳"）から用語集を作り、
+    文の中の用語はプレースホルダーにして翻訳させない（既定の言語では決まった訳に差し替える）
+    """
+    languages = list(dict.fromkeys(languages or [DEFAULT_LANGUAGE]))
+    unknown = [language for language in languages if language not in TARGET_LANGUAGES]
+    if unknown:
+        print(f"Unknown language: {', '.join(unknown)} （{', '.join(TARGET_LANGUAGES)} から選んでください）")
         return
 
+    timer = StageTimer()
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    txt_path = source_path or os.path.join(script_dir, '..', version, 'global_en.ini.txt')
+    translated_file_path = output_path or os.path.join(script_dir, '..', version, 'translated_global.ini.txt')
+
+    # ファイルが存在するかチェック（無ければ分割済みの global_en_00, global_en_01... を順番に使う）
+    if source_path is None and not os.path.exists(txt_path):
+        split_paths = find_split_files(os.path.join(script_dir, '..', version))
+        if not split_paths:
+            print(f"File {txt_path} does not exist!")
+            return
+        txt_path = split_paths
+
     # ファイルを読み込む
+    # 原文は {key: 値} として全部読み込んでから翻訳を始める（同じ文の重複除去・過去の訳との照合・
+    # 複数言語の dispatch は全部の行がそろっていないとできない）。流し読みするのは書き出しの側だけで、
+    # 書き出しは原文を 1 行ずつ読み直して訳を差し込むので、元の行（raw_line）はメモリに持たない
     try:
-        data_dict = read_txt_as_dict(txt_path)
+        with timer.stage("load"):
+            data_dict = read_txt_as_dict(txt_path)
     except Exception as e:
         print(f"Error reading {txt_path}: {str(e)}")
         return
+    sources = data_dict
+
+    if requeue_keys is not None:
+        requeue_keys = set(requeue_keys)
+
+    # 言語ごとの書き出し先・引き継ぐ訳・ジャーナル・翻訳が必要な key
+    targets = {}
+    diff_printed = False
+    for language in languages:
+        label = f"[{language}] " if len(languages) > 1 else ""
+        output = language_output_path(translated_file_path, language)
+        # 書き換える key → 翻訳結果（ここに無い行は元のファイルの行をそのまま書き出す）
+        translations = {}
+
+        # 前バージョンが指定されていれば、追加・変更された key だけを翻訳して残りは前の訳を引き継ぐ
+        incremental_keys = None
+        if previous_version:
+            with timer.stage("load"):
+                carried, incremental_keys, diff = plan_incremental(
+                    data_dict, previous_version, language_output_path(PREVIOUS_JA_NAME, language))
+            if diff is not None and not diff_printed:
+                print_diff_summary(diff)
+                diff_printed = True
+            translations.update(carried)
+
+        # 検証で弾かれた key だけを翻訳し直すときは、前回書き出したファイルの訳を引き継ぐ
+        if requeue_keys is not None and os.path.exists(output):
+            with timer.stage("load"):
+                previous_output = read_txt_as_dict(output)
+            translations.update({key: value for key, value in previous_output.items()
+                                 if key in data_dict and key not in requeue_keys and value != data_dict[key]})
+
+        # 翻訳が終わった key を逐次書き出すジャーナル（--resume で途中から再開できる）
+        # translated_global.ini.txt なら translated_global.journal.jsonl
+        output_stem = os.path.join(os.path.dirname(output), os.path.basename(output).split('.')[0])
+        journal = TranslationJournal(output_stem + '.journal.jsonl', resume=resume)
+        with timer.stage("load"):
+            journaled = journal.load(sources) if resume else {}
+        if resume:
+            print(label + "ジャーナルから再開した key の数")
+            print(len(journaled))
+
+        # 前バージョンから訳を引き継いだ key と、前回の実行で翻訳済みの key は翻訳しない
+        needed = {key for key in data_dict
+                  if (incremental_keys is None or key in incremental_keys)
+                  and (requeue_keys is None or key in requeue_keys) and key not in journaled}
+        targets[language] = {"label": label, "output": output, "output_stem": output_stem,
+                             "translations": translations, "journal": journal, "journaled": journaled,
+                             "needed": needed, "fuzzy_reused": {}, "fuzzy_edited": {},
+                             "translated": 0, "gpt": 0, "deepl": 0, "glossary_only": 0, "failed_keys": []}
 
     # 特殊なkeyを翻訳しないようにする条件
-    skip_keywords = extract_keys_without_chinese_characters(version)
+    with timer.stage("skip-filter"):
+        skip_keywords = extract_keys_without_chinese_characters(version)
 
     skip_valuewords = {'@','blah','---------------------'}
 
-    # 翻訳してはいけないプレースホルダーを取得する正規表現を保存
-    patterns = [
-        r'~mission\([\w|]+\)',
-        r'~RefineryMethod\(\w+\)',
-        r'~action\(\w+\)',
-        r'~shopInteractionData\(\w+\)',
-        r'~serviceBeacon\(\w+\)',
-        r'ID#\s+\w+',
-        r'[\w\s]+:\s[^\n]+',
-        r'%\w+',
-        r'WIP',
-        r'\<[^>]*\>',
-        r'\[[^\]]*\]', 
-        r'\([^)]*\)',
-        r'.*;.*',          # ;で終わる行
-        r'.*=.*',          # =での代入
-        r'.*\{.*',         # 開始ブレース
-        r'.*\}.*',         # 終了ブレース
-        r'\bif\b',         # if文
-        r'\bfor\b',        # forループ
-        r'\bwhile\b',      # whileループ
-        r'\bint\b',        # int型
-        r'\bfloat\b',      # float型
-        r'\bdouble\b',     # double型
-    ]
-
-    translation_count = 0  # 翻訳するべき行のカウンタを初期化
-    gpt_count = 0
-    deepl_count = 0
-
-    for key, value in data_dict.items():
-
-        use_gpt = False
-        # keyに特定のキーワードが含まれている場合、翻訳をスキップ
-        if any(keyword in key for keyword in skip_keywords):
-            continue
-
-        # valueが特定の文字列を含む場合、翻訳をスキップ
-        if any(valueword in value for valueword in skip_valuewords):
-            continue
-
-        # パターンマッチングで翻訳するべきものを分ける
-        value_with_placeholders, placeholders, use_gpt = extract_and_replace_patterns(value, patterns)
-
-        # ここで順次的に翻訳を実行
-        if use_gpt == True:
-            translated_value = translate_text_GPT(value_with_placeholders,translation_count)
-            # 改行記号のプレースホルダーの置き換え修正
-            translated_value = translated_value.replace(" |~ ", "\\n")
-            gpt_count += 1
-        else:
-            translated_value = translate_text_Deepl(value_with_placeholders,translation_count)
-            deepl_count += 1
-        final_value = restore_patterns(translated_value, placeholders)
-
-        # プレースホルダー置換テスト
-        # final_value = value_with_placeholders
-        data_dict[key] = final_value
-
-        translation_count += 1
-
-    # 翻訳後の内容を新しいファイルに保存
+    # 用語集は全言語で同じものを使う（マスクはワーカープロセスの中で行う）
+    with timer.stage("glossary"):
+        glossary = load_glossary(sources, glossary_path=glossary_path) if use_glossary else Glossary()
+    if len(glossary):
+        print("用語集の用語の数 / 決まった訳のある用語の数")
+        print(len(glossary), len(glossary.forced))
+
+    # どれかの言語で翻訳が必要な key だけを、全言語で 1 回だけマスクする
+    records = [(key, value) for key, value in data_dict.items()
+               if any(key in target["needed"] for target in targets.values())]
+
+    # スキップ判定・マスク・検証は連続した塊に分けてプロセスプールで並列に行う（順番はそのまま）
+    jobs, invalid_keys = prepare_jobs(records, skip_keywords, skip_valuewords, workers=workers, timer=timer,
+                                      glossary_terms=glossary.terms)
+    if invalid_keys:
+        print("マスクを戻しても元の文にならないため英語のまま残す key の数")
+        print(len(invalid_keys))
+
+    # 用語だけの文（"ArcCorp" など）は翻訳に出さず、決まった訳（無ければ英語のまま）をその場で書き込む
+    term_only_jobs = [job for job in jobs if glossary.term_only(job[1], job[2])]
+    if term_only_jobs:
+        jobs = [job for job in jobs if not glossary.term_only(job[1], job[2])]
+        for language, target in targets.items():
+            for key, masked, placeholders, _ in term_only_jobs:
+                if key in target["needed"]:
+                    target["journal"].record(key, sources[key], finalize_translation(
+                        masked, placeholders, glossary if language == DEFAULT_LANGUAGE else None))
+                    target["needed"].discard(key)
+                    target["glossary_only"] += 1
+        print("用語だけなので翻訳しなかった文の数")
+        print(len(term_only_jobs))
+
+    # 過去の訳と完全に同じ文・数字だけが違う文はその訳を使い、よく似た文（GPT で翻訳するもの）は訳を直してもらう
+    # DeepL の文はまとめて翻訳した方が安いので、直してもらうのは GPT の文だけ
+    # 過去の訳は日本語なので、既定の言語にだけ使う
+    if fuzzy_references is None and previous_version:
+        fuzzy_references = fuzzy_references_for(previous_version)
+    fuzzy_target = targets.get(DEFAULT_LANGUAGE)
+    if fuzzy_references and jobs and fuzzy_target is not None:
+        fuzzy_jobs = [job for job in jobs if job[0] in fuzzy_target["needed"]]
+        with timer.stage("fuzzy"):
+            fuzzy_index = build_fuzzy_index(fuzzy_references)
+            fuzzy_reused, edits = plan_fuzzy({key: sources[key] for key, _, _, _ in fuzzy_jobs}, fuzzy_index,
+                                             edit_keys={key for key, _, _, use_gpt in fuzzy_jobs if use_gpt})
+            fuzzy_reused = {key: translated_value for key, translated_value in fuzzy_reused.items()
+                            if is_valid_edit(sources[key], translated_value)}
+            fuzzy_edited = translate_edits(edits, sources)
+        for key, translated_value in list(fuzzy_reused.items()) + list(fuzzy_edited.items()):
+            fuzzy_target["journal"].record(key, sources[key], translated_value)
+        fuzzy_target["needed"] -= set(fuzzy_reused) | set(fuzzy_edited)
+        fuzzy_target["fuzzy_reused"], fuzzy_target["fuzzy_edited"] = fuzzy_reused, fuzzy_edited
+        jobs = [job for job in jobs if any(job[0] in target["needed"] for target in targets.values())]
+        print(fuzzy_target["label"] + "過去の訳をそのまま使った数 / 直してもらった数")
+        print(len(fuzzy_reused), len(fuzzy_edited))
+
+    # 同じ文は 1 回だけ翻訳して、同じ文を持つすべての key に配る
+    unique_jobs, groups = group_by_source([(text, use_gpt) for _, text, _, use_gpt in jobs])
+    print_dedup_report(len(jobs), len(unique_jobs))
+
+    # 言語ごとに、翻訳が必要な key を含む文だけをジョブにして、全言語分を 1 回の dispatch にまとめる
+    dispatch_jobs = []
+    dispatch_index = []  # dispatch のジョブ → (言語コード, 重複を除いたジョブの番号)
+    for language, target in targets.items():
+        for unique_index, (text, use_gpt) in enumerate(unique_jobs):
+            if any(jobs[i][0] in target["needed"] for i in groups[unique_index]):
+                dispatch_jobs.append((text, use_gpt, language))
+                dispatch_index.append((language, unique_index))
+    if len(languages) > 1:
+        print(f"{len(languages)} 言語の翻訳ジョブの合計")
+        print(len(dispatch_jobs))
+
+    progress_line = ProgressLine(len(dispatch_jobs)) if progress else None
+
+    # 1 件終わるごとにその言語のジャーナルへ書き出す（翻訳に失敗した空の結果は書かない）
+    def record(dispatch_position, translated_value):
+        if progress_line is not None:
+            progress_line.update()
+        if not translated_value:
+            return
+        language, unique_index = dispatch_index[dispatch_position]
+        target = targets[language]
+        for i in groups[unique_index]:
+            key, _, placeholders, _ = jobs[i]
+            if key not in target["needed"]:
+                continue
+            start = time.perf_counter()
+            finalized = finalize_translation(translated_value, placeholders,
+                                             glossary if language == DEFAULT_LANGUAGE else None)
+            timer.add("restore", time.perf_counter() - start)
+            target["journal"].record(key, sources[key], finalized)
+
+    with ExitStack() as journals:
+        for target in targets.values():
+            journals.enter_context(target["journal"])
+        # dispatch の時間には、結果が届くたびに行う restore とジャーナルへの書き出しも含まれる
+        with timer.stage("dispatch"):
+            results = translate_jobs(dispatch_jobs, on_result=record)
+        if progress_line is not None:
+            progress_line.close()
+
+        unique_results = {language: [None] * len(unique_jobs) for language in targets}
+        for (language, unique_index), translated_value in zip(dispatch_index, results):
+            unique_results[language][unique_index] = translated_value
+
+        for language, target in targets.items():
+            translated_values = fan_out(unique_results[language], groups, len(jobs))
+            for (key, _, _, use_gpt), translated_value in zip(jobs, translated_values):
+                if key not in target["needed"]:
+                    continue
+                if use_gpt == True:
+                    target["gpt"] += 1
+                else:
+                    target["deepl"] += 1
+                if not translated_value:
+                    print(target["label"] + 'エラー発生：', key, "の翻訳が上手くいっていません。英語のまま残します。")
+                target["translated"] += 1
+
+            # 最終的なファイルはジャーナルから組み立てる
+            target["translations"].update(target["journal"].load(sources))
+
+    for target in targets.values():
+        translated_file_path = target["output"]
+        # 元のファイルを 1 行ずつ読みながら翻訳を差し込んで保存（触っていない行はバイト単位でそのまま）
+        try:
+            with timer.stage("write"):
+                write_translated_ini(txt_path, translated_file_path, target["translations"], bom=True)
+        except Exception as e:
+            print(f"Error writing to {translated_file_path}: {str(e)}")
+
+        # プレースホルダーや改行の数が原文と合わない key を書き出す（--requeue で翻訳し直せる）
+        try:
+            with timer.stage("validate"):
+                report = validate_files(txt_path, translated_file_path, workers=workers)
+            target["failed_keys"] = failing_keys(report)
+            print_report(report, limit=10)
+            write_failing_keys(target["failed_keys"], target["output_stem"] + '.failed_keys.txt')
+        except Exception as e:
+            print(f"Error validating {translated_file_path}: {str(e)}")
+
+        print(target["label"] + "処理の回数")
+        print(target["translated"])
+        print(target["label"] + "gptを使った回数")
+        print(target["gpt"])
+        print(target["label"] + "deeplを使った回数")
+        print(target["deepl"])
+    print("翻訳メモリのヒット数")
+    print(tm.hits)
+
+    # 段階ごとの時間・レイテンシ・使用量・概算費用・キャッシュのヒット率を JSON で書き出す
+    def total(field):
+        return sum(len(target[field]) if isinstance(target[field], (dict, list)) else target[field]
+                   for target in targets.values())
+
+    counts = {"lines": len(data_dict), "translated": total("translated"), "gpt": total("gpt"), "deepl": total("deepl"),
+              "unique": len(unique_jobs), "journaled": total("journaled"), "invalid": len(invalid_keys),
+              "fuzzy_reused": total("fuzzy_reused"), "fuzzy_edited": total("fuzzy_edited"),
+              "failovers": router.failovers, "hedged": router.hedged, "failed_validation": total("failed_keys"),
+              "glossary_terms": len(glossary), "glossary_only": total("glossary_only")}
+    if len(languages) > 1:
+        counts["dispatched"] = len(dispatch_jobs)
+    summary = build_summary(timer, gpt_provider, deepl_provider, gpt_model, tm, counts)
+    if len(languages) > 1:
+        summary["languages"] = {language: {"output": target["output"], "translated": target["translated"],
+                                           "gpt": target["gpt"], "deepl": target["deepl"],
+                                           "failed_validation": len(target["failed_keys"])}
+                                for language, target in targets.items()}
+    print_stage_summary(summary)
     try:
-        translated_file_path = os.path.join(script_dir, '..', version, 'translated_global.ini.txt')
-        with open(translated_file_path, 'w', encoding='utf-8-sig', newline='\n') as translated_file:
-            for k, v in data_dict.items():
-                translated_file.write(f"{k}={v}\n")
+        write_summary(summary, metrics_path or targets[languages[0]]["output_stem"] + '.metrics.json')
     except Exception as e:
-        print(f"Error writing to translated_global.ini.txt: {str(e)}")
-
-    print("処理の回数")
-    print(translation_count)
-    print("gptを使った回数")
-    print(gpt_count)
-    print("deeplを使った回数")
-    print(deepl_count)
-
+        print(f"Error writing metrics: {str(e)}")
+    return summary
 
 if __name__ == '__main__':
     # if len(sys.argv) < 2:
@@ -249,4 +619,16 @@ if __name__ == '__main__':
     #     version = sys.argv[1]
     #     translate_ini_file(version)
 
-    translate_ini_file('v3.20.0b')
\ No newline at end of file
+    # 第2引数に前バージョンを渡すと差分翻訳、--resume を付けると前回の続きから翻訳する
+    # --progress を付けると進み具合を 1 行で表示する
+    # --languages=ja,ko,fr を付けると、複数の言語にまとめて翻訳する
+    resume = '--resume' in sys.argv
+    progress = '--progress' in sys.argv
+    languages = next((arg.split('=', 1)[1].split(',') for arg in sys.argv if arg.startswith('--languages=')), None)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) >= 2:
+        translate_ini_file(args[0], args[1], resume=resume, progress=progress, languages=languages)
+    elif len(args) == 1:
+        translate_ini_file(args[0], resume=resume, progress=progress, languages=languages)
+    else:
+        translate_ini_file('v3.20.0b', resume=resume, progress=progress, languages=languages)
\ No newline at end of file
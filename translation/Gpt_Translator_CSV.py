@@ -1,22 +1,26 @@
 # -*- coding:utf-8 -*-
 
-import configparser
-import re
 import sys
 import os
-import openai
-import deepl
 from dotenv import load_dotenv
-from WIP_csv_for_key import contains_japanese, extract_english_keys_from_csv
+from WIP_csv_for_key import extract_english_keys_from_csv
+from translation_memory import TranslationMemory, prompt_version
+from rate_limiter import limiter_for, call_with_retry, classify_openai_error, classify_deepl_error
+from skip_filter import load_or_build_filter
+from protected_keys import load_protected_keys, reference_path
+from masking import MaskingEngine
+from ini_stream import read_ini_dict, write_translated_ini
+from providers import create_providers, DEFAULT_GPT_MODEL
 
 load_dotenv()  # .env ファイルから環境変数を読み込む
-openai_api_key = os.getenv("OPENAI_API_KEY")
-deepl_api_key = os.getenv("DEEPL_API_KEY")
 
-# OpenAI APIキーを設定します
-openai.api_key = openai_api_key
-# DeepL API の設定
-translator = deepl.Translator(deepl_api_key)
+# OpenAI のモデル（環境変数 OPENAI_MODEL で変えられる）
+gpt_model = os.getenv("OPENAI_MODEL", DEFAULT_GPT_MODEL)
+# 翻訳プロバイダー（既定は API を呼ばずに _GPT / _Deepl を付けて返す dummy。
+# 本番は TRANSLATOR_PROVIDER=sdk、モックサーバーで試すときは TRANSLATOR_PROVIDER=http にする）
+gpt_provider, deepl_provider = create_providers(os.getenv("TRANSLATOR_PROVIDER", "dummy"), model=gpt_model)
+# 翻訳メモリ（過去に翻訳した文はAPIを呼ばずに再利用する）
+tm = TranslationMemory()
 
 # OpenAI 翻訳の前後
 LangFrom = "English"    # 翻訳前
@@ -25,8 +29,17 @@ LangTo   = "Japanese"   # 翻訳語
 # DeepL 翻訳先
 target_lang = "JA"
 
+# プロバイダーごとのリクエスト数/秒（429 が返ってきたら自動で下げ、成功が続けば max まで上げる）
+gpt_rate   = 3
+gpt_max_rate   = 50
+deepl_rate = 2
+deepl_max_rate = 10
+gpt_limiter   = limiter_for(gpt_provider, gpt_rate, max_rate=gpt_max_rate)
+deepl_limiter = limiter_for(deepl_provider, deepl_rate, max_rate=deepl_max_rate)
+
 # 初期プロンプト
 initial_prompt = f'You are a helpful assistant that translates {LangFrom} to {LangTo}. Retain proper nouns and specialized terms in their original English form. Keep placeholders in the format "<[number]>" (e.g., "<0>", "<1>", "<2>", ..., and so on) or "<>" or "%I" of "%Is" unchanged.'
+gpt_prompt_version = prompt_version(initial_prompt, gpt_model)
 
 
 # chat GPT 節約のためのバッチ処理を削除して、順次翻訳をする関数に変更
@@ -34,10 +47,9 @@ def translate_text_GPT(text,count):
     """
     単一の文章を受け取り、翻訳を実行し、翻訳結果を返す関数
     """
-
-    dammy=True
-    if dammy:
-        return text + "_GPT"
+    cached = tm.get(text, LangTo, gpt_provider.name, gpt_prompt_version)
+    if cached is not None:
+        return cached
 
     messages = [
         {"role": "system", "content": initial_prompt},
@@ -45,103 +57,48 @@ def translate_text_GPT(text,count):
     ]
 
     try:
-        response = openai.ChatCompletion.create(
-          model="gpt-3.5-turbo",
-          messages=messages
-        )
-        translated_text = response['choices'][0]['message']['content']
-    except openai.error.OpenAIError as e:
+        # レート制限に合わせて待ち、429 や一時的なエラーは再試行する
+        translated_text = call_with_retry(
+            lambda: gpt_provider.chat(messages),
+            gpt_limiter, classify_openai_error)
+    except Exception as e:
         print(f"Error with OpenAI API call: {str(e)}")
         print('エラー発生：', count + 1, "行目のGPT翻訳が上手くいっていません。")
         return ""
     
+    tm.put(text, translated_text, LangTo, gpt_provider.name, gpt_prompt_version)
     return translated_text
 
 
 # DeepL API を使って翻訳
 def translate_text_Deepl(text,count):
-
-    dammy=True
-    if dammy:
-        return text + "_Deepl"
+    cached = tm.get(text, target_lang, deepl_provider.name)
+    if cached is not None:
+        return cached
 
     try:
-        translated_text = translator.translate_text(text, target_lang=target_lang)
-    except deepl.DeepLException as e:
+        translated_text = call_with_retry(
+            lambda: deepl_provider.translate([text], target_lang)[0],
+            deepl_limiter, classify_deepl_error)
+        tm.put(text, translated_text, target_lang, deepl_provider.name)
+    except Exception as e:
         errorMessage = str(e)
         print(errorMessage)
         print('エラー発生：', count + 1, "行目のdeepl翻訳が上手くいっていません。")
+        return ""
     return translated_text
 
 
 
-# プレースホルダーに対するパターンを判別
-def extract_and_replace_patterns(value, patterns):
-    placeholders = []
-    placeholder_counter = 0
-    use_gpt = False
-    # 改行記号を <> に置き換えてあげる
-    value = value.replace("\\n", "<>")
-
-    def replacer(match):
-        nonlocal placeholder_counter
-        placeholder = f"<{placeholder_counter}>"
-        placeholders.append((placeholder, match.group(0)))
-        placeholder_counter += 1
-        return placeholder
-
-    for pattern in patterns:
-        value = re.sub(pattern, replacer, value)
-
-    if placeholder_counter > 0:
-        use_gpt = True
-    
-    return value, placeholders, use_gpt
-
-
-def restore_patterns(value, placeholders):
-    for placeholder, original in placeholders:
-        result = value.replace(placeholder, original)
-    return result
-
-
-
-# txt ファイルを読み込み
+# txt ファイルを読み込み（BOM を key に含めないように ini_stream で読む）
 def read_txt_as_dict(txt_path):
-    data_dict = {}
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.strip()
-            if '=' in line:
-                key, value = line.split('=', 1)
-                data_dict[key] = value
-    return data_dict
+    return read_ini_dict(txt_path)
 
 
 # 中国語の global.ini.txt から触っちゃいけない key を判別する。
+# 参照リソースのハッシュごとに索引をキャッシュしておき、2 回目以降は索引を読むだけにする（ファイルが無ければ空のリスト）
 def extract_keys_without_chinese_characters(version):
-    # テキストファイルを読み取る
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    txt_path = os.path.join(script_dir, '..', version, 'global_cn.ini.txt')
-
-    # ファイルが存在するかチェック
-    if not os.path.exists(txt_path):
-        print(f"File {txt_path} does not exist!")
-        return
-
-    # ファイルを読み込む
-    try:
-        data_dict = read_txt_as_dict(txt_path)
-    except Exception as e:
-        print(f"Error reading {txt_path}: {str(e)}")
-        return
-    
-    keys_without_chinese = []
-    for key, value in data_dict.items():
-        if not re.search(r'[\u4e00-\u9fff]', value):
-            keys_without_chinese.append(key)
-    
-    return keys_without_chinese
+    return load_protected_keys(reference_path(version, "cn"), "cn")
 
 
 
@@ -163,7 +120,7 @@ def translate_ini_file(version):
         return
 
     # 特殊なkeyを翻訳しないようにする条件
-    skip_keywords = extract_keys_without_chinese_characters(version)
+    skip_keywords = load_or_build_filter(extract_keys_without_chinese_characters(version))
 
     skip_valuewords = {'@','blah','---------------------'}
 
@@ -192,11 +149,14 @@ def translate_ini_file(version):
         r'\bfloat\b',      # float型
         r'\bdouble\b'     # double型
     ]
+    # プレースホルダーを <0>, <1>... 、改行記号を <> でマスクするエンジン
+    masking_engine = MaskingEngine(patterns, placeholder_format="<{}>", newline_token="<>")
 
     # WIP_ini.csv より、翻訳済みのデータをスルーして翻訳していない場所にだけアプローチする
     csv_path = os.path.join(script_dir, '..', version, 'WIP_ini.csv')
     # 翻訳していないkey, 未翻訳文リスト, 翻訳済みリスト
     english_keys, trans_values, jap = extract_english_keys_from_csv(csv_path)
+    english_key_filter = load_or_build_filter(english_keys)
 
     translation_count = 0  # 翻訳するべき行のカウンタを初期化
     gpt_count = 0
@@ -206,11 +166,11 @@ def translate_ini_file(version):
 
         use_gpt = False
         # keyに特定のキーワードが含まれている場合、翻訳をスキップ
-        if any(keyword in key for keyword in skip_keywords):
+        if skip_keywords.matches(key):
             continue
 
         # 翻訳済みでない Key 以外は翻訳をスキップ
-        if not any(transkeyword in key for transkeyword in english_keys):
+        if not english_key_filter.matches(key):
             continue
 
         # valueが特定の文字列を含む場合、翻訳をスキップ
@@ -219,18 +179,17 @@ def translate_ini_file(version):
 
 
         # パターンマッチングで翻訳するべきものを分ける
-        value_with_placeholders, placeholders, use_gpt = extract_and_replace_patterns(value, patterns)
+        value_with_placeholders, placeholders, use_gpt = masking_engine.mask(value)
 
         # ここで順次的に翻訳を実行
         if use_gpt == True:
             translated_value = translate_text_GPT(value_with_placeholders,translation_count)
-            # 改行記号のプレースホルダーの置き換え修正
-            translated_value = translated_value.replace("<>", "\\n")
-            translated_value = restore_patterns(translated_value, placeholders)
             gpt_count += 1
         else:
             translated_value = translate_text_Deepl(value_with_placeholders,translation_count)
             deepl_count += 1
+        # プレースホルダーと改行記号（<>）を元に戻す
+        translated_value = masking_engine.restore(translated_value, placeholders)
 
         # プレースホルダー置換テスト
         # final_value = value_with_placeholders
@@ -241,9 +200,8 @@ def translate_ini_file(version):
     # 翻訳後の内容を新しいファイルに保存
     try:
         translated_file_path = os.path.join(script_dir, '..', version, 'translated_global.ini.txt')
-        with open(translated_file_path, 'w', encoding='utf-8-sig', newline='\n') as translated_file:
-            for k, v in data_dict.items():
-                translated_file.write(f"{k}={v}\n")
+        # 元のファイルを 1 行ずつ読みながら翻訳を差し込んで保存（触っていない行はそのまま）
+        write_translated_ini(txt_path, translated_file_path, data_dict, bom=True)
     except Exception as e:
         print(f"Error writing to translated_global.ini.txt: {str(e)}")
 
@@ -253,13 +211,13 @@ def translate_ini_file(version):
     print(gpt_count)
     print("deeplを使った回数")
     print(deepl_count)
+    print("翻訳メモリのヒット数")
+    print(tm.hits)
 
 
 if __name__ == '__main__':
-    # if len(sys.argv) < 2:
-    #     print("Please provide the version as an argument.")
-    # else:
-    #     version = sys.argv[1]
-    #     translate_ini_file(version)
-
-    translate_ini_file('v3.20.0b')
\ No newline at end of file
+    # 第1引数に version フォルダを渡す（省略時は v3.20.0b）。オプションを付けたいときは cli.py translate を使う
+    if len(sys.argv) >= 2:
+        translate_ini_file(sys.argv[1])
+    else:
+        translate_ini_file('v3.20.0b')
\ No newline at end of file
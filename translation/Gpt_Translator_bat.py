@@ -1,98 +1,85 @@
 # -*- coding:utf-8 -*-
 
-import configparser
-import re
 import sys
 import os
-import openai
 from dotenv import load_dotenv
+from translation_memory import TranslationMemory, prompt_version
+from rate_limiter import limiter_for, call_with_retry, classify_openai_error
+from masking import MaskingEngine
+from ini_stream import read_ini_dict, write_translated_ini
+from gpt_json_batch import build_batch_prompt, translate_batch_json
+from token_budget import ITEM_OVERHEAD_TOKENS, count_tokens, pack_batches
+from providers import create_providers, DEFAULT_GPT_MODEL
 
 load_dotenv()  # .env ファイルから環境変数を読み込む
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
-# OpenAI APIキーを設定します
-openai.api_key = openai_api_key
+# OpenAI のモデル（環境変数 OPENAI_MODEL で変えられる）
+gpt_model = os.getenv("OPENAI_MODEL", DEFAULT_GPT_MODEL)
+# 翻訳プロバイダー（環境変数 TRANSLATOR_PROVIDER で sdk / http / dummy を切り替える）
+gpt_provider, _ = create_providers(model=gpt_model)
+# 翻訳メモリでは 1 文ずつの翻訳とは別の訳として保持する
+batch_provider_name = gpt_provider.name + "_batch"
+# 翻訳メモリ（過去に翻訳した文はAPIを呼ばずに再利用する）
+tm = TranslationMemory()
+
+# OpenAI のリクエスト数/秒（429 が返ってきたら自動で下げ、成功が続けば max まで上げる）
+gpt_rate     = 3
+gpt_max_rate = 50
+gpt_limiter  = limiter_for(gpt_provider, gpt_rate, max_rate=gpt_max_rate)
 
 # 翻訳の前後
 LangFrom = "English"    # 翻訳前
 LangTo   = "Japanese"   # 翻訳語
 
-# 初期プロンプト
-initial_prompt = f'You are a helpful assistant that translates {LangFrom} to {LangTo}. Whenever you translate, treat up to the tag [END] as a single sentence. Keep the tag [END] unchanged at the end of each translated text. Also, keep specialized terms and names in their original {LangFrom} form.'
-
-# バッチ処理に使うトークンカウンター
-def count_tokens(text):
-    # ここでは、単純に空白、句読点、記号の数をカウントしています。
-    # もちろん、より詳細なトークンのカウント方法を適用することもできます。
-    return len(re.findall(r'\w+|\S', text))
+# 初期プロンプト（ID 付きの JSON でまとめて翻訳してもらう）
+initial_prompt = build_batch_prompt(LangFrom, LangTo)
+gpt_prompt_version = prompt_version(initial_prompt, gpt_model)
 
+# バッチで失敗した文を 1 文ずつ翻訳し直すときのプロンプト
+single_prompt = f'You are a helpful assistant that translates {LangFrom} to {LangTo}. Keep tokens like PLACEHOLDER_[number] unchanged. Also, keep specialized terms and names in their original {LangFrom} form. Reply with only the translated text.'
 
-# chat GPT 節約のためのバッチ処理
-def batch_translate(texts):
-    """
-    文章のリストを受け取り、翻訳を実行し、翻訳結果を返す関数
-    """
-    result_text = ""
+# 1 バッチに詰める入力トークン数の上限と、1 バッチあたりの最大件数
+batch_token_limit = 600
+batch_max_items = 50
 
-    # 各テキストをユーザーメッセージとして追加
-    for text in texts:
-        result_text += text + " [END] "
-    # 初期メッセージを設定
-    messages = [{"role": "system", "content": initial_prompt},
-                {"role": "user", "content": f'{result_text} [END]'}]
 
-    # API呼び出し
+# OpenAI API を呼び出して返信の文字列を返す（失敗したら None）
+def request_chat(messages):
     try:
-        response = openai.ChatCompletion.create(
-          model="gpt-3.5-turbo",
-          messages=messages
-        )
-    except openai.error.OpenAIError as e:
+        # レート制限に合わせて待ち、429 や一時的なエラーは再試行する
+        return call_with_retry(
+            lambda: gpt_provider.chat(messages),
+            gpt_limiter, classify_openai_error)
+    except Exception as e:
         print(f"Error with OpenAI API call: {str(e)}")
-        return []
-    
-    # レスポンスの確認
-    print(response)
-
-    # 翻訳箇所挙動テスト用
-    # translated_texts = [text + "_JP" for text in texts]
+        return None
 
-    # アシスタントの返信から日本語の部分を正規表現で抽出
-    assistant_reply = response['choices'][0]['message']['content']
-    translated_texts = [text.replace(" [END]", "") for text in assistant_reply.split(" [END] ") if text]
 
-    return translated_texts
+# バッチで上手くいかなかった文を 1 文ずつ翻訳する
+def translate_single(text):
+    messages = [{"role": "system", "content": single_prompt},
+                {"role": "user", "content": text}]
+    translated_text = request_chat(messages)
+    if not translated_text:
+        return None
+    return translated_text.strip()
 
 
-# プレースホルダーに対するパターンを判別
-def extract_and_replace_patterns(value, patterns):
-    placeholders = []
-    placeholder_counter = 0
-    for pattern in patterns:
-        matches = re.findall(pattern, value)
-        for match in matches:
-            placeholder = f"PLACEHOLDER_{placeholder_counter}"
-            value = value.replace(match, placeholder, 1)  # 1回だけ置換
-            placeholders.append((placeholder, match))
-            placeholder_counter += 1
-    return value, placeholders
+# chat GPT 節約のためのバッチ処理
+def batch_translate(texts):
+    """
+    文章のリストを受け取り、翻訳を実行し、同じ順番で翻訳結果を返す関数
+    翻訳できなかった文は None になる
+    """
+    # 翻訳箇所挙動テスト用
+    # return [text + "_JP" for text in texts]
 
-def restore_patterns(value, placeholders):
-    for placeholder, original in placeholders:
-        value = value.replace(placeholder, original)
-    return value
+    return translate_batch_json(texts, request_chat, translate_single, initial_prompt)
 
 
-# iniファイルが読み取れる形じゃないのでtxtに直して使う
+# iniファイルが読み取れる形じゃないのでtxtに直して使う（BOM を key に含めないように ini_stream で読む）
 def read_txt_as_dict(txt_path):
-    data_dict = {}
-    with open(txt_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            line = line.strip()
-            if '=' in line:
-                key, value = line.split('=', 1)
-                data_dict[key] = value
-    return data_dict
+    return read_ini_dict(txt_path)
 
 
 # main処理
@@ -139,12 +126,12 @@ def translate_ini_file(version):
         r'\bfloat\b',      # float型
         r'\bdouble\b',     # double型
     ]
+    # プレースホルダーを PLACEHOLDER_0, PLACEHOLDER_1... でマスクするエンジン（改行記号はそのまま）
+    masking_engine = MaskingEngine(patterns, placeholder_format="PLACEHOLDER_{}", newline_token=None)
 
-    # 追加：キーのリストを用意
-    keys_to_translate = []
     translation_count = 0  # 翻訳するべき行のカウンタを初期化
-    to_translate = []
-    placeholders_list = []
+    # 翻訳する key, マスク済みの文, プレースホルダー, トークン数
+    pending = []
 
     for key, value in data_dict.items():
 
@@ -157,38 +144,31 @@ def translate_ini_file(version):
             continue
 
         # パターンマッチングで翻訳するべきものを分ける
-        value_with_placeholders, placeholders = extract_and_replace_patterns(value, patterns)
-
-        # トークン数を確認
-        current_tokens = count_tokens(" ".join(to_translate))
-        next_tokens = count_tokens(value_with_placeholders)
-
-        # 制限を超える場合、現在のバッチを処理
-        if current_tokens + next_tokens > 600:
-            translated_values = batch_translate(to_translate)
-
-            # 翻訳結果をファイルにセット
-            for translated_key, translated, original_placeholders in zip(keys_to_translate, translated_values, placeholders_list):
-                final_value = restore_patterns(translated, original_placeholders)
-                data_dict[translated_key] = final_value
-
-            # リストをクリア
-            to_translate.clear()
-            placeholders_list.clear()
-            keys_to_translate.clear()  # キーリストもクリア
-            translation_count += 1
-
-        # キーもリストに追加
-        keys_to_translate.append(key)
-        # ここでvalue_with_placeholdersをリストに追加
-        to_translate.append(value_with_placeholders)
-        placeholders_list.append(placeholders)
-
-    # 最後のバッチを処理（もし残っていれば）
-    if to_translate:
-        translated_values = batch_translate(to_translate)
-        for translated_key, translated, original_placeholders in zip(keys_to_translate, translated_values, placeholders_list):
-            final_value = restore_patterns(translated, original_placeholders)
+        value_with_placeholders, placeholders, _ = masking_engine.mask(value)
+
+        # 翻訳メモリにあればバッチに入れずにそのまま使う
+        cached = tm.get(value_with_placeholders, LangTo, batch_provider_name, gpt_prompt_version)
+        if cached is not None:
+            data_dict[key] = masking_engine.restore(cached, placeholders)
+            continue
+
+        # トークン数は 1 文につき 1 回だけ数える
+        tokens = count_tokens(value_with_placeholders, gpt_model) + ITEM_OVERHEAD_TOKENS
+        pending.append((key, value_with_placeholders, placeholders, tokens))
+
+    # 上限近くまで詰めたバッチを作って、バッチごとに翻訳する
+    batches = pack_batches([tokens for _, _, _, tokens in pending], batch_token_limit, batch_max_items)
+    for batch in batches:
+        items = [pending[i] for i in batch]
+        translated_values = batch_translate([source for _, source, _, _ in items])
+
+        # 翻訳結果をファイルにセット
+        for (translated_key, source, original_placeholders, _), translated in zip(items, translated_values):
+            # 翻訳できなかった文は元の英語のままにしておく
+            if translated is None:
+                continue
+            tm.put(source, translated, LangTo, batch_provider_name, gpt_prompt_version)
+            final_value = masking_engine.restore(translated, original_placeholders)
             data_dict[translated_key] = final_value
 
         translation_count += 1
@@ -196,22 +176,21 @@ def translate_ini_file(version):
     # 翻訳後の内容を新しいファイルに保存
     try:
         translated_file_path = os.path.join(script_dir, '..', version, 'translated_global.txt')
-        with open(translated_file_path, 'w', encoding='utf-8-sig', newline='\n') as translated_file:
-            for k, v in data_dict.items():
-                translated_file.write(f"{k}={v}\n")
+        # 元のファイルを 1 行ずつ読みながら翻訳を差し込んで保存（触っていない行はそのまま）
+        write_translated_ini(txt_path, translated_file_path, data_dict, bom=True)
     except Exception as e:
         print(f"Error writing to translated_global.txt: {str(e)}")
 
     print("バッチ処理の回数")
     print(translation_count)
+    print("翻訳メモリのヒット数")
+    print(tm.hits)
 
 
 
 if __name__ == '__main__':
-    # if len(sys.argv) < 2:
-    #     print("Please provide the version as an argument.")
-    # else:
-    #     version = sys.argv[1]
-    #     translate_ini_file(version)
-
-    translate_ini_file('v3.20.0b')
\ No newline at end of file
+    # 第1引数に version フォルダを渡す（省略時は v3.20.0b）。オプションを付けたいときは cli.py translate を使う
+    if len(sys.argv) >= 2:
+        translate_ini_file(sys.argv[1])
+    else:
+        translate_ini_file('v3.20.0b')
\ No newline at end of file
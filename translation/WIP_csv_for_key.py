@@ -1,34 +1,63 @@
 # -*- coding:utf-8 -*-
 
-import csv
 import os
-import unicodedata
+from itertools import islice
 
+import script_detect
+from sheet_import import CSV_COLUMNS, XLSX_COLUMNS, iter_entries, iter_rows, resolve_columns
+
+# 列を自動で判定するときに見る先頭の行数
+DETECT_SAMPLE_ROWS = 200
+
+# 文字ごとに unicodedata.name() を引く代わりに、コードポイントの範囲表から作った正規表現で判定する
 def contains_japanese(text):
-    for char in text:
-        name = unicodedata.name(char)
-        if "CJK UNIFIED" in name or "HIRAGANA" in name or "KATAKANA" in name:
-            return True
-    return False
+    return script_detect.contains_japanese(text)
 
-def extract_english_keys_from_csv(filename):
-    english_keys = []
-    trans_values = []
-    jap = []
+def detect_columns(filename, sample_rows=DETECT_SAMPLE_ROWS):
+    """
+    見出しで列が分からない表から、日本語を含む行が一番多い列を訳の列にして {"key": 列, "translation": 列} を返す関数
+    見出しで分かるとき・日本語の列が見つからないときは None（sheet_import の既定の位置を使う）
+    """
+    rows = list(islice(iter_rows(filename), sample_rows))
+    if not rows:
+        return None
+    default = XLSX_COLUMNS if filename.lower().endswith('.xlsx') else CSV_COLUMNS
+    indexes, has_header = resolve_columns(rows[0], None, default)
+    if has_header:
+        return None
 
-    with open(filename, mode='r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        next(reader)  # ヘッダー行をスキップ
+    width = max(len(row) for row in rows)
+    scores = []
+    for index in range(width):
+        # 列をまとめて判定する（1 行目は見出しかもしれないので数えない）
+        column = [row[index] if index < len(row) else "" for row in rows[1:]]
+        scores.append(sum(contains for contains, _ in script_detect.classify_column(column)))
+    best = max(range(width), key=scores.__getitem__)
+    if scores[best] == 0 or best == indexes["key"]:
+        return None
+    return {"key": indexes["key"], "translation": best}
 
-        for row in reader:
-            key = row[2]
-            translation = row[3]
+def extract_english_keys_from_csv(filename, columns=None, min_ratio=0.0):
+    # 1 行ずつ流し読みする（columns で見出しの名前か列を指定できる。省略時は見出しか、日本語の多い列から判定する）
+    # 訳の列はまとめて判定し、日本語の割合（script_detect.japanese_ratio）が min_ratio 以下の行を未翻訳とする
+    # （既定の 0.0 なら日本語を 1 文字も含まない行。0.3 などにすると英語が大半の訳も翻訳し直す）
+    if columns is None:
+        columns = detect_columns(filename)
+    keys = []
+    translations = []
+    for values in iter_entries(filename, columns):
+        keys.append(values["key"])
+        translations.append(values["translation"])
 
-            if not contains_japanese(translation):
-                english_keys.append(key)
-                trans_values.append(translation)
-            else:
-                jap.append(translation)
+    english_keys = []
+    trans_values = []
+    jap = []
+    for key, translation, (_, ratio) in zip(keys, translations, script_detect.classify_column(translations)):
+        if ratio <= min_ratio:
+            english_keys.append(key)
+            trans_values.append(translation)
+        else:
+            jap.append(translation)
 
     return english_keys, trans_values, jap
 
@@ -39,4 +68,4 @@ if __name__ == '__main__':
     csv_path = os.path.join(script_dir, '..', version, 'WIP_ini.csv')
 
     english_keys, trans_values, jap = extract_english_keys_from_csv(csv_path)
-    print("END")
\ No newline at end of file
+    print("END")
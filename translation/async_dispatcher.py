@@ -0,0 +1,47 @@
+# -*- coding:utf-8 -*-
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# プロバイダーごとの同時リクエスト数（in-flight の上限）の既定値
+DEFAULT_CONCURRENCY = {"gpt": 8, "deepl": 4}
+
+
+async def _dispatch(jobs, handlers, concurrency, on_result):
+    loop = asyncio.get_running_loop()
+    semaphores = {name: asyncio.Semaphore(limit) for name, limit in concurrency.items()}
+    results = [None] * len(jobs)
+
+    # SDK は同期 API なので、スレッドプール上で実行して待ち時間だけを重ねる
+    with ThreadPoolExecutor(max_workers=sum(concurrency.values())) as executor:
+
+        async def run(index, provider, text):
+            async with semaphores[provider]:
+                results[index] = await loop.run_in_executor(
+                    executor, handlers[provider], text, index)
+            if on_result is not None:
+                on_result(index, results[index])
+
+        await asyncio.gather(*(run(i, provider, text) for i, (provider, text) in enumerate(jobs)))
+
+    return results
+
+
+def dispatch_translations(jobs, handlers, concurrency=None, on_result=None):
+    """
+    (provider, text) のリストを受け取り、プロバイダーごとに同時リクエスト数を制限しながら
+    並行に翻訳を実行し、入力と同じ順序で翻訳結果のリストを返す関数
+
+    handlers は provider 名から translate_text_GPT(text, count) 形式の関数への辞書
+    on_result(index, result) を渡すと、1 件終わるごとに呼び出す（途中経過の保存用）
+    """
+    limits = dict(DEFAULT_CONCURRENCY)
+    if concurrency:
+        limits.update(concurrency)
+    # 使っていないプロバイダーの分までスレッドを作らない
+    used = {provider for provider, _ in jobs}
+    limits = {name: limit for name, limit in limits.items() if name in used}
+
+    if not jobs:
+        return []
+    return asyncio.run(_dispatch(jobs, handlers, limits, on_result))
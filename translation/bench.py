@@ -0,0 +1,170 @@
+# -*- coding:utf-8 -*-
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+# ワーカープロセスのメモリは resource で測る（Windows には無いので、無ければ出さない）
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from chunk_pipeline import find_split_files
+from metrics import percentile
+from mock_provider import MockSettings, start_mock_server
+
+# モックサーバーを相手に翻訳パイプライン全体（読み込み～書き出し）を動かして、スループットを測るベンチマーク
+# ネットワークも API キーも使わない。使い方: python bench.py --latency 0.02 --error-rate 0.01 --rate-limit 200
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(script_dir, '..')
+
+# (名前, version フォルダ, 翻訳するファイル)
+BENCH_CASES = [
+    ("Japanese.pak/global.ini", "Japanese.pak", os.path.join(root_dir, 'Japanese.pak', 'global.ini')),
+    ("v3.16.1 chunks", "v3.16.1", find_split_files(os.path.join(root_dir, 'v3.16.1'))),
+]
+
+
+def count_lines(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+    total = 0
+    for path in paths:
+        with open(path, 'rb') as file:
+            total += sum(1 for _ in file)
+    return total
+
+
+def workers_max_rss_mb():
+    # 終わったワーカープロセス（マスク処理・検証のプロセスプール）のうち一番大きかった常駐メモリ
+    # ru_maxrss は Linux では KB 単位で、このプロセスが起動してからの全ケースを通した最大値
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+
+def run_case(translator, name, version, source_path, server, args):
+    """
+    1 つのファイルをモックサーバー相手に翻訳して、計測結果の辞書を返す関数
+    翻訳メモリとプロバイダーは毎回作り直し、前のケースのキャッシュが効かないようにする
+    """
+    from providers import create_providers
+    from rate_limiter import AdaptiveRateLimiter
+    from translation_memory import TranslationMemory
+
+    work_dir = tempfile.mkdtemp(prefix='sc_translate_bench_')
+    try:
+        translator.tm = TranslationMemory(os.path.join(work_dir, 'tm.sqlite3'))
+        translator.gpt_provider, translator.deepl_provider = create_providers("http", model=translator.gpt_model)
+        translator.gpt_limiter = AdaptiveRateLimiter(args.gpt_rate, max_rate=args.gpt_rate)
+        translator.deepl_limiter = AdaptiveRateLimiter(args.deepl_rate, max_rate=args.deepl_rate)
+        translator.gpt_concurrency = args.gpt_concurrency
+        translator.deepl_concurrency = args.deepl_concurrency
+        before = server.stats.snapshot()
+
+        output = io.StringIO()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            summary = translator.translate_ini_file(version, workers=args.workers, source_path=source_path,
+                                                    output_path=os.path.join(work_dir, 'translated_global.ini.txt'))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        translator.tm.close()
+
+        if args.verbose:
+            print(output.getvalue())
+
+        after = server.stats.snapshot()
+        lines = count_lines(source_path)
+        result = {"case": name, "lines": lines, "seconds": round(elapsed, 3),
+                  "lines_per_sec": round(lines / elapsed, 1) if elapsed else 0.0,
+                  "peak_memory_mb": round(peak / 1024 / 1024, 1),
+                  "workers_max_rss_mb": workers_max_rss_mb(),
+                  "stages": summary["stages"], "cost_usd": summary["cost_usd"], "providers": {}}
+        for provider, endpoint in ((translator.gpt_provider, "chat"), (translator.deepl_provider, "translate")):
+            server_counts = {field: after.get(endpoint, {}).get(field, 0) - before.get(endpoint, {}).get(field, 0)
+                             for field in ("requests", "rate_limited", "errors")}
+            result["providers"][provider.name] = {
+                "calls": provider.calls,
+                "p50_ms": round(percentile(provider.latencies, 50) * 1000, 1),
+                "p99_ms": round(percentile(provider.latencies, 99) * 1000, 1),
+                **server_counts,
+            }
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_result(result):
+    # peak memory は tracemalloc で測った親プロセスの Python のメモリだけ（ワーカーは含まない）
+    workers = result.get("workers_max_rss_mb")
+    print(f"{result['case']}: {result['lines']} lines in {result['seconds']}s "
+          f"({result['lines_per_sec']} lines/sec), peak memory {result['peak_memory_mb']} MB (parent only)"
+          + (f", worker max RSS {workers} MB" if workers else ""))
+    print("  stages: " + ", ".join(f"{name} {seconds}s" for name, seconds in result["stages"].items()))
+    for name, stats in result["providers"].items():
+        print(f"  {name}: calls {stats['calls']} (429: {stats['rate_limited']}, 500: {stats['errors']}), "
+              f"p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="モックサーバーを相手にした翻訳パイプラインのベンチマーク")
+    parser.add_argument("--latency", type=float, default=0.02, help="モックの応答時間（秒）")
+    parser.add_argument("--jitter", type=float, default=0.01, help="モックの応答時間のばらつき（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="モックが 500 を返す割合")
+    parser.add_argument("--rate-limit", type=int, default=0, help="モックの 1 秒あたりの上限（超えると 429）")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--gpt-rate", type=float, default=1000, help="クライアント側の GPT リクエスト数/秒")
+    parser.add_argument("--deepl-rate", type=float, default=1000, help="クライアント側の DeepL リクエスト数/秒")
+    parser.add_argument("--gpt-concurrency", type=int, default=8)
+    parser.add_argument("--deepl-concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None, help="マスク処理のプロセス数")
+    parser.add_argument("--case", action="append", help="実行するケースの名前（省略時はすべて）")
+    parser.add_argument("--json", help="結果を JSON で書き出すパス")
+    parser.add_argument("--verbose", action="store_true", help="翻訳処理の出力も表示する")
+    args = parser.parse_args(argv)
+
+    server = start_mock_server(MockSettings(args.latency, args.jitter, args.error_rate,
+                                            args.rate_limit, args.retry_after, seed=0))
+    # Gpt_Translator は import したときにプロバイダーを作るので、先にモックサーバーへ向けておく
+    os.environ["TRANSLATOR_PROVIDER"] = "http"
+    os.environ["OPENAI_API_BASE"] = server.url + "/v1"
+    os.environ["DEEPL_SERVER_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ.setdefault("DEEPL_API_KEY", "mock")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import Gpt_Translator as translator
+
+    results = []
+    try:
+        for name, version, source_path in BENCH_CASES:
+            if args.case and name not in args.case:
+                continue
+            if not source_path:
+                print(f"{name}: input not found, skipped")
+                continue
+            result = run_case(translator, name, version, source_path, server, args)
+            print_result(result)
+            results.append(result)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
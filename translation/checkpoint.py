@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+
+import json
+import os
+import threading
+import time
+
+from translation_memory import source_hash
+
+# この件数か秒数ごとにジャーナルをディスクへ書き出す
+FLUSH_EVERY_RECORDS = 50
+FLUSH_EVERY_SECONDS = 5.0
+
+
+class TranslationJournal:
+    """
+    翻訳が終わった key → 翻訳結果 を 1 行 1 件の JSON で追記していくジャーナル
+    途中で落ちても、次回 --resume で書き込み済みの key を飛ばして再開できる
+    原文のハッシュも一緒に残し、原文が変わった key は再開時に使わない
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 再開しない場合は前回のジャーナルを捨てる
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8', newline='\n')
+        # 書きかけで終わった行に続けて書かないように改行を入れておく
+        if resume and self._file.tell() > 0:
+            with open(path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def load(self, sources=None):
+        """
+        ジャーナルから {key: 翻訳結果} を読み込む関数
+        sources（{key: 原文}）を渡すと、原文が変わっていない key だけを返す
+        最後の行が書きかけで壊れていても、それ以外は読み込む
+        """
+        self.flush()
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                key = record.get("k")
+                if sources is not None:
+                    if key not in sources or source_hash(sources[key])[:16] != record.get("s"):
+                        continue
+                entries[key] = record.get("v")
+        return entries
+
+    def record(self, key, source, translation):
+        line = json.dumps({"k": key, "s": source_hash(source)[:16], "v": translation}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= FLUSH_EVERY_RECORDS or time.monotonic() - self._last_flush >= FLUSH_EVERY_SECONDS:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush_locked()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,155 @@
+# -*- coding:utf-8 -*-
+
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from glossary import Glossary
+from masking import MaskingEngine, DEFAULT_PATTERNS
+from skip_filter import load_or_build_filter
+
+# 分割済みのリソース（global_en_00, global_en_01 ...）。global_en_011 や _test は含めない
+SPLIT_FILE_RE = re.compile(r'^global_en_(\d{2})$')
+
+# ワーカープロセスごとに 1 回だけ作るマスクエンジンとスキップフィルタと用語集
+_worker = {}
+
+
+def find_split_files(directory, pattern=SPLIT_FILE_RE):
+    """
+    フォルダ内の分割済みリソースを番号順に返す関数（無ければ空のリスト）
+    pattern を変えると、分割済みの日本語訳（global_ja_00 ...）なども探せる
+    """
+    if not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if pattern.match(name)]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def shard_records(records, chunk_count):
+    """
+    (key, value) のリストを、順番を保ったまま chunk_count 個の連続した塊に分ける関数
+    """
+    chunk_count = max(1, min(chunk_count, len(records)))
+    size, extra = divmod(len(records), chunk_count)
+    chunks = []
+    start = 0
+    for i in range(chunk_count):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(records[start:end])
+        start = end
+    return chunks
+
+
+def _init_worker(skip_keywords, skip_valuewords, patterns, placeholder_format, newline_token, glossary_terms=None):
+    _worker["skip_filter"] = load_or_build_filter(skip_keywords)
+    _worker["skip_valuewords"] = skip_valuewords
+    _worker["engine"] = MaskingEngine(patterns, placeholder_format, newline_token)
+    _worker["glossary"] = Glossary(glossary_terms)
+
+
+def _prepare_chunk(records):
+    """
+    1 つの塊の (key, value) をスキップ判定・マスク・用語のマスク・検証をして、
+    ([(key, マスク済みの文, プレースホルダー, use_gpt)], [マスクを戻しても元に戻らなかった key], {段階: 秒}) を返す
+    """
+    skip_filter = _worker["skip_filter"]
+    skip_valuewords = _worker["skip_valuewords"]
+    engine = _worker["engine"]
+    glossary = _worker["glossary"]
+    clock = time.perf_counter
+
+    jobs = []
+    invalid = []
+    skip_seconds = 0.0
+    mask_seconds = 0.0
+    glossary_seconds = 0.0
+    for key, value in records:
+        start = clock()
+        # keyに特定のキーワードが含まれている場合、翻訳をスキップ
+        # valueが特定の文字列を含む場合、翻訳をスキップ
+        skipped = skip_filter.matches(key) or any(valueword in value for valueword in skip_valuewords)
+        mask_start = clock()
+        skip_seconds += mask_start - start
+        if skipped:
+            continue
+
+        # パターンマッチングで翻訳するべきものを分ける
+        masked, placeholders, use_gpt = engine.mask(value)
+        glossary_start = clock()
+        mask_seconds += glossary_start - mask_start
+
+        # 用語集の名前もプレースホルダーにする（GPT・DeepL のどちらに回る文でも、名前は翻訳させない）
+        masked = glossary.mask(masked, placeholders, engine.placeholder_format)
+        restore_start = clock()
+        glossary_seconds += restore_start - glossary_start
+
+        # 翻訳結果を戻すときと同じ engine.restore で戻して元の文にならないものは、翻訳すると壊れるので英語のまま残す
+        restored = engine.restore(masked, placeholders)
+        mask_seconds += clock() - restore_start
+        if restored != value:
+            invalid.append(key)
+            continue
+
+        jobs.append((key, masked, placeholders, use_gpt))
+    return jobs, invalid, {"skip-filter": skip_seconds, "mask": mask_seconds, "glossary": glossary_seconds}
+
+
+def prepare_jobs(records, skip_keywords, skip_valuewords, patterns=DEFAULT_PATTERNS,
+                 placeholder_format=" #{} ", newline_token=" |~ ", workers=None, chunks_per_worker=4, timer=None,
+                 glossary_terms=None):
+    """
+    (key, value) のリストをスキップ判定・マスク・検証して、元の順番のまま翻訳ジョブのリストを返す関数
+    workers が 2 以上なら連続した塊に分けてプロセスプールで並列に処理する
+    戻り値は (ジョブのリスト, 検証で弾いた key のリスト)
+    timer（metrics.StageTimer）を渡すと skip-filter と mask と glossary の時間（全プロセスの合計）を積み上げる
+    glossary_terms（{用語: 決まった訳}）を渡すと、文の中の用語もプレースホルダーにする
+    """
+    init_args = (frozenset(skip_keywords or ()), skip_valuewords, patterns, placeholder_format, newline_token,
+                 glossary_terms)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(records) < workers:
+        _init_worker(*init_args)
+        jobs, invalid, timings = _prepare_chunk(records)
+        _add_timings(timer, timings)
+        return jobs, invalid
+
+    # スキップフィルタのキャッシュは親で先に作っておき、ワーカーは読むだけにする
+    load_or_build_filter(init_args[0])
+    chunks = shard_records(records, workers * chunks_per_worker)
+    jobs = []
+    invalid = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as executor:
+        # map は投入した順番で結果を返すので、そのままつなげれば元の順番になる
+        for chunk_jobs, chunk_invalid, timings in executor.map(_prepare_chunk, chunks):
+            jobs.extend(chunk_jobs)
+            invalid.extend(chunk_invalid)
+            _add_timings(timer, timings)
+    return jobs, invalid
+
+
+def _add_timings(timer, timings):
+    if timer is None:
+        return
+    for name, seconds in timings.items():
+        timer.add(name, seconds)
+
+
+# ベンチマーク：分割済みの v3.16.1 を 1 プロセスと全コアで処理して比べる
+if __name__ == '__main__':
+    from ini_stream import read_ini_dict
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    directory = sys.argv[1] if len(sys.argv) >= 2 else os.path.join(script_dir, '..', 'v3.16.1')
+    records = list(read_ini_dict(find_split_files(directory)).items())
+    skip_valuewords = {'@', 'blah', '---------------------'}
+    print(f"records: {len(records)}")
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        jobs, invalid = prepare_jobs(records, [], skip_valuewords, workers=workers)
+        print(f"workers={workers}: {time.perf_counter() - start:.3f}s, jobs: {len(jobs)}, invalid: {len(invalid)}")
@@ -0,0 +1,245 @@
+# -*- coding:utf-8 -*-
+
+import argparse
+import os
+import sys
+
+# 翻訳ツールの入り口（サブコマンドごとに必要なモジュールだけを読み込む）
+#   python cli.py translate v3.20.0b --previous v3.17.2 --progress
+#   python cli.py diff v3.20.0b/global_en.ini.txt v3.17.2/global_en.ini.txt
+#   python cli.py history 890_J_MissionTest --versions v3.15.0u v3.16.1 v3.17.2
+#   python cli.py merge v3.16.1 --translations v3.15.0u/global_ja.txt -o merged.ini
+#   python cli.py translate v3.20.0b --fuzzy-sheet v3.17.2/日本語ローカライズ_v3.17.2.xlsx
+#   python cli.py validate v3.20.0b/global_en.ini.txt v3.20.0b/translated_global.ini.txt --failed-keys failed_keys.txt
+#   python cli.py translate v3.20.0b --requeue failed_keys.txt
+#   python cli.py translate v3.20.0b --languages ja ko fr
+#   python cli.py translate v3.20.0b --glossary glossary.tsv
+#   python cli.py bench --latency 0.02
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_VERSION = 'v3.20.0b'
+
+# translate --engine で選べる翻訳スクリプト
+ENGINES = {
+    "main": "Gpt_Translator",
+    "csv": "Gpt_Translator_CSV",
+    "batch": "Gpt_Translator_bat",
+}
+# --engine main でしか使えないオプション（csv / batch の翻訳スクリプトは version しか受け取らない）
+MAIN_ENGINE_OPTIONS = {
+    "previous": "--previous", "input": "--input", "output": "--output", "resume": "--resume",
+    "progress": "--progress", "metrics": "--metrics", "workers": "--workers",
+    "fuzzy_reference": "--fuzzy-reference", "fuzzy_sheet": "--fuzzy-sheet", "languages": "--languages",
+    "requeue": "--requeue", "glossary": "--glossary", "no_glossary": "--no-glossary",
+}
+
+
+def resolve_source(path_or_version):
+    """
+    ファイルのパスか version フォルダ名を受け取り、読み込むファイル（分割済みならそのリスト）を返す関数
+    version フォルダなら global_en.ini.txt、無ければ global_en_00, global_en_01... を使う
+    """
+    from chunk_pipeline import find_split_files
+
+    if os.path.isfile(path_or_version):
+        return path_or_version
+    directory = path_or_version if os.path.isdir(path_or_version) else os.path.join(script_dir, '..', path_or_version)
+    txt_path = os.path.join(directory, 'global_en.ini.txt')
+    if os.path.exists(txt_path):
+        return txt_path
+    split_paths = find_split_files(directory)
+    if split_paths:
+        return split_paths
+    raise SystemExit(f"File {path_or_version} does not exist!")
+
+
+def cmd_translate(args):
+    # プロバイダーとモデルは Gpt_Translator を読み込んだときに決まるので、先に環境変数に入れておく
+    if args.provider:
+        os.environ["TRANSLATOR_PROVIDER"] = args.provider
+    if args.model:
+        os.environ["OPENAI_MODEL"] = args.model
+
+    import importlib
+    translator = importlib.import_module(ENGINES[args.engine])
+    if args.engine != "main":
+        translator.translate_ini_file(args.version)
+        return 0
+    if args.no_glossary:
+        translator.use_glossary = False
+
+    fuzzy_references = None
+    requeue_keys = None
+    if args.requeue:
+        from validator import read_failing_keys
+        requeue_keys = read_failing_keys(args.requeue)
+    if args.fuzzy_reference or args.fuzzy_sheet:
+        fuzzy_references = [(resolve_source(en), ja) for en, ja in args.fuzzy_reference or []]
+        # 英語原文の列がある表は、表だけで (英語原文, 日本語訳) の組になる
+        fuzzy_references += [(None, path) for path in args.fuzzy_sheet or []]
+    summary = translator.translate_ini_file(
+        args.version, args.previous, resume=args.resume, workers=args.workers,
+        source_path=resolve_source(args.input) if args.input else None, output_path=args.output,
+        progress=args.progress, metrics_path=args.metrics, fuzzy_references=fuzzy_references,
+        requeue_keys=requeue_keys, languages=args.languages,
+        glossary_path=args.glossary or translator.DEFAULT_GLOSSARY_PATH)
+    return 0 if summary is not None else 1
+
+
+def cmd_diff(args):
+    from version_diff import print_diff_summary
+    from version_store import load_or_build_store
+
+    # 英語原文が .xlsx にしか無い version も比べられるように、version をまたいだストアを使う
+    store = load_or_build_store([args.new, args.old])
+    if len(store) < 2:
+        return 1
+    diff = store.diff(*store.versions)
+    print_diff_summary(diff)
+    if args.list:
+        for kind in ("added", "removed", "changed"):
+            for key in diff[kind]:
+                print(f"{kind}\t{key}")
+    return 0
+
+
+def cmd_history(args):
+    from version_store import load_or_build_store
+
+    store = load_or_build_store(args.versions)
+    for key in args.keys:
+        print(key)
+        for version, value in store.history(key):
+            print(f"  {version}\t{'(なし)' if value is None else value}")
+    return 0
+
+
+def cmd_merge(args):
+    """
+    英語原文に、翻訳ファイル（global.ini 形式か global_ja.txt、作業用の表 .xlsx / .csv、ジャーナル）の訳を差し込んで書き出す
+    後に指定した翻訳ファイルほど優先する
+    """
+    from checkpoint import TranslationJournal
+    from fuzzy_tm import read_translations
+    from ini_stream import read_ini_dict, write_translated_ini
+
+    source = resolve_source(args.source)
+    sources = read_ini_dict(source)
+    translations = {}
+    for path in args.translations:
+        if path.endswith('.journal.jsonl'):
+            with TranslationJournal(path, resume=True) as journal:
+                entries = journal.load(sources)
+        else:
+            entries = read_translations(path)
+        translations.update({key: value for key, value in entries.items() if key in sources})
+    write_translated_ini(source, args.output, translations, bom=args.bom)
+    print(f"merged: {len(translations)} / {len(sources)} keys -> {args.output}")
+    return 0
+
+
+def cmd_validate(args):
+    """
+    key の過不足、プレースホルダー・~関数()・\\n の数、文字コードを原文と照合する
+    --failed-keys を渡すと、翻訳し直すべき key を translate --requeue で読めるファイルに書き出す
+    """
+    from validator import failing_keys, print_report, validate_files, write_failing_keys
+
+    report = validate_files(resolve_source(args.source), args.translated, workers=args.workers)
+    print_report(report, limit=args.limit)
+    for key in report["missing"][:args.limit]:
+        print(f"missing\t{key}")
+    for key in report["extra"][:args.limit]:
+        print(f"extra\t{key}")
+    failed = failing_keys(report)
+    if args.failed_keys:
+        write_failing_keys(failed, args.failed_keys)
+        print(f"failed keys: {len(failed)} -> {args.failed_keys}")
+    return 1 if failed or report["extra"] or report["encoding"] else 0
+
+
+def cmd_bench(args):
+    import bench
+    bench.main(args.bench_args)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Star Citizen 日本語化リソースの翻訳ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    translate = subparsers.add_parser("translate", help="global_en.ini.txt を翻訳する")
+    translate.add_argument("version", nargs="?", default=DEFAULT_VERSION, help="version フォルダ（既定: %(default)s）")
+    translate.add_argument("--previous", help="差分翻訳に使う前バージョンのフォルダ")
+    translate.add_argument("--input", help="翻訳するファイル（省略時は version フォルダの global_en.ini.txt）")
+    translate.add_argument("--output", help="書き出すファイル（省略時は version フォルダの translated_global.ini.txt）")
+    translate.add_argument("--engine", choices=sorted(ENGINES), default="main", help="使う翻訳スクリプト（csv / batch は version だけを受け取り、--previous などは使えない）")
+    translate.add_argument("--provider", choices=["sdk", "http", "dummy"], help="翻訳プロバイダー（TRANSLATOR_PROVIDER）")
+    translate.add_argument("--model", help="OpenAI のモデル（OPENAI_MODEL）")
+    translate.add_argument("--resume", action="store_true", help="ジャーナルから前回の続きを翻訳する")
+    translate.add_argument("--progress", action="store_true", help="進み具合を表示する")
+    translate.add_argument("--metrics", help="計測結果の JSON を書き出すパス")
+    translate.add_argument("--workers", type=int, help="マスク処理のプロセス数")
+    translate.add_argument("--fuzzy-reference", nargs=2, action="append", metavar=("EN", "JA"),
+                           help="近い文の訳を使い回す過去の英語原文と日本語訳（複数指定可）")
+    translate.add_argument("--fuzzy-sheet", action="append", metavar="XLSX",
+                           help="近い文の訳を使い回す、英語原文と日本語訳の列がある表（複数指定可）")
+    translate.add_argument("--languages", nargs="+", metavar="LANG",
+                           help="まとめて翻訳する言語コード（ja ko zh de fr es it pt pl。既定: ja）")
+    translate.add_argument("--requeue", metavar="FILE", help="validate --failed-keys で書き出した key だけを翻訳し直す")
+    translate.add_argument("--glossary", metavar="TSV",
+                           help="用語集（\"英語<TAB>訳\"、訳が空なら英語のまま。省略時は glossary.tsv があれば使う）")
+    translate.add_argument("--no-glossary", action="store_true", help="用語集で名前を守らずに翻訳する")
+    translate.set_defaults(func=cmd_translate)
+
+    diff = subparsers.add_parser("diff", help="2 つのバージョンの英語原文を比べる")
+    diff.add_argument("new", help="新しい原文（ファイルか version フォルダ）")
+    diff.add_argument("old", help="古い原文（ファイルか version フォルダ）")
+    diff.add_argument("--list", action="store_true", help="追加・削除・変更された key も表示する")
+    diff.set_defaults(func=cmd_diff)
+
+    history = subparsers.add_parser("history", help="key の英語原文がバージョンごとにどう変わったかを表示する")
+    history.add_argument("keys", nargs="+", help="調べる key")
+    history.add_argument("--versions", nargs="+", default=["v3.15.0u", "v3.16.1", "v3.17.2", DEFAULT_VERSION],
+                         help="古い順の version フォルダかファイル（既定: %(default)s）")
+    history.set_defaults(func=cmd_history)
+
+    merge = subparsers.add_parser("merge", help="英語原文に既存の訳を差し込んで書き出す")
+    merge.add_argument("source", help="英語原文（ファイルか version フォルダ）")
+    merge.add_argument("--translations", nargs="+", required=True, help="訳のファイル（後ろほど優先）")
+    merge.add_argument("-o", "--output", required=True, help="書き出すファイル")
+    merge.add_argument("--bom", action=argparse.BooleanOptionalAction, default=None, help="BOM を付けるか（省略時は原文に合わせる）")
+    merge.set_defaults(func=cmd_merge)
+
+    validate = subparsers.add_parser("validate", help="翻訳済みファイルを原文と照合する")
+    validate.add_argument("source", help="英語原文（ファイルか version フォルダ）")
+    validate.add_argument("translated", help="翻訳済みファイル")
+    validate.add_argument("--failed-keys", metavar="FILE", help="翻訳し直すべき key を書き出すファイル")
+    validate.add_argument("--workers", type=int, help="照合のプロセス数")
+    validate.add_argument("--limit", type=int, default=20, help="表示する key の数（既定: %(default)s）")
+    validate.set_defaults(func=cmd_validate)
+
+    bench_parser = subparsers.add_parser("bench", help="モックサーバーを相手にしたベンチマーク（引数は bench.py と同じ）",
+                                         add_help=False)
+    bench_parser.add_argument("bench_args", nargs=argparse.REMAINDER)
+    bench_parser.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # bench のオプションは argparse に解釈させず、そのまま bench.py に渡す
+    if argv[:1] == ["bench"]:
+        return cmd_bench(argparse.Namespace(bench_args=argv[1:]))
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "translate" and args.engine != "main":
+        # 黙って無視すると別のファイルを翻訳・上書きしてしまうので、翻訳スクリプトを読み込む前に止める
+        unsupported = [option for dest, option in MAIN_ENGINE_OPTIONS.items() if getattr(args, dest) not in (None, False)]
+        if unsupported:
+            parser.error(f"--engine {args.engine} では {', '.join(unsupported)} を使えません（--engine main で使ってください）")
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
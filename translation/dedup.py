@@ -0,0 +1,35 @@
+# -*- coding:utf-8 -*-
+
+
+def group_by_source(jobs):
+    """
+    (マスク済みの文, use_gpt) のリストを、同じ文ごとにまとめる関数
+    戻り値は (重複を除いたジョブのリスト, ジョブごとの元のインデックスのリスト)
+    """
+    unique_jobs = []
+    groups = []
+    positions = {}
+    for index, job in enumerate(jobs):
+        position = positions.get(job)
+        if position is None:
+            position = positions[job] = len(unique_jobs)
+            unique_jobs.append(job)
+            groups.append([])
+        groups[position].append(index)
+    return unique_jobs, groups
+
+
+def fan_out(unique_results, groups, total):
+    """
+    重複を除いて翻訳した結果を、同じ文を持つすべての元のインデックスに配り直す関数
+    """
+    results = [None] * total
+    for result, indices in zip(unique_results, groups):
+        for index in indices:
+            results[index] = result
+    return results
+
+
+def print_dedup_report(total, unique):
+    print("重複を除いた翻訳対象の数")
+    print(f"{unique} / {total} （{total - unique} 回の翻訳を節約）")
@@ -0,0 +1,38 @@
+# -*- coding:utf-8 -*-
+
+from urllib.parse import quote_plus
+
+# DeepL API の 1 リクエストあたりの上限（テキスト数 50、リクエストサイズ 128KiB）
+DEEPL_MAX_TEXTS = 50
+DEEPL_MAX_BYTES = 128 * 1024
+# 認証キーや target_lang などのテキスト以外のパラメーター分の余裕
+DEEPL_REQUEST_OVERHEAD = 1024
+
+
+def request_size(text):
+    # フォーム形式で送ったときの "&text=..." 1 つ分のバイト数
+    return len("&text=") + len(quote_plus(text, encoding='utf-8'))
+
+
+def pack_deepl_batches(texts, max_texts=DEEPL_MAX_TEXTS, max_bytes=DEEPL_MAX_BYTES):
+    """
+    テキストのリストを、テキスト数とリクエストサイズの上限に収まるバッチに分ける関数
+    元の順番のまま詰めていき、各バッチをテキストのインデックスのリストで返す
+    """
+    batches = []
+    current = []
+    current_bytes = DEEPL_REQUEST_OVERHEAD
+
+    for index, text in enumerate(texts):
+        size = request_size(text)
+        if current and (len(current) >= max_texts or current_bytes + size > max_bytes):
+            batches.append(current)
+            current = []
+            current_bytes = DEEPL_REQUEST_OVERHEAD
+        current.append(index)
+        current_bytes += size
+
+    if current:
+        batches.append(current)
+    return batches
+
@@ -0,0 +1,247 @@
+# -*- coding:utf-8 -*-
+
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from ini_stream import read_ini_dict
+from script_detect import contains_japanese
+from sheet_import import is_sheet_path, iter_sheet_pairs, read_sheet_translations
+
+# パッチで数字や船名、句読点だけが変わった文を、過去の訳を使って API を呼ばずに（または安く）翻訳するための索引
+# 過去の (英語原文, 日本語訳) を文字 n-gram で引き、一番近い原文とその訳、類似度を返す
+
+# この類似度以上なら「前の訳を直して」と GPT に頼む
+EDIT_THRESHOLD = 0.85
+# これより短い文は直してもらうより普通に翻訳した方が安いので、完全一致と数字の差し替えだけにする
+EDIT_MIN_LENGTH = 16
+NGRAM = 3
+# 候補を絞るときに見る n-gram の数の上限と、照合する候補の数
+PREFIX_GRAMS = 12
+MAX_CANDIDATES = 10
+
+NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+EDIT_PROMPT_TEMPLATE = (
+    'You update existing {lang_to} translations of {lang_from} game text. '
+    'You are given the previous {lang_from} text, its {lang_to} translation, and the new {lang_from} text. '
+    'Change the previous translation only where the new text differs, keeping its wording and style. '
+    'Keep placeholders such as ~mission(Contractor), %s, <EM4> and \\n exactly as they appear in the new text. '
+    'Reply with only the updated {lang_to} translation.'
+)
+
+
+def normalize(text):
+    # 大文字小文字と数字の違いは候補探しでは無視する
+    return NUMBER_RE.sub("0", text.lower())
+
+
+def ngrams(text, n=NGRAM):
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def transfer_numbers(old_source, new_source, old_translation):
+    """
+    数字だけが違う文なら、前の訳の数字を新しい数字に差し替えた訳を返す関数（できなければ None）
+    前の訳の中で各数字が原文と同じ順番・同じ回数で出てくるときだけ差し替える
+    """
+    if NUMBER_RE.sub("0", old_source) != NUMBER_RE.sub("0", new_source):
+        return None
+    old_numbers = NUMBER_RE.findall(old_source)
+    new_numbers = NUMBER_RE.findall(new_source)
+    if old_numbers == new_numbers:
+        return old_translation
+    if NUMBER_RE.findall(old_translation) != old_numbers:
+        return None
+    numbers = iter(new_numbers)
+    return NUMBER_RE.sub(lambda _: next(numbers), old_translation)
+
+
+class FuzzyIndex:
+    """
+    過去の (英語原文, 日本語訳) の索引
+    完全一致は辞書で、近い文は珍しい n-gram を共有する原文を候補にして SequenceMatcher で照合する
+    """
+
+    def __init__(self, pairs=()):
+        self.sources = []
+        self.translations = []
+        self.exact = {}
+        self.postings = defaultdict(list)
+        for source, translation in pairs:
+            self.add(source, translation)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, source, translation):
+        if not source or not translation or source in self.exact:
+            return
+        doc_id = len(self.sources)
+        self.sources.append(source)
+        self.translations.append(translation)
+        self.exact[source] = translation
+        for gram in ngrams(normalize(source)):
+            self.postings[gram].append(doc_id)
+
+    def candidates(self, text):
+        # 出てくる原文が少ない（珍しい）n-gram から順に PREFIX_GRAMS 個だけ使って候補を数える
+        grams = [gram for gram in ngrams(normalize(text)) if gram in self.postings]
+        grams.sort(key=lambda gram: len(self.postings[gram]))
+        counts = Counter()
+        for gram in grams[:PREFIX_GRAMS]:
+            counts.update(self.postings[gram])
+        return [doc_id for doc_id, _ in counts.most_common(MAX_CANDIDATES)]
+
+    def best_match(self, text, min_score=EDIT_THRESHOLD):
+        """
+        一番近い過去の原文を探し、(原文, 訳, 類似度) を返す関数（min_score 未満なら None）
+        """
+        translation = self.exact.get(text)
+        if translation is not None:
+            return text, translation, 1.0
+
+        best = None
+        best_score = min_score
+        for doc_id in self.candidates(text):
+            source = self.sources[doc_id]
+            # 長さの差だけで min_score に届かないものは照合しない
+            if 2 * min(len(source), len(text)) / (len(source) + len(text)) < best_score:
+                continue
+            matcher = SequenceMatcher(None, source, text, autojunk=False)
+            if matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = doc_id, score
+        if best is None:
+            return None
+        return self.sources[best], self.translations[best], best_score
+
+
+def read_ja_txt(path):
+    """
+    v3.15.0u/global_ja.txt のような「key<TAB>訳」の表（Shift_JIS）を {key: 訳} で読み込む関数
+    """
+    translations = {}
+    with open(path, 'r', encoding='cp932', errors='replace') as file:
+        for line in file:
+            columns = line.rstrip('\r\n').split('\t')
+            if len(columns) >= 2 and columns[1]:
+                translations[columns[0]] = columns[1]
+    return translations
+
+
+def read_translations(path):
+    # .txt の表か、作業用の表（.xlsx / .csv）か、global.ini 形式かを拡張子で判断する
+    if isinstance(path, str) and path.endswith('.txt') and not path.endswith('.ini.txt'):
+        return read_ja_txt(path)
+    if is_sheet_path(path):
+        return read_sheet_translations(path)
+    return read_ini_dict(path)
+
+
+def load_pairs(en_source, ja_source):
+    """
+    同じ key の英語原文と日本語訳を組にしたリストを返す関数（日本語になっていない訳は使わない）
+    en_source は global.ini 形式のファイル（分割済みファイルのリストも可）、ja_source は global.ini 形式か global_ja.txt
+    """
+    english = read_ini_dict(en_source)
+    japanese = read_translations(ja_source)
+    return [(english[key], translation) for key, translation in japanese.items()
+            if key in english and english[key] != translation and contains_japanese(translation)]
+
+
+def build_fuzzy_index(references):
+    """
+    [(英語原文のファイル, 日本語訳のファイル), ...] から FuzzyIndex を作る関数（無いファイルは飛ばす）
+    英語原文の列がある表（日本語ローカライズ_*.xlsx）は英語原文のファイルを None にして、表から直接組を読む
+    """
+    index = FuzzyIndex()
+    for en_source, ja_source in references:
+        if en_source is None:
+            if not os.path.exists(ja_source):
+                print(f"File {ja_source} does not exist!")
+                continue
+            for source, translation in iter_sheet_pairs(ja_source):
+                index.add(source, translation)
+            continue
+        paths = [en_source] if isinstance(en_source, str) else list(en_source)
+        ja_paths = [ja_source] if isinstance(ja_source, str) else list(ja_source)
+        missing = [path for path in paths + ja_paths if not os.path.exists(path)]
+        if missing or not paths:
+            for path in missing:
+                print(f"File {path} does not exist!")
+            continue
+        for source, translation in load_pairs(en_source, ja_source):
+            index.add(source, translation)
+    return index
+
+
+def plan_fuzzy(values, index, edit_keys=None, min_score=EDIT_THRESHOLD):
+    """
+    {key: 英語原文} を過去の訳と照合して、(そのまま使える訳 {key: 訳}, 直してもらう {key: (前の原文, 前の訳, 類似度)}) を返す関数
+    完全一致と数字だけが違う文はそのまま使い、それ以外で似ている文は edit_keys に含まれる key だけ直してもらう
+    """
+    reused = {}
+    edits = {}
+    for key, value in values.items():
+        match = index.best_match(value, min_score)
+        if match is None:
+            continue
+        source, translation, score = match
+        transferred = transfer_numbers(source, value, translation)
+        if transferred is not None:
+            reused[key] = transferred
+        elif len(value) >= EDIT_MIN_LENGTH and (edit_keys is None or key in edit_keys):
+            edits[key] = (source, translation, score)
+    return reused, edits
+
+
+def build_edit_prompt(lang_from, lang_to):
+    return EDIT_PROMPT_TEMPLATE.format(lang_from=lang_from, lang_to=lang_to)
+
+
+def build_edit_messages(system_prompt, previous_source, previous_translation, new_source):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Previous text: {previous_source}\n"
+                                    f"Previous translation: {previous_translation}\n"
+                                    f"New text: {new_source}"},
+    ]
+
+
+# ベンチマーク：v3.16.1 の英語と v3.15.0u の日本語訳で索引を作り、英語の数字や一部の単語を変えた文を引く
+if __name__ == '__main__':
+    from chunk_pipeline import find_split_files
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    en_source = find_split_files(os.path.join(script_dir, '..', 'v3.16.1'))
+    ja_source = os.path.join(script_dir, '..', 'v3.15.0u', 'global_ja.txt')
+
+    start = time.perf_counter()
+    index = build_fuzzy_index([(en_source, ja_source)])
+    print(f"pairs: {len(index)}, build: {time.perf_counter() - start:.3f}s")
+
+    limit = int(sys.argv[1]) if len(sys.argv) >= 2 else 2000
+    queries = {}
+    for i, source in enumerate(index.sources[:limit]):
+        if i % 2:
+            queries[i] = NUMBER_RE.sub(lambda m: str(int(float(m.group())) + 1), source) if NUMBER_RE.search(source) else source + "."
+        else:
+            queries[i] = source.replace(" the ", " a ", 1) if " the " in source else source + "!"
+
+    start = time.perf_counter()
+    reused, edits = plan_fuzzy(queries, index)
+    elapsed = time.perf_counter() - start
+    print(f"queries: {len(queries)}, reused: {len(reused)}, edits: {len(edits)}, "
+          f"{elapsed:.3f}s ({len(queries) / elapsed:.0f} queries/sec)")
@@ -0,0 +1,177 @@
+# -*- coding:utf-8 -*-
+
+import os
+import re
+import sys
+import time
+
+from ini_stream import read_ini_dict
+from script_detect import contains_japanese
+from skip_filter import KeyFilter
+
+# 船・メーカー・場所の名前の用語集
+# 英語の原文に出てくる用語を Aho-Corasick で 1 回なめて見つけ、プレースホルダーに置き換えてから翻訳する
+# （GPT にも DeepL にも用語そのものは渡さない）。戻すときに、決まった訳があればその訳、無ければ英語のままにする
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+# 決まった訳を取る日本語化リソースと、手で追加する用語集（"英語<TAB>訳"、訳が空なら英語のまま残す）
+DEFAULT_REFERENCE = os.path.join(script_dir, '..', 'Japanese.pak', 'global.ini')
+DEFAULT_GLOSSARY_PATH = os.path.join(script_dir, '..', 'glossary.tsv')
+
+# 名前が入っている key（船、メーカー、場所、R&R ステーション、Crusader 周辺の場所）
+NAME_KEY_RE = re.compile(r'^(?:vehicle_Name|manufacturer_Name|Stanton\d[a-z]?(?:_[A-Za-z0-9]+)?$|RR_[A-Z]+_L\d$|dfm_crusader_)')
+# 1 語だけの用語は、ふつうの単語と区別できないので場所の key（Stanton1 = Hurston など）からだけ取る
+SINGLE_WORD_KEY_RE = re.compile(r'^Stanton\d[a-z]?(?:_[A-Za-z0-9]+)?$')
+# 名前として使う値の形（大文字で始まる 1〜5 語、記号は ' & . - だけ）
+TERM_RE = re.compile(r"[A-Z0-9][\w'&.-]*(?: [\w'&.-]*[\w'&.])*")
+TERM_MAX_WORDS = 5
+TERM_MIN_LENGTH = 3
+
+
+def is_term(value, single_word=False):
+    if len(value) < TERM_MIN_LENGTH or 'WIP' in value or not TERM_RE.fullmatch(value):
+        return False
+    words = value.split(' ')
+    return len(words) <= TERM_MAX_WORDS and (single_word or len(words) >= 2)
+
+
+def mine_terms(sources, reference=None):
+    """
+    {key: 英語原文} の名前の key から用語を集め、{用語: 決まった訳（無ければ空文字）} を返す関数
+    reference（{key: 日本語訳}）で同じ key が日本語になっていれば、その訳を決まった訳にする
+    """
+    terms = {}
+    for key, value in sources.items():
+        if not NAME_KEY_RE.match(key):
+            continue
+        value = value.strip()
+        if not is_term(value, single_word=bool(SINGLE_WORD_KEY_RE.match(key))):
+            continue
+        translation = (reference or {}).get(key, "")
+        if translation and (translation == value or not contains_japanese(translation)):
+            translation = ""
+        # 同じ用語に別々の訳があれば、先に見つかった訳を使う
+        if not terms.get(value):
+            terms[value] = translation
+    return terms
+
+
+def read_glossary_file(path):
+    """
+    "英語<TAB>訳" の用語集を {用語: 訳} で読み込む関数（# で始まる行は飛ばす。訳が空なら英語のまま残す）
+    """
+    terms = {}
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        for line in file:
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            term, _, translation = line.partition('\t')
+            if term.strip():
+                terms[term.strip()] = translation.strip()
+    return terms
+
+
+class Glossary:
+    """
+    用語 → 決まった訳（空文字なら英語のまま）の用語集
+    用語は Aho-Corasick のオートマトン（skip_filter.KeyFilter）にまとめ、値ごとに 1 回なめるだけで探す
+    """
+
+    def __init__(self, terms=None):
+        self.terms = {term: translation for term, translation in (terms or {}).items() if term}
+        self.forced = {term: translation for term, translation in self.terms.items() if translation}
+        self._matcher = KeyFilter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def find(self, text):
+        """
+        text の中の用語を、重ならないように左から長い順に選んで [(始まり, 終わり)] で返す関数
+        前後が英数字につながっている所（Hawk の中の Haw など）は用語として扱わない
+        """
+        spans = sorted(((end - length, end) for end, length in self._matcher.iter_matches(text)),
+                       key=lambda span: (span[0], span[0] - span[1]))
+        found = []
+        last_end = 0
+        for start, end in spans:
+            if start < last_end:
+                continue
+            if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+                continue
+            found.append((start, end))
+            last_end = end
+        return found
+
+    def mask(self, value, placeholders, placeholder_format=" #{} "):
+        """
+        マスク済みの値の用語をプレースホルダーに置き換え、placeholders に (プレースホルダー, 用語) を足して返す関数
+        """
+        if not self.terms:
+            return value
+        spans = self.find(value)
+        if not spans:
+            return value
+        parts = []
+        last_end = 0
+        for start, end in spans:
+            placeholder = placeholder_format.format(len(placeholders))
+            placeholders.append((placeholder, value[start:end]))
+            parts.append(value[last_end:start])
+            parts.append(placeholder)
+            last_end = end
+        parts.append(value[last_end:])
+        return "".join(parts)
+
+    def term_only(self, masked, placeholders):
+        """
+        マスク済みの値が用語のプレースホルダーだけでできているか（翻訳に出さなくてよいか）を返す関数
+        """
+        if not placeholders or not all(original in self.terms for _, original in placeholders):
+            return False
+        for placeholder, _ in placeholders:
+            masked = masked.replace(placeholder, "")
+        return not masked.strip()
+
+    def force(self, placeholders):
+        """
+        プレースホルダーの戻し先を、決まった訳のある用語だけその訳に差し替えたリストを返す関数
+        """
+        if not self.forced:
+            return placeholders
+        return [(placeholder, self.forced.get(original, original)) for placeholder, original in placeholders]
+
+
+def load_glossary(sources, reference_path=DEFAULT_REFERENCE, glossary_path=DEFAULT_GLOSSARY_PATH):
+    """
+    英語原文の名前の key から集めた用語と、用語集ファイルの用語（こちらを優先）をまとめた Glossary を返す関数
+    """
+    reference = read_ini_dict(reference_path) if reference_path and os.path.exists(reference_path) else {}
+    terms = mine_terms(sources, reference)
+    if glossary_path and os.path.exists(glossary_path):
+        terms.update(read_glossary_file(glossary_path))
+    return Glossary(terms)
+
+
+# ベンチマーク：v3.16.1 から用語集を作り、全部の値をなめる時間と用語が見つかった値の数を出す
+if __name__ == '__main__':
+    from chunk_pipeline import find_split_files
+
+    directory = sys.argv[1] if len(sys.argv) >= 2 else os.path.join(script_dir, '..', 'v3.16.1')
+    sources = read_ini_dict(find_split_files(directory) or os.path.join(directory, 'global_en.ini.txt'))
+
+    start = time.perf_counter()
+    glossary = load_glossary(sources)
+    print(f"terms: {len(glossary)}, forced: {len(glossary.forced)}, build: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    matched = 0
+    occurrences = 0
+    for value in sources.values():
+        spans = glossary.find(value)
+        matched += bool(spans)
+        occurrences += len(spans)
+    elapsed = time.perf_counter() - start
+    print(f"values: {len(sources)}, with terms: {matched}, terms found: {occurrences}, "
+          f"{elapsed:.3f}s ({len(sources) / elapsed:.0f} values/sec)")
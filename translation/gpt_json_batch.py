@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+
+import json
+import re
+from collections import Counter
+
+# バッチ翻訳用のプロンプト（ID 付きの JSON で送り、ID 付きの JSON で返してもらう）
+BATCH_PROMPT_TEMPLATE = (
+    'You are a helpful assistant that translates {LangFrom} to {LangTo}. '
+    'The user sends a JSON object of the form {{"items": [{{"id": <number>, "text": <string>}}, ...]}}. '
+    'Translate every "text" independently and reply with only a JSON object of the same form, '
+    'containing every "id" exactly once with its translated "text". '
+    'Keep tokens like PLACEHOLDER_[number] unchanged. '
+    'Also, keep specialized terms and names in their original {LangFrom} form.'
+)
+
+
+def build_batch_prompt(lang_from, lang_to):
+    return BATCH_PROMPT_TEMPLATE.format(LangFrom=lang_from, LangTo=lang_to)
+
+
+def build_batch_messages(texts, system_prompt):
+    """
+    文章のリストを ID 付きの JSON にしてメッセージを作る関数（ID はリストのインデックス）
+    """
+    payload = {"items": [{"id": i, "text": text} for i, text in enumerate(texts)]}
+    return [{"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}]
+
+
+def parse_batch_reply(reply):
+    """
+    アシスタントの返信から {id: 翻訳文} の辞書を取り出す関数
+    ```json のコードブロックや前後の説明文が付いていても、最初の { から最後の } までを読む
+    読めなければ空の辞書を返す
+    """
+    start = reply.find("{")
+    end = reply.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        data = json.loads(reply[start:end + 1])
+    except ValueError:
+        return {}
+
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return {}
+
+    translations = {}
+    duplicated = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id, text = item.get("id"), item.get("text")
+        if isinstance(item_id, str) and item_id.isdigit():
+            item_id = int(item_id)
+        if not isinstance(item_id, int) or not isinstance(text, str):
+            continue
+        # 同じ ID が二度返ってきたものはどちらが正しいか分からないので捨てる
+        if item_id in translations:
+            duplicated.add(item_id)
+        translations[item_id] = text
+    for item_id in duplicated:
+        del translations[item_id]
+    return translations
+
+
+def is_valid_translation(source, translated, placeholder_re):
+    # 空でなく、プレースホルダーが過不足なく残っていれば OK
+    if not translated or not translated.strip():
+        return False
+    return Counter(placeholder_re.findall(source)) == Counter(placeholder_re.findall(translated))
+
+
+def translate_batch_json(texts, request_fn, single_fn, system_prompt, placeholder_re=re.compile(r'PLACEHOLDER_\d+')):
+    """
+    文章のリストを 1 回のリクエストでまとめて翻訳し、同じ順番・同じ長さで翻訳結果のリストを返す関数
+    項目ごとに検証して、ID が無い・空・プレースホルダーが壊れたものだけを single_fn で 1 文ずつ翻訳し直す
+    1 文ずつの翻訳も検証を通らなければ None（翻訳できなかった文）にする
+    request_fn(messages) は返信の文字列を返し、失敗したら None を返す
+    single_fn(text) は翻訳結果を返し、失敗したら None を返す
+    """
+    results = [None] * len(texts)
+    if not texts:
+        return results
+
+    reply = request_fn(build_batch_messages(texts, system_prompt))
+    translations = parse_batch_reply(reply) if reply is not None else {}
+
+    retry = []
+    for i, text in enumerate(texts):
+        translated = translations.get(i)
+        if translated is not None and is_valid_translation(text, translated, placeholder_re):
+            results[i] = translated
+        else:
+            retry.append(i)
+
+    if retry:
+        print(f"バッチ {len(texts)} 件中 {len(retry)} 件を個別に翻訳し直します。")
+    for i in retry:
+        # 1 文ずつ翻訳し直した結果も同じ検証を通す（通らなければ None のまま、呼び出し側で英語のまま残す）
+        translated = single_fn(texts[i])
+        if translated is not None and is_valid_translation(texts[i], translated, placeholder_re):
+            results[i] = translated
+
+    return results
@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+
+import codecs
+import os
+import tempfile
+
+# global.ini を 1 行ずつ読み書きする
+# 翻訳（Gpt_Translator.translate_ini_file）は重複除去のために原文を read_ini_dict で全部読み込むが、
+# 書き出し（write_translated_ini）は原文を読み直しながら 1 行ずつ書くので、出力のために行を溜めない
+
+BOM = codecs.BOM_UTF8.decode('utf-8')
+
+
+def has_bom(path):
+    with open(path, 'rb') as file:
+        return file.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8
+
+
+def iter_ini_records(path):
+    """
+    global.ini を 1 行ずつ読み、(key, value, raw_line) を順番に返すジェネレーター
+    raw_line は改行コードも含めた元の行そのもの（先頭行の BOM だけは取り除く）
+    '=' の無い行やコメント行は key, value が None になる
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        first = True
+        for raw_line in file:
+            if first:
+                first = False
+                if raw_line.startswith(BOM):
+                    raw_line = raw_line[len(BOM):]
+            line = raw_line.rstrip('\r\n')
+            if '=' in line and not line.startswith(';'):
+                key, value = line.split('=', 1)
+                yield key, value, raw_line
+            else:
+                yield None, None, raw_line
+
+
+def iter_ini_records_many(paths):
+    """
+    分割されたファイル（global_en_00, global_en_01...）を順番に 1 つのファイルとして読むジェネレーター
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        yield from iter_ini_records(path)
+
+
+def read_ini_dict(path):
+    """
+    global.ini を {key: value} の辞書として読み込む関数（BOM は key に含めない）
+    分割されたファイルのリストを渡すと、順番につなげて読み込む
+    """
+    return {key: value for key, value, _ in iter_ini_records_many(path) if key is not None}
+
+
+def iter_translated_lines(records, translations):
+    """
+    (key, value, raw_line) の列を受け取り、翻訳がある行だけを書き換えた行を順番に返すジェネレーター
+    翻訳の無い行は改行コードも含めて元の行をそのまま返す
+    """
+    for key, value, raw_line in records:
+        if key is not None and key in translations:
+            line_ending = raw_line[len(raw_line.rstrip('\r\n')):]
+            yield f"{key}={translations[key]}{line_ending}"
+        else:
+            yield raw_line
+
+
+def write_translated_ini(source_path, output_path, translations, bom=None):
+    """
+    元の global.ini を読みながら翻訳を差し込み、一時ファイル経由で output_path に書き出す関数
+    source_path に分割されたファイルのリストを渡すと、1 つの global.ini にまとめて書き出す
+    bom を省略すると元のファイル（の先頭）に BOM があるときだけ BOM を付ける
+    """
+    source_paths = [source_path] if isinstance(source_path, (str, os.PathLike)) else list(source_path)
+    if bom is None:
+        bom = has_bom(source_paths[0])
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.ini.txt')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8-sig' if bom else 'utf-8', newline='') as file:
+            for line in iter_translated_lines(iter_ini_records_many(source_paths), translations):
+                file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,173 @@
+# -*- coding:utf-8 -*-
+
+import os
+import re
+import sys
+import time
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python 3.10 以前
+    import sre_parse
+
+# 翻訳してはいけないプレースホルダーを取得する正規表現（Gpt_Translator.py 用）
+DEFAULT_PATTERNS = [
+    r'~mission\([\w|]+\)',
+    r'~RefineryMethod\(\w+\)',
+    r'~action\(\w+\)',
+    r'~shopInteractionData\(\w+\)',
+    r'~serviceBeacon\(\w+\)',
+    r'ID#\s+\w+',
+    r'[\w\s]+:\s[^\n]+',
+    r'%\w+',
+    r'WIP',
+    r'\<[^>]*\>',
+    r'\[[^\]]*\]',
+    r'\([^)]*\)',
+    r'.*;.*',          # ;で終わる行
+    r'.*=.*',          # =での代入
+    r'.*\{.*',         # 開始ブレース
+    r'.*\}.*',         # 終了ブレース
+    r'\bif\b',         # if文
+    r'\bfor\b',        # forループ
+    r'\bwhile\b',      # whileループ
+    r'\bint\b',        # int型
+    r'\bfloat\b',      # float型
+    r'\bdouble\b',     # double型
+]
+
+
+def required_literals(pattern):
+    """
+    パターンが当たるために必ず文字列中に含まれていなければならない固定文字列のリストを返す関数
+    （トップレベルで連続するリテラルだけを見る。フラグ付きのパターンは判定しない）
+    """
+    parsed = sre_parse.parse(pattern)
+    if parsed.state.flags & ~(re.UNICODE | sre_parse.SRE_FLAG_UNICODE):
+        return []
+
+    literals = []
+    run = []
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(arg))
+        elif op is sre_parse.AT:
+            # \b や ^ などの幅 0 の条件は連続を切らない
+            continue
+        else:
+            if run:
+                literals.append("".join(run))
+            run = []
+    if run:
+        literals.append("".join(run))
+    return literals
+
+
+def padded_pattern(token):
+    """
+    記号（" |~ " やプレースホルダーの形 " #{} "）の正規表現を返す関数（{} は番号にする）
+    前後の空白は翻訳で落ちることがある（日本語の訳は #0に移動 のように詰める）ので、1 つずつ無くても当たるようにする
+    """
+    lead = len(token) - len(token.lstrip(" "))
+    trail = len(token) - len(token.rstrip(" "))
+    core = r"(\d+)".join(re.escape(part) for part in token.strip(" ").split("{}"))
+    return " ?" * lead + core + " ?" * trail
+
+
+class MaskingEngine:
+    """
+    プレースホルダーのマスクと復元をまとめて行うエンジン
+    正規表現は作成時に一度だけコンパイルし、パターンに必要な固定文字列が値に無ければ
+    正規表現を走らせずに飛ばす（.*;.* のような行全体を舐めるパターンが一番重いため）
+    マスク結果は従来の extract_and_replace_patterns（パターンを順番に re.sub）と同じになる
+    """
+
+    def __init__(self, patterns, placeholder_format=" #{} ", newline_token=" |~ "):
+        self.placeholder_format = placeholder_format
+        self.newline_token = newline_token
+        self._compiled = [(re.compile(pattern), required_literals(pattern)) for pattern in patterns]
+        # 復元時に全プレースホルダーを 1 回で見つけるためのパターン（前後の空白は無くてもよい）
+        self._placeholder_re = re.compile(padded_pattern(placeholder_format))
+        self._newline_re = re.compile(padded_pattern(newline_token)) if newline_token is not None else None
+
+    def mask(self, value):
+        """
+        値のプレースホルダーをマスクして (マスク後の値, [(プレースホルダー, 元の文字列)], use_gpt) を返す
+        """
+        # 改行記号を置き換えてあげる
+        if self.newline_token is not None:
+            value = value.replace("\\n", self.newline_token)
+
+        placeholders = []
+
+        def replacer(match):
+            placeholder = self.placeholder_format.format(len(placeholders))
+            placeholders.append((placeholder, match.group(0)))
+            return placeholder
+
+        # 後のパターンは前のパターンで置き換えた後の文字列に当てるので、順番に適用する
+        for pattern, literals in self._compiled:
+            if all(literal in value for literal in literals):
+                value = pattern.sub(replacer, value)
+
+        return value, placeholders, len(placeholders) > 0
+
+    def restore(self, value, placeholders):
+        """
+        マスクした値（翻訳結果）のプレースホルダーを 1 回の置換で元に戻し、改行記号を \\n に戻す
+        元の文字列に前のプレースホルダーや改行記号が含まれている場合もまとめて戻す
+        （改行記号はプレースホルダーを戻した後に戻すので、GPT・DeepL のどちらの訳もこれ 1 つで元に戻る）
+        訳でプレースホルダーや改行記号の前後の空白が落ちていても戻す
+        """
+        if placeholders:
+            # 番号 → 元の文字列（placeholders に無い番号の #n は訳の一部としてそのまま残す）
+            originals = {}
+            for placeholder, original in placeholders:
+                match = self._placeholder_re.fullmatch(placeholder)
+                if match:
+                    originals[match.group(1)] = original
+
+            def replacer(match):
+                original = originals.get(match.group(1))
+                if original is None:
+                    return match.group(0)
+                return self._placeholder_re.sub(replacer, original)
+
+            value = self._placeholder_re.sub(replacer, value)
+        if self._newline_re is not None:
+            value = self._newline_re.sub(lambda match: "\\n", value)
+        return value
+
+
+# ベンチマーク：従来の re.sub の繰り返しと比べて、結果が同じことと速度を確認する
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = sys.argv[1:] or [os.path.join(script_dir, '..', 'v3.16.1', f'global_en_0{i}') for i in range(7)]
+    values = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            values.extend(line.rstrip('\n').split('=', 1)[1] for line in file if '=' in line)
+    print(f"values: {len(values)}")
+
+    def legacy_mask(value, patterns):
+        placeholders = []
+        value = value.replace("\\n", " |~ ")
+
+        def replacer(match):
+            placeholder = f" #{len(placeholders)} "
+            placeholders.append((placeholder, match.group(0)))
+            return placeholder
+
+        for pattern in patterns:
+            value = re.sub(pattern, replacer, value)
+        return value, placeholders, len(placeholders) > 0
+
+    start = time.perf_counter()
+    legacy = [legacy_mask(value, DEFAULT_PATTERNS) for value in values]
+    print(f"legacy re.sub loop: {time.perf_counter() - start:.3f}s")
+
+    engine = MaskingEngine(DEFAULT_PATTERNS)
+    start = time.perf_counter()
+    masked = [engine.mask(value) for value in values]
+    print(f"masking engine: {time.perf_counter() - start:.3f}s")
+    print("same result:", legacy == masked)
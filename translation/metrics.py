@@ -0,0 +1,181 @@
+# -*- coding:utf-8 -*-
+
+import json
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# レイテンシのヒストグラムの区切り（ミリ秒）
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# 概算費用の単価（USD）。GPT は 1000 トークンあたりの (入力, 出力)、DeepL は 100 万文字あたり
+GPT_PRICES_PER_1K_TOKENS = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4": (0.03, 0.06),
+}
+DEEPL_PRICE_PER_MILLION_CHARACTERS = 25.0
+
+
+class StageTimer:
+    """
+    処理の段階（load, skip-filter, mask, dispatch, restore, write）ごとの所要時間を積み上げる
+    翻訳結果を受け取るスレッドからも呼ばれるので、加算はロックで守る
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+
+def percentile(values, p):
+    # 最近傍順位法のパーセンタイル（値が無ければ 0.0）
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def latency_histogram(latencies, buckets=LATENCY_BUCKETS_MS):
+    """
+    秒のリストを {"<=50ms": 件数, ..., ">10000ms": 件数} のヒストグラムにする関数
+    """
+    histogram = {f"<={bucket}ms": 0 for bucket in buckets}
+    histogram[f">{buckets[-1]}ms"] = 0
+    for latency in latencies:
+        ms = latency * 1000
+        for bucket in buckets:
+            if ms <= bucket:
+                histogram[f"<={bucket}ms"] += 1
+                break
+        else:
+            histogram[f">{buckets[-1]}ms"] += 1
+    return histogram
+
+
+def provider_summary(provider):
+    latencies = list(provider.latencies)
+    return {
+        "calls": provider.calls,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p90": round(percentile(latencies, 90) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1) if latencies else 0.0,
+        },
+        "histogram": latency_histogram(latencies),
+        "usage": dict(provider.usage),
+    }
+
+
+def estimate_cost(gpt_model, gpt_usage, deepl_characters):
+    """
+    トークン数と文字数から概算費用（USD）を返す関数（単価の分からないモデルは None）
+    """
+    gpt_cost = None
+    if gpt_model in GPT_PRICES_PER_1K_TOKENS:
+        prompt_price, completion_price = GPT_PRICES_PER_1K_TOKENS[gpt_model]
+        gpt_cost = (gpt_usage.get("prompt_tokens", 0) / 1000 * prompt_price
+                    + gpt_usage.get("completion_tokens", 0) / 1000 * completion_price)
+    deepl_cost = deepl_characters / 1000000 * DEEPL_PRICE_PER_MILLION_CHARACTERS
+    total = None if gpt_cost is None else gpt_cost + deepl_cost
+    return {
+        "gpt": None if gpt_cost is None else round(gpt_cost, 4),
+        "deepl": round(deepl_cost, 4),
+        "total": None if total is None else round(total, 4),
+    }
+
+
+def build_summary(timer, gpt_provider, deepl_provider, gpt_model, tm=None, counts=None):
+    """
+    段階ごとの時間・プロバイダーごとのレイテンシと使用量・概算費用・キャッシュのヒット率をまとめた辞書を返す関数
+    """
+    summary = {
+        "stages": {name: round(seconds, 3) for name, seconds in timer.stages.items()},
+        "counts": dict(counts or {}),
+        "providers": {
+            gpt_provider.name: provider_summary(gpt_provider),
+            deepl_provider.name: provider_summary(deepl_provider),
+        },
+        "cost_usd": estimate_cost(gpt_model,
+                                  gpt_provider.usage if gpt_provider.billable else {},
+                                  deepl_provider.usage["characters"] if deepl_provider.billable else 0),
+    }
+    if tm is not None:
+        lookups = tm.hits + tm.misses
+        summary["translation_memory"] = {
+            "hits": tm.hits,
+            "misses": tm.misses,
+            "hit_rate": round(tm.hits / lookups, 4) if lookups else 0.0,
+        }
+    return summary
+
+
+def write_summary(summary, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, ensure_ascii=False, indent=2)
+
+
+def print_stage_summary(summary):
+    print("段階ごとの時間（秒）")
+    for name, seconds in summary["stages"].items():
+        print(f"  {name}: {seconds}")
+    for name, stats in summary["providers"].items():
+        latency = stats["latency_ms"]
+        print(f"  {name}: calls {stats['calls']}, p50 {latency['p50']} ms, p99 {latency['p99']} ms, usage {stats['usage']}")
+    cost = summary["cost_usd"]
+    if cost["total"] is not None:
+        print(f"  概算費用: ${cost['total']}")
+
+
+class ProgressLine:
+    """
+    翻訳の進み具合を 1 行で上書き表示する（件数、割合、件/秒、残り時間）
+    """
+
+    def __init__(self, total, stream=None, interval=0.5):
+        self.total = total
+        self.done = 0
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self._start = time.monotonic()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, count=1):
+        with self._lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self._last >= self.interval or self.done >= self.total:
+                self._last = now
+                self._render(now)
+
+    def _render(self, now):
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else 0.0
+        percent = self.done / self.total * 100 if self.total else 100.0
+        self.stream.write(f"\r[{self.done}/{self.total}] {percent:5.1f}% {rate:7.1f}/s ETA {remaining:6.0f}s")
+        self.stream.flush()
+
+    def close(self):
+        with self._lock:
+            self._render(time.monotonic())
+            self.stream.write("\n")
+            self.stream.flush()
@@ -0,0 +1,209 @@
+# -*- coding:utf-8 -*-
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# オフラインで翻訳パイプラインを動かすためのモックサーバー
+# OpenAI の /v1/chat/completions と DeepL の /v2/translate を真似て、原文に MOCK_PREFIX を付けて返す
+# 使い方: python mock_provider.py --port 8765 --latency 0.2 --error-rate 0.01 --rate-limit 20
+#         TRANSLATOR_PROVIDER=http OPENAI_API_BASE=http://127.0.0.1:8765/v1 DEEPL_SERVER_URL=http://127.0.0.1:8765 python Gpt_Translator.py
+
+MOCK_PREFIX = "訳:"
+
+
+class MockSettings:
+    """
+    モックサーバーの振る舞い
+      latency     : 1 リクエストの基本の応答時間（秒）
+      jitter      : 応答時間に足すばらつきの最大値（秒）
+      error_rate  : 500 を返す割合（0.0 ～ 1.0）
+      rate_limit  : エンドポイントごとの 1 秒あたりの上限（0 なら無制限。超えると 429 を返す）
+      retry_after : 429 のときに返す Retry-After（秒）
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class MockStats:
+    """
+    エンドポイントごとのリクエスト数・テキスト数・文字数と、返したエラーの数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def add(self, endpoint, field, amount=1):
+        with self._lock:
+            counters = self.endpoints.setdefault(endpoint, {"requests": 0, "texts": 0, "characters": 0, "errors": 0, "rate_limited": 0})
+            counters[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(counters) for endpoint, counters in self.endpoints.items()}
+
+
+def mock_translate(text):
+    # プレースホルダーや改行記号はそのまま残るように、先頭に印を付けるだけ
+    return MOCK_PREFIX + text
+
+
+def _chat_reply(messages):
+    content = messages[-1]["content"] if messages else ""
+    # Gpt_Translator_bat の JSON バッチ形式ならバッチで返す
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        items = [{"id": item.get("id"), "text": mock_translate(str(item.get("text", "")))} for item in payload["items"]]
+        return json.dumps({"items": items}, ensure_ascii=False), [str(item.get("text", "")) for item in payload["items"]]
+    return mock_translate(content), [content]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # 1 リクエストごとのログは出さない
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            endpoint = "chat"
+        elif path.endswith("/v2/translate"):
+            endpoint = "translate"
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        server = self.server
+        settings = server.settings
+        server.stats.add(endpoint, "requests")
+
+        if not server.take_slot(endpoint):
+            server.stats.add(endpoint, "rate_limited")
+            self._send_json(429, {"error": {"message": "Too many requests"}}, {"Retry-After": str(settings.retry_after)})
+            return
+
+        time.sleep(settings.latency + settings.random.uniform(0, settings.jitter))
+
+        if settings.random.random() < settings.error_rate:
+            server.stats.add(endpoint, "errors")
+            self._send_json(500, {"error": {"message": "Internal server error (mock)"}})
+            return
+
+        if endpoint == "chat":
+            request = json.loads(body.decode("utf-8"))
+            reply, texts = _chat_reply(request.get("messages", []))
+            response = {
+                "object": "chat.completion",
+                "model": request.get("model", ""),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(reply) // 4},
+            }
+        else:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                texts = json.loads(body.decode("utf-8")).get("text", [])
+            else:
+                texts = urllib.parse.parse_qs(body.decode("utf-8")).get("text", [])
+            response = {"translations": [{"detected_source_language": "EN", "text": mock_translate(text)} for text in texts]}
+
+        server.stats.add(endpoint, "texts", len(texts))
+        server.stats.add(endpoint, "characters", sum(len(text) for text in texts))
+        self._send_json(200, response)
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings):
+        super().__init__(address, _Handler)
+        self.settings = settings
+        self.stats = MockStats()
+        self._window_lock = threading.Lock()
+        self._windows = {}
+
+    def take_slot(self, endpoint):
+        # 1 秒ごとの固定ウィンドウで、上限を超えたリクエストは 429 にする
+        if not self.settings.rate_limit:
+            return True
+        with self._window_lock:
+            second = int(time.monotonic())
+            window, count = self._windows.get(endpoint, (second, 0))
+            if window != second:
+                window, count = second, 0
+            if count >= self.settings.rate_limit:
+                return False
+            self._windows[endpoint] = (window, count + 1)
+            return True
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(settings=None, host="127.0.0.1", port=0):
+    """
+    モックサーバーを裏のスレッドで起動して返す関数（port=0 なら空いているポートを使う）
+    止めるときは server.shutdown() を呼ぶ
+    """
+    server = MockProviderServer((host, port), settings or MockSettings())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="OpenAI / DeepL のモックサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.error_rate, args.rate_limit, args.retry_after, args.seed)
+    server = MockProviderServer((args.host, args.port), settings)
+    print(f"Mock provider listening on {server.url} (OpenAI: {server.url}/v1, DeepL: {server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot(), ensure_ascii=False))
+        server.server_close()
@@ -0,0 +1,136 @@
+# -*- coding:utf-8 -*-
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from ini_stream import read_ini_dict
+from script_detect import contains_chinese, contains_japanese, contains_korean
+
+# 他の言語のリソース（global_cn.ini.txt など）で、その言語に翻訳されていない key は
+# ゲーム側で使う識別子などなので翻訳してはいけない。その key の一覧を索引としてキャッシュする
+# 事前に作っておく場合: python protected_keys.py v3.20.0b [cn ja ko]
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(script_dir, '..', 'cache')
+
+# 参照リソースの言語 → その言語の文字を含むかを判定する関数
+REFERENCE_LOCALES = {
+    "cn": contains_chinese,
+    "ja": contains_japanese,
+    "ko": contains_korean,
+}
+
+# 索引の形式を変えたら上げる
+INDEX_FORMAT = 1
+INDEX_MAGIC = "SCPK"
+# ハッシュを計算するときに一度に読むバイト数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def reference_path(version, locale="cn"):
+    return os.path.join(script_dir, '..', version, f'global_{locale}.ini.txt')
+
+
+def file_hash(path):
+    # 参照リソースの中身の sha256（索引のキーにする）。hashlib.file_digest は 3.11 からなので、決まった大きさずつ読む
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_protected_keys(path, locale="cn"):
+    """
+    参照リソースを読み、その言語の文字を含まない値を持つ key を並べ替えて返す関数
+    """
+    contains_locale = REFERENCE_LOCALES[locale]
+    return sorted(key for key, value in read_ini_dict(path).items() if not contains_locale(value))
+
+
+def index_path(digest, locale="cn", cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, f'protected_keys_{locale}_{digest[:16]}.idx')
+
+
+def write_index(path, keys, locale, digest):
+    """
+    1 行目に "SCPK 形式 言語 sha256"、2 行目以降に key を 1 行ずつ書いた索引を書き出す関数
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # 複数のプロセスが同時に書いても混ざらないよう、書き手ごとに別の一時ファイルに書いてから置き換える
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', dir=directory,
+                                         prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False) as file:
+            tmp_path = file.name
+            file.write(f"{INDEX_MAGIC} {INDEX_FORMAT} {locale} {digest}\n")
+            file.write("\n".join(keys))
+        os.replace(tmp_path, path)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_index(path, locale, digest):
+    """
+    索引を読み込み、key のリストを返す関数（形式や参照リソースのハッシュが違えば None）
+    key はスキップフィルタ（部分一致）のキーワードとして全部使うので、まとめて読み込む
+    """
+    with open(path, 'r', encoding='utf-8', newline='\n') as file:
+        header = file.readline().rstrip('\n')
+        if header != f"{INDEX_MAGIC} {INDEX_FORMAT} {locale} {digest}":
+            return None
+        body = file.read()
+    return body.split("\n") if body else []
+
+
+def load_protected_keys(path, locale="cn", cache_dir=DEFAULT_CACHE_DIR, required=False):
+    """
+    翻訳してはいけない key のリストを返す関数
+    参照リソースのハッシュごとに索引をキャッシュし、2 回目以降は索引を読むだけで済ませる
+    参照リソースが無いときは、required なら FileNotFoundError、そうでなければ警告を出して空のリストを返す
+    （空のリストだと key による保護が効かず、すべての key が翻訳の対象になる）
+    """
+    if not os.path.exists(path):
+        if required:
+            raise FileNotFoundError(f"File {path} does not exist!")
+        print(f"警告: {path} が無いため、翻訳してはいけない key を判別できません（key による保護なしで翻訳します）")
+        return []
+
+    digest = file_hash(path)
+    cached_path = index_path(digest, locale, cache_dir)
+    if os.path.exists(cached_path):
+        try:
+            keys = read_index(cached_path, locale, digest)
+            if keys is not None:
+                return keys
+        except Exception as e:
+            print(f"Error reading {cached_path}: {str(e)}")
+
+    keys = compute_protected_keys(path, locale)
+    try:
+        write_index(cached_path, keys, locale, digest)
+    except Exception as e:
+        print(f"Error writing {cached_path}: {str(e)}")
+    return keys
+
+
+# 索引を事前に作る：python protected_keys.py <version> [言語...]
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python protected_keys.py <version> [locale ...]")
+        sys.exit(1)
+    version = sys.argv[1]
+    locales = sys.argv[2:] or ["cn"]
+    for locale in locales:
+        if locale not in REFERENCE_LOCALES:
+            print(f"Unknown locale: {locale} (available: {', '.join(REFERENCE_LOCALES)})")
+            continue
+        start = time.perf_counter()
+        keys = load_protected_keys(reference_path(version, locale), locale)
+        print(f"{locale}: {len(keys)} protected keys ({time.perf_counter() - start:.3f}s)")
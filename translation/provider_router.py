@@ -0,0 +1,190 @@
+# -*- coding:utf-8 -*-
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+
+from metrics import percentile
+
+# 連続でこの回数失敗したプロバイダーは、COOLDOWN_SECONDS の間は使わない
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 30.0
+# ヘッジの待ち時間を決めるのに必要な成功件数
+HEDGE_MIN_SAMPLES = 20
+
+
+class ProviderHealth:
+    """
+    プロバイダーごとの直近のレイテンシと連続失敗数
+    連続で失敗したら一定時間使わない（時間が過ぎたら試しに使い、また失敗したらすぐ止める）
+    """
+
+    def __init__(self, window=200, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN_SECONDS):
+        self.latencies = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.successes += 1
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+
+    def healthy(self):
+        return time.monotonic() >= self._open_until
+
+    def latency_percentile(self, p):
+        with self._lock:
+            latencies = list(self.latencies)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(latencies, p)
+
+
+def route_by_rules(rules, text, use_gpt, default):
+    """
+    [(条件の関数(text, use_gpt), プロバイダー名), ...] を上から順に見て、最初に当てはまったプロバイダー名を返す関数
+    """
+    for condition, name in rules:
+        if condition(text, use_gpt):
+            return name
+    return default
+
+
+class ProviderRouter:
+    """
+    1 文の翻訳をプロバイダーに振り分ける
+      - 使えない（連続で失敗している）プロバイダーは後回しにする
+      - 翻訳に失敗したら（空文字が返ってきたら）次のプロバイダーで翻訳し直す
+      - hedge_percentile を決めると、その分位のレイテンシを過ぎても返ってこないリクエストは
+        次のプロバイダーにも送り、先に返ってきた方を使う
+    backends は名前から translate_text_GPT(text, count) 形式の関数への辞書（書いた順番が代わりに使う順番）
+    lookups は名前から翻訳メモリを引く関数 lookup(text) への辞書（訳が無ければ None）
+    翻訳メモリから返した訳は API を呼んでいないので、レイテンシや成功数に数えない（ヘッジの待ち時間が 0 に寄らないように）
+    translate() に渡したキーワード引数（翻訳先の言語など）はそのまま backends と lookups の関数に渡す
+    """
+
+    def __init__(self, backends, hedge_percentile=None, max_hedge_workers=16, lookups=None):
+        self.backends = dict(backends)
+        self.lookups = dict(lookups or {})
+        self.health = {name: ProviderHealth() for name in self.backends}
+        self.hedge_percentile = hedge_percentile
+        self.failovers = 0
+        self.hedged = 0
+        self._counter_lock = threading.Lock()
+        self._max_hedge_workers = max_hedge_workers
+        self._executor = None
+
+    def order(self, preferred, exclude=()):
+        """
+        試す順番を返す関数（preferred を先頭に、使えないプロバイダーは後ろに回す）
+        """
+        names = [preferred] + [name for name in self.backends if name != preferred]
+        names = [name for name in names if name in self.backends and name not in exclude]
+        return [name for name in names if self.health[name].healthy()] + \
+               [name for name in names if not self.health[name].healthy()]
+
+    def choose(self, preferred, exclude=()):
+        names = self.order(preferred, exclude)
+        return names[0] if names else None
+
+    def record(self, name, ok, latency):
+        # バッチなど、ルーターを通さずに呼んだ結果も健康状態に反映する
+        if ok:
+            self.health[name].record_success(latency)
+        else:
+            self.health[name].record_failure()
+
+    def _count(self, field):
+        with self._counter_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _lookup(self, name, text, options):
+        lookup = self.lookups.get(name)
+        return lookup(text, **options) if lookup is not None else None
+
+    def _attempt(self, name, text, count, options):
+        # API を呼んだときだけ、結果とレイテンシを健康状態に反映する
+        start = time.perf_counter()
+        try:
+            result = self.backends[name](text, count, **options)
+        except Exception as e:
+            print(f"Error with {name}: {str(e)}")
+            result = ""
+        self.record(name, bool(result), time.perf_counter() - start)
+        return result
+
+    def _attempt_cached(self, name, text, count, options):
+        cached = self._lookup(name, text, options)
+        if cached:
+            return cached
+        return self._attempt(name, text, count, options)
+
+    def _hedge_delay(self, name):
+        if self.hedge_percentile is None:
+            return None
+        return self.health[name].latency_percentile(self.hedge_percentile)
+
+    def _call(self, name, text, count, alternates, options):
+        """
+        name で翻訳し、(翻訳結果, 試したプロバイダー名の集合) を返す
+        遅いときは alternates の先頭にもヘッジのリクエストを送る
+        """
+        cached = self._lookup(name, text, options)
+        if cached:
+            return cached, {name}
+        hedge_after = self._hedge_delay(name)
+        if hedge_after is None or not alternates:
+            return self._attempt(name, text, count, options), {name}
+
+        if self._executor is None:
+            with self._counter_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_hedge_workers)
+        primary = self._executor.submit(self._attempt, name, text, count, options)
+        try:
+            return primary.result(timeout=hedge_after), {name}
+        except TimeoutError:
+            pass
+
+        hedge_name = alternates[0]
+        self._count("hedged")
+        pending = {primary, self._executor.submit(self._attempt_cached, hedge_name, text, count, options)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result:
+                    # 遅い方は止められないので、結果を捨てる（翻訳メモリには残る）
+                    return result, {name, hedge_name}
+        return "", {name, hedge_name}
+
+    def translate(self, text, count, preferred, exclude=(), **options):
+        """
+        preferred から順に翻訳を試し、最初に成功した翻訳結果を返す関数（すべて失敗したら空文字）
+        """
+        tried = set(exclude)
+        names = self.order(preferred, exclude)
+        for i, name in enumerate(names):
+            if name in tried:
+                continue
+            if i > 0:
+                self._count("failovers")
+            result, attempted = self._call(name, text, count, [alt for alt in names[i + 1:] if alt not in tried], options)
+            if result:
+                return result
+            tried |= attempted
+        return ""
@@ -0,0 +1,227 @@
+# -*- coding:utf-8 -*-
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# 既定の API の URL（http モードで別の URL を使うときは OPENAI_API_BASE / DEEPL_SERVER_URL で上書き）
+OPENAI_API_BASE = "https://api.openai.com/v1"
+DEEPL_SERVER_URL = "https://api.deepl.com"
+# OpenAI のモデルの既定値（各スクリプトでは環境変数 OPENAI_MODEL で変えられる）
+DEFAULT_GPT_MODEL = "gpt-3.5-turbo"
+HTTP_TIMEOUT = 60
+
+
+class ProviderHTTPError(Exception):
+    """
+    http モードのプロバイダーが 2xx 以外を受け取ったときの例外
+    """
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.headers = dict(headers or {})
+
+
+class Provider:
+    """
+    翻訳プロバイダーの共通部分（呼び出し回数と 1 回ごとの所要時間、トークン数・文字数を記録する）
+    name は翻訳メモリのキーにも使うので、同じ訳が返ってくるプロバイダー同士は同じ名前にする
+    billable が False のプロバイダーは概算費用に含めない
+    network が False のプロバイダー（API を呼ばないもの）はレート制限をかけない
+    """
+
+    name = ""
+    billable = True
+    network = True
+
+    def __init__(self):
+        self.calls = 0
+        self.latencies = []
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "characters": 0}
+        self._stats_lock = threading.Lock()
+
+    def _timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._stats_lock:
+                self.calls += 1
+                self.latencies.append(time.perf_counter() - start)
+
+    def _add_usage(self, prompt_tokens=0, completion_tokens=0, characters=0):
+        with self._stats_lock:
+            self.usage["prompt_tokens"] += prompt_tokens or 0
+            self.usage["completion_tokens"] += completion_tokens or 0
+            self.usage["characters"] += characters
+
+
+def _chat_characters(messages):
+    return sum(len(message["content"]) for message in messages)
+
+
+def _record_chat_usage(provider, messages, response):
+    usage = response.get("usage") or {}
+    provider._add_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"), _chat_characters(messages))
+
+
+# --- OpenAI チャット ---
+
+class OpenAIProvider(Provider):
+    """
+    openai SDK を使うチャットプロバイダー（SDK は最初の呼び出しのときに読み込む）
+    """
+
+    name = "gpt"
+
+    def __init__(self, api_key=None, model=DEFAULT_GPT_MODEL, api_base=None):
+        super().__init__()
+        self.api_key = api_key
+        self.model = model
+        self.api_base = api_base
+        self._openai = None
+
+    def chat(self, messages):
+        if self._openai is None:
+            import openai
+            self._openai = openai
+        kwargs = {"api_key": self.api_key}
+        if self.api_base:
+            kwargs["api_base"] = self.api_base
+        response = self._timed(lambda: self._openai.ChatCompletion.create(model=self.model, messages=messages, **kwargs))
+        _record_chat_usage(self, messages, response)
+        return response['choices'][0]['message']['content']
+
+
+class HttpChatProvider(Provider):
+    """
+    SDK を使わずに OpenAI 互換の /chat/completions を直接呼ぶチャットプロバイダー
+    """
+
+    name = "gpt"
+
+    def __init__(self, api_key=None, model=DEFAULT_GPT_MODEL, api_base=OPENAI_API_BASE):
+        super().__init__()
+        self.api_key = api_key
+        self.model = model
+        self.api_base = api_base.rstrip("/")
+
+    def chat(self, messages):
+        body = json.dumps({"model": self.model, "messages": messages}).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        response = self._timed(_post, f"{self.api_base}/chat/completions", body, headers)
+        _record_chat_usage(self, messages, response)
+        return response['choices'][0]['message']['content']
+
+
+class DummyChatProvider(Provider):
+    """
+    API を呼ばずに原文の末尾に _GPT を付けて返すプロバイダー（動作確認用）
+    """
+
+    name = "dummy_gpt"
+    billable = False
+    network = False
+
+    def __init__(self, model=DEFAULT_GPT_MODEL):
+        super().__init__()
+        self.model = model
+
+    def chat(self, messages):
+        self._add_usage(characters=_chat_characters(messages))
+        return self._timed(lambda: messages[-1]["content"] + "_GPT")
+
+
+# --- DeepL ---
+
+class DeepLProvider(Provider):
+    """
+    deepl SDK を使うプロバイダー（SDK は最初の呼び出しのときに読み込む）
+    """
+
+    name = "deepl"
+
+    def __init__(self, auth_key=None, server_url=None):
+        super().__init__()
+        self.auth_key = auth_key
+        self.server_url = server_url
+        self._translator = None
+
+    def translate(self, texts, target_lang):
+        if self._translator is None:
+            import deepl
+            self._translator = deepl.Translator(self.auth_key, server_url=self.server_url)
+        results = self._timed(lambda: self._translator.translate_text(texts, target_lang=target_lang))
+        self._add_usage(characters=sum(len(text) for text in texts))
+        return [result.text for result in results]
+
+
+class HttpDeepLProvider(Provider):
+    """
+    SDK を使わずに DeepL の /v2/translate を直接呼ぶプロバイダー
+    """
+
+    name = "deepl"
+
+    def __init__(self, auth_key=None, server_url=DEEPL_SERVER_URL):
+        super().__init__()
+        self.auth_key = auth_key
+        self.server_url = server_url.rstrip("/")
+
+    def translate(self, texts, target_lang):
+        body = urllib.parse.urlencode([("target_lang", target_lang)] + [("text", text) for text in texts]).encode("utf-8")
+        headers = {"Content-Type": "application/x-www-form-urlencoded", "Authorization": f"DeepL-Auth-Key {self.auth_key}"}
+        response = self._timed(_post, f"{self.server_url}/v2/translate", body, headers)
+        self._add_usage(characters=sum(len(text) for text in texts))
+        return [translation["text"] for translation in response["translations"]]
+
+
+class DummyDeepLProvider(Provider):
+    """
+    API を呼ばずに原文の末尾に _Deepl を付けて返すプロバイダー（動作確認用）
+    """
+
+    name = "dummy_deepl"
+    billable = False
+    network = False
+
+    def translate(self, texts, target_lang):
+        self._add_usage(characters=sum(len(text) for text in texts))
+        return self._timed(lambda: [text + "_Deepl" for text in texts])
+
+
+def _post(url, body, headers):
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        raise ProviderHTTPError(e.code, e.read().decode("utf-8", "replace")[:200], e.headers) from None
+
+
+def create_providers(mode=None, model=DEFAULT_GPT_MODEL):
+    """
+    (GPT のプロバイダー, DeepL のプロバイダー) を作る関数
+    mode（省略時は環境変数 TRANSLATOR_PROVIDER）は次のどれか
+      sdk   : openai / deepl の SDK を使う（既定）
+      http  : SDK を使わずに REST API を直接呼ぶ（OPENAI_API_BASE / DEEPL_SERVER_URL でモックサーバーにも向けられる）
+      dummy : API を呼ばずに原文に _GPT / _Deepl を付けて返す
+    """
+    mode = mode or os.getenv("TRANSLATOR_PROVIDER", "sdk")
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    deepl_api_key = os.getenv("DEEPL_API_KEY")
+
+    if mode == "sdk":
+        return (OpenAIProvider(openai_api_key, model, os.getenv("OPENAI_API_BASE")),
+                DeepLProvider(deepl_api_key, os.getenv("DEEPL_SERVER_URL")))
+    if mode == "http":
+        return (HttpChatProvider(openai_api_key, model, os.getenv("OPENAI_API_BASE", OPENAI_API_BASE)),
+                HttpDeepLProvider(deepl_api_key, os.getenv("DEEPL_SERVER_URL", DEEPL_SERVER_URL)))
+    if mode == "dummy":
+        return DummyChatProvider(model), DummyDeepLProvider()
+    raise ValueError(f"Unknown provider mode: {mode}")
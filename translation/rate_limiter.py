@@ -0,0 +1,190 @@
+# -*- coding:utf-8 -*-
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# 再試行の既定値（1, 2, 4, 8... 秒を上限 60 秒まで、ジッター付きで待つ）
+MAX_RETRIES = 6
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+
+class AdaptiveRateLimiter:
+    """
+    プロバイダーごとのトークンバケット
+    成功するたびに少しずつ速度を上げ、429 が返ってきたら半分に落として Retry-After の間は止める（AIMD）
+    並行翻訳の各スレッドから共有して使う
+    clock と sleep は試験で時計を差し替えるためのもの
+    """
+
+    def __init__(self, rate, max_rate=None, min_rate=0.1, burst=None, increase=0.05,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.max_rate = float(max_rate if max_rate is not None else rate)
+        self.min_rate = float(min_rate)
+        self.increase = float(increase)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # 1 リクエスト分のトークンが貯まるまで待つ
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    elapsed = now - max(self._updated, self._blocked_until)
+                    self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._blocked_until = max(self._blocked_until, self._clock() + pause)
+
+
+class UnlimitedRateLimiter:
+    """
+    待たずにすぐ通すリミッター（API を呼ばない dummy プロバイダー用。AdaptiveRateLimiter と同じ呼び方ができる）
+    """
+
+    def acquire(self):
+        pass
+
+    def on_success(self):
+        pass
+
+    def on_rate_limited(self, retry_after=None):
+        pass
+
+
+def limiter_for(provider, rate, max_rate=None):
+    """
+    プロバイダー用のリミッターを返す関数（ネットワークを使わないプロバイダーには制限をかけない）
+    オフラインの試運転やベンチマークで、リミッターの待ち時間ではなくパイプラインの速さを測れるようにする
+    """
+    if not getattr(provider, "network", True):
+        return UnlimitedRateLimiter()
+    return AdaptiveRateLimiter(rate, max_rate=max_rate)
+
+
+def parse_retry_after(value):
+    """
+    Retry-After ヘッダーの値（秒数 または HTTP の日付）を待ち秒数にする関数
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _header(headers, name):
+    if not headers:
+        return None
+    for key, value in dict(headers).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _class_names(e):
+    return {cls.__name__ for cls in type(e).__mro__}
+
+
+def _classify_http_error(e):
+    # providers.ProviderHTTPError（SDK を使わない http モード）は HTTP のステータスで判定する
+    status = getattr(e, "status", None)
+    rate_limited = status == 429
+    retryable = rate_limited or (status is not None and status >= 500)
+    return retryable, rate_limited, parse_retry_after(_header(getattr(e, "headers", None), "retry-after"))
+
+
+def classify_openai_error(e):
+    """
+    OpenAI SDK の例外を (再試行するか, 429 か, Retry-After 秒) に分類する関数
+    SDK を import しなくて済むように、例外クラスの名前で判定する
+    """
+    names = _class_names(e)
+    if "ProviderHTTPError" in names:
+        return _classify_http_error(e)
+    rate_limited = "RateLimitError" in names
+    retryable = rate_limited or bool(names & {
+        "APIError", "Timeout", "APITimeoutError", "APIConnectionError",
+        "ServiceUnavailableError", "InternalServerError", "TryAgain",
+    })
+    # 401 や 400 などのリクエスト自体の誤りは再試行しない
+    if names & {"AuthenticationError", "InvalidRequestError", "BadRequestError", "PermissionError", "PermissionDeniedError"}:
+        retryable = False
+    headers = getattr(e, "headers", None)
+    if headers is None and getattr(e, "response", None) is not None:
+        headers = getattr(e.response, "headers", None)
+    return retryable, rate_limited, parse_retry_after(_header(headers, "retry-after"))
+
+
+def classify_deepl_error(e):
+    """
+    DeepL SDK の例外を (再試行するか, 429 か, Retry-After 秒) に分類する関数
+    """
+    names = _class_names(e)
+    if "ProviderHTTPError" in names:
+        return _classify_http_error(e)
+    rate_limited = "TooManyRequestsException" in names
+    retryable = rate_limited or "ConnectionException" in names or bool(getattr(e, "should_retry", False))
+    return retryable, rate_limited, None
+
+
+def call_with_retry(func, limiter, classify, max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY,
+                    sleep=time.sleep):
+    """
+    レートリミッターでペースを守りながら func() を呼び出し、失敗したら再試行する関数
+    429 は Retry-After に従い、それ以外の一時的なエラーはジッター付きの指数バックオフで待つ
+    再試行できないエラーか、回数を使い切ったら最後の例外をそのまま投げる
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            result = func()
+        except Exception as e:
+            retryable, rate_limited, retry_after = classify(e)
+            if rate_limited:
+                limiter.on_rate_limited(retry_after)
+            if not retryable or attempt >= max_retries:
+                raise
+            if retry_after is not None:
+                # 待ち時間はリミッター側で止めているので、一斉に再開しないように少しずらすだけ
+                delay = random.uniform(0, base_delay)
+            else:
+                delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            print(f"Retrying after error ({attempt + 1}/{max_retries}): {str(e)}")
+            sleep(delay)
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+
+import re
+
+# unicodedata.name() に "CJK UNIFIED" / "HIRAGANA" / "KATAKANA" を含む文字の範囲（Unicode 14.0 で生成）
+# 以前の contains_japanese と同じ文字を日本語として扱う
+JAPANESE_RANGES = [
+    (0x3041, 0x3096),    # ひらがな
+    (0x3099, 0x30FF),    # 濁点・半濁点、カタカナ、長音記号、中点
+    (0x31F0, 0x31FF),    # カタカナ拡張（小書き）
+    (0x32D0, 0x32FE),    # 丸囲みカタカナ
+    (0x3400, 0x4DBF),    # CJK 統合漢字拡張 A
+    (0x4E00, 0x9FFF),    # CJK 統合漢字
+    (0xFF65, 0xFF9F),    # 半角カタカナ
+    (0x1AFF0, 0x1AFF3),
+    (0x1AFF5, 0x1AFFB),
+    (0x1AFFD, 0x1AFFE),
+    (0x1B000, 0x1B001),  # 変体仮名など
+    (0x1B11F, 0x1B122),
+    (0x1B150, 0x1B152),
+    (0x1B164, 0x1B167),
+    (0x1F200, 0x1F202),  # 囲みひらがな
+    (0x1F210, 0x1F23B),  # 囲み漢字
+    (0x1F240, 0x1F248),
+    (0x20000, 0x2A6DF),  # CJK 統合漢字拡張 B 以降
+    (0x2A700, 0x2B738),
+    (0x2B740, 0x2B81D),
+    (0x2B820, 0x2CEA1),
+    (0x2CEB0, 0x2EBE0),
+    (0x30000, 0x3134A),
+]
+
+# 中国語リソースの判定に使っていた [一-鿿]（CJK 統合漢字）
+CHINESE_RANGES = [(0x4E00, 0x9FFF)]
+
+# ハングル（字母、互換字母、音節）
+KOREAN_RANGES = [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)]
+
+
+def _char_class(ranges):
+    return "[" + "".join(f"{re.escape(chr(start))}-{re.escape(chr(end))}" for start, end in ranges) + "]"
+
+
+JAPANESE_RE = re.compile(_char_class(JAPANESE_RANGES))
+CHINESE_RE = re.compile(_char_class(CHINESE_RANGES))
+KOREAN_RE = re.compile(_char_class(KOREAN_RANGES))
+# 未翻訳の目安にする英字
+LATIN_RE = re.compile(r'[A-Za-z]')
+
+
+def contains_japanese(text):
+    # unicodedata.name() と違い、名前の無い制御文字などがあっても例外にならない
+    return JAPANESE_RE.search(text) is not None
+
+
+def contains_chinese(text):
+    return CHINESE_RE.search(text) is not None
+
+
+def contains_korean(text):
+    return KOREAN_RE.search(text) is not None
+
+
+def japanese_ratio(text):
+    """
+    日本語の文字数 / (日本語の文字数 + 英字の数) を返す関数
+    1.0 なら翻訳済み、0.0 なら未翻訳、その間は英語が混じった翻訳（どちらも無ければ 0.0）
+    """
+    japanese = len(JAPANESE_RE.findall(text))
+    latin = len(LATIN_RE.findall(text))
+    if japanese + latin == 0:
+        return 0.0
+    return japanese / (japanese + latin)
+
+
+def classify_column(values):
+    """
+    列（文字列のリスト）をまとめて判定し、行ごとに (日本語を含むか, japanese_ratio) のリストを返す関数
+    """
+    search = JAPANESE_RE.search
+    return [(search(value) is not None, japanese_ratio(value)) for value in values]
@@ -0,0 +1,243 @@
+# -*- coding:utf-8 -*-
+
+import csv
+import os
+import posixpath
+import re
+import sys
+import time
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from script_detect import contains_japanese
+
+# 翻訳作業の表（日本語ローカライズ_v3.17.2.xlsx や WIP_ini.csv）を 1 行ずつ読み込む
+# xlsx は zip の中の XML を iterparse で流し読みするので、シート全体をメモリに載せない（共有文字列の表だけは読み込む）
+
+# 見出しの名前（小文字で比べる）。見出しの行が無い表は XLSX_COLUMNS / CSV_COLUMNS の位置を使う
+COLUMN_NAMES = {
+    "key": ("key", "id", "キー"),
+    "source": ("source", "english", "en", "original", "英語", "原文"),
+    "translation": ("translation", "japanese", "ja", "日本語", "翻訳", "訳"),
+}
+# 日本語ローカライズ_*.xlsx は見出しが無く、A 列が key、B 列が英語、C 列が日本語訳
+XLSX_COLUMNS = {"key": "A", "source": "B", "translation": "C"}
+# WIP_ini.csv は 3 列目が key、4 列目が訳（1 行目は見出し）
+CSV_COLUMNS = {"key": 2, "translation": 3}
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+CELL_REF_RE = re.compile(r'([A-Z]+)')
+
+
+def column_index(column):
+    """
+    列の指定（"A" のような列名か 0 始まりの番号）を 0 始まりの番号にする関数
+    """
+    if isinstance(column, int):
+        return column
+    index = 0
+    for letter in column.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _string_item_text(element):
+    # ふりがな（rPh）を除いた <t> をつなげる
+    parts = []
+    for child in element:
+        if child.tag == MAIN_NS + 't':
+            parts.append(child.text or "")
+        elif child.tag == MAIN_NS + 'r':
+            parts.extend(t.text or "" for t in child.iter(MAIN_NS + 't'))
+    return "".join(parts)
+
+
+def read_shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as file:
+        for _, element in iterparse(file):
+            if element.tag == MAIN_NS + 'si':
+                strings.append(_string_item_text(element))
+                element.clear()
+    return strings
+
+
+def find_sheet_path(archive, sheet=None):
+    """
+    シート名（省略時は最初のシート）から zip の中のワークシートのパスを返す関数
+    """
+    with archive.open('xl/workbook.xml') as file:
+        sheets = [(element.get('name'), element.get(REL_NS + 'id'))
+                  for _, element in iterparse(file) if element.tag == MAIN_NS + 'sheet']
+    if not sheets:
+        raise ValueError("ワークシートがありません")
+    if sheet is None:
+        rel_id = sheets[0][1]
+    else:
+        matched = [rel_id for name, rel_id in sheets if name == sheet]
+        if not matched:
+            raise ValueError(f"シート {sheet} がありません（{', '.join(name for name, _ in sheets)}）")
+        rel_id = matched[0]
+    with archive.open('xl/_rels/workbook.xml.rels') as file:
+        targets = {element.get('Id'): element.get('Target')
+                   for _, element in iterparse(file) if element.tag == PACKAGE_REL_NS + 'Relationship'}
+    target = targets[rel_id]
+    return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+
+def _cell_value(cell, shared_strings):
+    cell_type = cell.get('t')
+    if cell_type == 'inlineStr':
+        inline = cell.find(MAIN_NS + 'is')
+        return _string_item_text(inline) if inline is not None else ""
+    value = cell.find(MAIN_NS + 'v')
+    if value is None or value.text is None:
+        return ""
+    if cell_type == 's':
+        return shared_strings[int(value.text)]
+    if cell_type == 'b':
+        return "TRUE" if value.text == '1' else "FALSE"
+    return value.text
+
+
+def iter_xlsx_rows(path, sheet=None):
+    """
+    xlsx のシートを 1 行ずつ文字列のリストで返すジェネレーター（空のセルは空文字で埋める）
+    """
+    with zipfile.ZipFile(path) as archive:
+        shared_strings = read_shared_strings(archive)
+        with archive.open(find_sheet_path(archive, sheet)) as file:
+            row = []
+            sheet_data = None
+            for event, element in iterparse(file, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == MAIN_NS + 'sheetData':
+                        sheet_data = element
+                elif element.tag == MAIN_NS + 'c':
+                    reference = CELL_REF_RE.match(element.get('r') or "")
+                    index = column_index(reference.group(1)) if reference else len(row)
+                    row.extend([""] * (index + 1 - len(row)))
+                    row[index] = _cell_value(element, shared_strings)
+                    element.clear()
+                elif element.tag == MAIN_NS + 'row':
+                    yield row
+                    row = []
+                    # 読み終わった行は木から外して、メモリに溜めない
+                    element.clear()
+                    if sheet_data is not None:
+                        sheet_data.remove(element)
+
+
+def iter_csv_rows(path, encoding='utf-8-sig'):
+    with open(path, 'r', encoding=encoding, newline='') as file:
+        yield from csv.reader(file)
+
+
+def iter_rows(path, sheet=None):
+    if path.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(path, sheet)
+    return iter_csv_rows(path)
+
+
+def is_sheet_path(path):
+    return isinstance(path, str) and path.lower().endswith(('.xlsx', '.csv'))
+
+
+def resolve_columns(first_row, columns=None, default=None):
+    """
+    {"key": 列, ...} を {"key": 0 始まりの番号, ...} にして、(列の番号, 1 行目が見出しか) を返す関数
+    列は見出しの名前・列名（"A"）・番号のどれでもよい。columns を省略すると見出しを COLUMN_NAMES で探し、
+    見出しが無ければ default の位置を使う
+    """
+    header = [cell.strip().lower() for cell in first_row]
+    if columns is None:
+        found = {field: header.index(name) for field, names in COLUMN_NAMES.items()
+                 for name in names if name in header}
+        if "key" in found and "translation" in found:
+            return found, True
+        return {field: column_index(column) for field, column in default.items()}, False
+
+    indexes = {}
+    has_header = False
+    for field, column in columns.items():
+        if isinstance(column, str) and column.strip().lower() in header:
+            indexes[field] = header.index(column.strip().lower())
+            has_header = True
+        elif isinstance(column, int) or re.fullmatch(r'[A-Za-z]{1,3}', column):
+            indexes[field] = column_index(column)
+        else:
+            raise ValueError(f"列 {column} が見出しにありません")
+    return indexes, has_header
+
+
+def iter_entries(path, columns=None, sheet=None, header=None):
+    """
+    表を 1 行ずつ読み、{"key": ..., "source": ..., "translation": ...} を返すジェネレーター
+    （columns に無い項目は入れない。key が空の行は飛ばす）
+    header は 1 行目が見出しか（省略時は見出しの名前が見つかったときと CSV のとき）
+    """
+    default = XLSX_COLUMNS if path.lower().endswith('.xlsx') else CSV_COLUMNS
+    rows = iter_rows(path, sheet)
+    first_row = next(rows, None)
+    if first_row is None:
+        return
+    indexes, has_header = resolve_columns(first_row, columns, default)
+
+    def entry(row):
+        return {field: row[index] if index < len(row) else "" for field, index in indexes.items()}
+
+    if header is None:
+        header = has_header or not path.lower().endswith('.xlsx')
+    if not header:
+        rows = _chain_first(first_row, rows)
+    for row in rows:
+        values = entry(row)
+        if values.get("key"):
+            yield values
+
+
+def _chain_first(first_row, rows):
+    yield first_row
+    yield from rows
+
+
+def read_sheet_translations(path, columns=None, sheet=None):
+    """
+    表から日本語になっている訳を {key: 訳} で読み込む関数（fuzzy_tm.read_translations や merge から使う）
+    """
+    translations = {}
+    for values in iter_entries(path, columns, sheet):
+        translation = values.get("translation", "")
+        if translation and translation != values.get("source") and contains_japanese(translation):
+            translations[values["key"]] = translation
+    return translations
+
+
+def iter_sheet_pairs(path, columns=None, sheet=None):
+    """
+    英語原文の列がある表から (英語原文, 日本語訳) を 1 組ずつ返すジェネレーター（過去の訳の索引に入れる）
+    """
+    for values in iter_entries(path, columns, sheet):
+        source = values.get("source", "")
+        translation = values.get("translation", "")
+        if source and translation and source != translation and contains_japanese(translation):
+            yield source, translation
+
+
+# 使い方: python sheet_import.py [xlsx か csv]
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python sheet_import.py [xlsx か csv]")
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        if not os.path.exists(path):
+            print(f"File {path} does not exist!")
+            continue
+        start = time.perf_counter()
+        rows = sum(1 for _ in iter_entries(path))
+        pairs = sum(1 for _ in iter_sheet_pairs(path))
+        print(f"{path}: rows {rows}, pairs {pairs}, {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+
+# pyahocorasick があれば C 実装のオートマトンを使う（無ければ Python 実装）
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(script_dir, '..', 'cache')
+
+# キャッシュの形式を変えたら上げる（2: out にキーワードの長さを入れる）
+CACHE_FORMAT = 2
+
+
+def keywords_hash(keywords):
+    joined = "\n".join(sorted(keywords))
+    return hashlib.sha256(joined.encode('utf-8')).hexdigest()
+
+
+def _build_automaton(keywords):
+    # goto: 状態ごとの {文字: 次の状態}, fail: 失敗遷移
+    # out: その状態で終わるキーワードのうち一番長いものの長さ（終わるキーワードが無ければ 0）
+    goto = [{}]
+    terminal = [0]
+    for keyword in keywords:
+        state = 0
+        for char in keyword:
+            nxt = goto[state].get(char)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][char] = nxt
+                goto.append({})
+                terminal.append(0)
+            state = nxt
+        terminal[state] = len(keyword)
+
+    fail = [0] * len(goto)
+    out = terminal[:]
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and char not in goto[f]:
+                f = fail[f]
+            fail_state = goto[f].get(char, 0)
+            # ルート直下の状態は自分自身に戻らないようにする
+            fail[nxt] = fail_state if fail_state != nxt else 0
+            out[nxt] = out[nxt] or out[fail[nxt]]
+    return goto, fail, out
+
+
+class KeyFilter:
+    """
+    「key の中にキーワードのどれかが含まれているか」を判定するフィルタ
+    any(keyword in key for keyword in keywords) と同じ結果を、キーワード数に依存しない時間で返す
+    完全一致はハッシュセット、部分一致は Aho-Corasick オートマトンで判定する
+    """
+
+    def __init__(self, keywords, automaton=None):
+        self.exact = frozenset(keywords or ())
+        self._match_all = "" in self.exact
+        self._min_len = min((len(k) for k in self.exact), default=0)
+        self._native = None
+        self._goto = self._fail = self._out = None
+
+        if automaton is not None:
+            self._goto, self._fail, self._out = automaton
+        elif ahocorasick is not None and self.exact:
+            self._native = ahocorasick.Automaton()
+            for keyword in self.exact:
+                if keyword:
+                    self._native.add_word(keyword, len(keyword))
+            self._native.make_automaton()
+        else:
+            self._goto, self._fail, self._out = _build_automaton(self.exact)
+
+    def matches(self, key):
+        if self._match_all or key in self.exact:
+            return True
+        if len(key) < self._min_len or not self.exact:
+            return False
+        if self._native is not None:
+            return next(self._native.iter(key), None) is not None
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in key:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                return True
+        return False
+
+    __contains__ = matches
+
+    def iter_matches(self, text):
+        """
+        text の中で見つかったキーワードを (終わりの位置の次, 長さ) で返すジェネレーター（用語集で使う）
+        Python 実装では、同じ位置で終わるキーワードのうち一番長いものだけを返す
+        """
+        if not self.exact:
+            return
+        if self._native is not None:
+            for end, length in self._native.iter(text):
+                yield end + 1, length
+            return
+
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                yield i + 1, out[state]
+
+
+def load_or_build_filter(keywords, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    キーワードの集合から KeyFilter を作る関数
+    Python 実装のオートマトンはキーワード集合のハッシュをキーにしてディスクに保存し、次回以降は再利用する
+    """
+    keywords = frozenset(keywords or ())
+    if ahocorasick is not None or not keywords:
+        return KeyFilter(keywords)
+
+    cache_path = os.path.join(cache_dir, f'skip_filter_{keywords_hash(keywords)[:16]}.marshal')
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as file:
+                version, automaton = marshal.load(file)
+            if version == CACHE_FORMAT:
+                return KeyFilter(keywords, automaton)
+        except Exception as e:
+            print(f"Error reading {cache_path}: {str(e)}")
+
+    key_filter = KeyFilter(keywords)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 複数のプロセスが同時に書いても混ざらないよう、書き手ごとに別の一時ファイルに書いてから置き換える
+        with tempfile.NamedTemporaryFile(dir=cache_dir, prefix=os.path.basename(cache_path) + '.',
+                                         suffix='.tmp', delete=False) as file:
+            tmp_path = file.name
+            marshal.dump((CACHE_FORMAT, (key_filter._goto, key_filter._fail, key_filter._out)), file)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Error writing {cache_path}: {str(e)}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return key_filter
+
+
+# ベンチマーク：ファイル中の key の半分をスキップ対象にして、フィルタのコストを従来の any(...) と比べる
+if __name__ == '__main__':
+    ini_path = sys.argv[1] if len(sys.argv) >= 2 else os.path.join(script_dir, '..', 'Japanese.pak', 'global.ini')
+    with open(ini_path, 'r', encoding='utf-8-sig') as file:
+        keys = [line.split('=', 1)[0] for line in file if '=' in line]
+    keywords = keys[::2]  # 半分をスキップ対象にする
+    print(f"keys: {len(keys)}, keywords: {len(keywords)}")
+
+    start = time.perf_counter()
+    key_filter = KeyFilter(keywords)
+    print(f"build: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    new_result = [key_filter.matches(key) for key in keys]
+    print(f"indexed filter: {time.perf_counter() - start:.3f}s")
+
+    # 従来の any(...) は全件だと時間がかかりすぎるので、先頭の一部だけ測って全体に換算する
+    sample = keys[:1000]
+    start = time.perf_counter()
+    old_result = [any(keyword in key for keyword in keywords) for key in sample]
+    elapsed = time.perf_counter() - start
+    print(f"substring scan: {elapsed:.3f}s for {len(sample)} keys (~{elapsed * len(keys) / len(sample):.1f}s for all)")
+    print("same result:", old_result == new_result[:len(sample)])
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+
+import re
+from bisect import bisect_left, insort
+
+# tiktoken があればモデルと同じ BPE でトークン数を数える（無ければ近似）
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# JSON バッチで 1 項目ごとに増えるトークン数（{"id": 12, "text": "..."}, の分）
+ITEM_OVERHEAD_TOKENS = 10
+
+# 近似用：英単語は 6 文字ごとに 1 トークン、数字は 3 桁ごと、記号と英語以外の文字は 1 文字 1 トークンとして数える
+# （cl100k_base で英語のリソース文を数えたときの傾向に合わせた係数）
+_piece_re = re.compile(r'[A-Za-z]+|\d+|\S')
+CHARS_PER_WORD_TOKEN = 6
+DIGITS_PER_TOKEN = 3
+
+_encodings = {}
+
+
+def _get_encoding(model):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+
+def approximate_tokens(text):
+    count = 0
+    for piece in _piece_re.findall(text):
+        if piece[0].isdigit():
+            count += -(-len(piece) // DIGITS_PER_TOKEN)
+        elif piece.isascii() and piece[0].isalpha():
+            count += -(-len(piece) // CHARS_PER_WORD_TOKEN)
+        else:
+            count += 1
+    return count
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    文章のトークン数を返す関数（tiktoken が無い環境では近似値）
+    """
+    if tiktoken is not None:
+        return len(_get_encoding(model).encode(text))
+    return approximate_tokens(text)
+
+
+def pack_batches(sizes, limit, max_items=None):
+    """
+    各項目のトークン数のリストを受け取り、合計が limit 以下になるようにバッチに詰める関数
+    大きい順に、残り容量が一番少なくて収まるバッチへ入れる（best-fit decreasing）
+    各バッチは項目のインデックスのリスト（元の順番に並べ直したもの）で返す
+    limit を超える項目は 1 件だけのバッチにする
+    """
+    batches = []
+    # (残り容量, バッチ番号) を残り容量の小さい順に並べておく
+    open_bins = []
+
+    for index in sorted(range(len(sizes)), key=lambda i: sizes[i], reverse=True):
+        size = sizes[index]
+        if size > limit:
+            batches.append([index])
+            continue
+
+        position = bisect_left(open_bins, (size, -1))
+        if position < len(open_bins):
+            remaining, bin_id = open_bins.pop(position)
+        else:
+            remaining, bin_id = limit, len(batches)
+            batches.append([])
+
+        batches[bin_id].append(index)
+        remaining -= size
+        if remaining > 0 and (max_items is None or len(batches[bin_id]) < max_items):
+            insort(open_bins, (remaining, bin_id))
+
+    return [sorted(batch) for batch in batches]
@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# 翻訳メモリの既定の保存先（リポジトリ直下の cache フォルダ。環境変数 TRANSLATION_MEMORY_PATH で変えられる）
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TM_PATH = os.path.join(script_dir, '..', 'cache', 'translation_memory.sqlite3')
+
+
+def source_hash(text):
+    # マスク済みの原文をそのままハッシュ化してキーにする
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def prompt_version(prompt, model=""):
+    # プロンプトやモデルを変えたら別物として扱うための短い識別子
+    return hashlib.sha256(f"{model}\n{prompt}".encode('utf-8')).hexdigest()[:12]
+
+
+class TranslationMemory:
+    """
+    マスク済みの原文 → 翻訳結果 を SQLite に保存する翻訳メモリ
+    プロバイダーとプロンプトのバージョンごとに別の訳として保持する
+    db_path を省略すると、作ったときの環境変数 TRANSLATION_MEMORY_PATH、無ければ DEFAULT_TM_PATH を使う
+    """
+
+    def __init__(self, db_path=None):
+        db_path = db_path or os.getenv("TRANSLATION_MEMORY_PATH") or DEFAULT_TM_PATH
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        # 並行翻訳のスレッドから呼ばれるので、接続を共有してロックで守る
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS tm ('
+                ' source_hash TEXT NOT NULL,'
+                ' target_lang TEXT NOT NULL,'
+                ' provider TEXT NOT NULL,'
+                ' prompt_version TEXT NOT NULL,'
+                ' source TEXT NOT NULL,'
+                ' translation TEXT NOT NULL,'
+                ' updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (source_hash, target_lang, provider, prompt_version))'
+            )
+            self._conn.commit()
+
+    def get(self, text, target_lang, provider, version=""):
+        # 並行翻訳のスレッドから呼ばれるので、ヒット数・ミス数もロックの中で数える
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT translation FROM tm WHERE source_hash=? AND target_lang=? AND provider=? AND prompt_version=?',
+                (source_hash(text), target_lang, provider, version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, text, translation, target_lang, provider, version=""):
+        # 失敗した翻訳（空文字）はキャッシュしない
+        if not translation:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tm VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (source_hash(text), target_lang, provider, version, text, translation, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
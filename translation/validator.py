@@ -0,0 +1,167 @@
+# -*- coding:utf-8 -*-
+
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from chunk_pipeline import shard_records
+from ini_stream import BOM, iter_ini_records_many
+
+# 翻訳後も原文と同じ数だけ残っていないといけないトークン（名前, 先頭の文字, 正規表現）
+# 先頭の文字がどちらの文にも無ければ正規表現を走らせない
+TOKEN_CHECKS = [
+    ("function", "~", re.compile(r'~\w+\([^)\n]*\)')),          # ~mission(Contractor), ~action(player|xi_movey)
+    ("format", "%", re.compile(r'%[A-Za-z][A-Za-z0-9]*')),      # %s, %ls, %Is
+    ("tag", "<", re.compile(r'<[^<>\n]{1,40}>')),               # <EM4>, </font>, <-=MISSING=->
+]
+# 改行記号（\n の 2 文字）
+NEWLINE_TOKEN = "\\n"
+# マスクに使った記号が戻らずに残っているもの（" #0 " と前後の空白が落ちた "#0"、"<0>", " |~ ", "PLACEHOLDER_0"）
+# 原文にも同じ数だけある記号（"Rank #1" など）は残っていてよい
+LEFTOVER_MASK_RE = re.compile(r'#\d+|<\d+>|\|~|PLACEHOLDER_\d+')
+# タブ以外の制御文字と、デコードできなかった文字（U+FFFD）、途中に紛れ込んだ BOM
+BAD_CHAR_RE = re.compile('[\x00-\x08\x0b-\x1f\x7f�' + BOM + ']')
+
+
+def check_value(source, translated):
+    """
+    1 行分の原文と訳を照合して、問題の種類のリストを返す関数（問題が無ければ空のリスト）
+    """
+    problems = []
+    for name, first_char, token_re in TOKEN_CHECKS:
+        if first_char not in source and first_char not in translated:
+            continue
+        source_tokens = token_re.findall(source)
+        translated_tokens = token_re.findall(translated)
+        # 順番まで同じならそのまま通す（順番が入れ替わっただけなら数を比べる）
+        if source_tokens != translated_tokens and Counter(source_tokens) != Counter(translated_tokens):
+            problems.append(name)
+    if source.count(NEWLINE_TOKEN) != translated.count(NEWLINE_TOKEN):
+        problems.append("newline")
+    leftover = LEFTOVER_MASK_RE.findall(translated)
+    if leftover and Counter(leftover) != Counter(LEFTOVER_MASK_RE.findall(source)):
+        problems.append("leftover-mask")
+    if BAD_CHAR_RE.search(translated) and not BAD_CHAR_RE.search(source):
+        problems.append("encoding")
+    return problems
+
+
+def _check_chunk(items):
+    failures = []
+    for key, source, translated in items:
+        problems = check_value(source, translated)
+        if problems:
+            failures.append((key, problems))
+    return failures
+
+
+def check_encoding(path):
+    """
+    ファイルが UTF-8 として読めるか確かめ、読めない行の (行番号, 理由) のリストを返す関数
+    """
+    errors = []
+    with open(path, 'rb') as file:
+        for line_number, raw_line in enumerate(file, 1):
+            try:
+                raw_line.decode('utf-8')
+            except UnicodeDecodeError as e:
+                errors.append((line_number, str(e)))
+    return errors
+
+
+def read_records(path):
+    """
+    {key: value} と、2 回以上出てくる key のリストを返す関数
+    """
+    values = {}
+    duplicates = []
+    for key, value, _ in iter_ini_records_many(path):
+        if key is None:
+            continue
+        if key in values:
+            duplicates.append(key)
+        values[key] = value
+    return values, duplicates
+
+
+def validate_files(source_path, translated_path, workers=None, chunks_per_worker=4):
+    """
+    英語原文と翻訳済みファイルを照合して結果の辞書を返す関数
+      missing / extra : 片方にしか無い key
+      duplicates      : 翻訳済みファイルで 2 回以上出てくる key
+      encoding        : UTF-8 として読めない行 [(行番号, 理由)]
+      failures        : {key: [問題の種類]}（原文の順番）
+    行ごとの照合は連続した塊に分けてプロセスプールで並列に行う
+    """
+    report = {"missing": [], "extra": [], "duplicates": [], "encoding": check_encoding(translated_path), "failures": {}}
+    if report["encoding"]:
+        # 読めないファイルは行ごとの照合ができない
+        return report
+
+    sources, _ = read_records(source_path)
+    translations, report["duplicates"] = read_records(translated_path)
+    report["missing"] = [key for key in sources if key not in translations]
+    report["extra"] = [key for key in translations if key not in sources]
+
+    items = [(key, source, translations[key]) for key, source in sources.items()
+             if key in translations and translations[key] != source]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(items) < workers * 1000:
+        failures = _check_chunk(items)
+    else:
+        failures = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_failures in executor.map(_check_chunk, shard_records(items, workers * chunks_per_worker)):
+                failures.extend(chunk_failures)
+    report["failures"] = dict(failures)
+    return report
+
+
+def failing_keys(report):
+    """
+    翻訳し直すべき key（訳が無い key と照合に失敗した key）のリストを返す関数
+    """
+    return report["missing"] + [key for key in report["failures"] if key not in report["missing"]]
+
+
+def write_failing_keys(keys, path):
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        for key in keys:
+            file.write(key + "\n")
+
+
+def read_failing_keys(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.rstrip('\n') for line in file if line.strip()]
+
+
+def print_report(report, limit=20):
+    counts = Counter(problem for problems in report["failures"].values() for problem in problems)
+    print(f"missing: {len(report['missing'])}, extra: {len(report['extra'])}, "
+          f"duplicates: {len(report['duplicates'])}, encoding errors: {len(report['encoding'])}, "
+          f"failed: {len(report['failures'])}")
+    for problem, count in counts.most_common():
+        print(f"  {problem}: {count}")
+    for line_number, reason in report["encoding"][:limit]:
+        print(f"encoding\tline {line_number}\t{reason}")
+    for key, problems in list(report["failures"].items())[:limit]:
+        print(f"{','.join(problems)}\t{key}")
+
+
+# 使い方: python validator.py [英語原文] [翻訳済みファイル] [翻訳し直す key の書き出し先]
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python validator.py [英語原文] [翻訳済みファイル] [failed_keys.txt]")
+        sys.exit(1)
+    start = time.perf_counter()
+    result = validate_files(sys.argv[1], sys.argv[2])
+    print_report(result)
+    print(f"{time.perf_counter() - start:.3f}s")
+    if len(sys.argv) >= 4:
+        write_failing_keys(failing_keys(result), sys.argv[3])
+    sys.exit(1 if failing_keys(result) or result["extra"] or result["encoding"] else 0)
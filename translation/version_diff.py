@@ -0,0 +1,146 @@
+# -*- coding:utf-8 -*-
+
+import glob
+import os
+import re
+import sys
+
+from chunk_pipeline import find_split_files
+from fuzzy_tm import read_translations
+from ini_stream import read_ini_dict
+from script_detect import contains_japanese
+from sheet_import import is_sheet_path
+from version_store import find_version_source, iter_version_items
+
+# 前バージョンの英語原文と翻訳済みファイルの名前
+PREVIOUS_EN_NAME = 'global_en.ini.txt'
+PREVIOUS_JA_NAME = 'translated_global.ini.txt'
+# このツールで書き出した訳が無いときに使う、リポジトリにある日本語訳
+#   v3.16.1: 分割済みの global_ja_00, global_ja_01 ...
+#   v3.15.0u: global_ja.txt（key<TAB>訳）
+#   v3.17.2: 日本語ローカライズ_*.xlsx（A 列が key、B 列が英語、C 列が日本語訳）
+JA_SPLIT_FILE_RE = re.compile(r'^global_ja_(\d{2})$')
+JA_TXT_NAME = 'global_ja.txt'
+
+
+# txt ファイルを読み込み（BOM を key に含めないように ini_stream で読む）
+def read_txt_as_dict(txt_path):
+    return read_ini_dict(txt_path)
+
+
+def diff_versions(new_dict, old_dict):
+    """
+    新旧の英語原文を比較して、key を added / removed / changed / unchanged に分類する関数
+    added, changed, unchanged は新しいファイルの順番、removed は古いファイルの順番で返す
+    """
+    diff = {"added": [], "removed": [], "changed": [], "unchanged": []}
+    for key, value in new_dict.items():
+        if key not in old_dict:
+            diff["added"].append(key)
+        elif old_dict[key] != value:
+            diff["changed"].append(key)
+        else:
+            diff["unchanged"].append(key)
+    diff["removed"] = [key for key in old_dict if key not in new_dict]
+    return diff
+
+
+def version_directory(version):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return version if os.path.isdir(version) else os.path.join(script_dir, '..', version)
+
+
+def find_previous_translation(previous_version, translated_name=PREVIOUS_JA_NAME):
+    """
+    前バージョンの訳のファイルを探す関数（無ければ None）
+    translated_name（このツールで書き出した訳）を優先し、既定の日本語訳のときだけ
+    分割済みの global_ja_00...、global_ja.txt、日本語ローカライズ_*.xlsx の順に探す
+    """
+    directory = version_directory(previous_version)
+    translated_path = os.path.join(directory, translated_name)
+    if os.path.exists(translated_path):
+        return translated_path
+    if translated_name != PREVIOUS_JA_NAME:
+        return None
+    split_paths = find_split_files(directory, JA_SPLIT_FILE_RE)
+    if split_paths:
+        return split_paths
+    txt_path = os.path.join(directory, JA_TXT_NAME)
+    if os.path.exists(txt_path):
+        return txt_path
+    sheets = sorted(glob.glob(os.path.join(directory, '*.xlsx')))
+    return sheets[0] if sheets else None
+
+
+def find_previous_sources(previous_version, translated_name=PREVIOUS_JA_NAME):
+    """
+    前バージョンの (英語原文, 訳) のファイルを返す関数（無いものは None、分割済みならファイルのリスト）
+    """
+    return (find_version_source(version_directory(previous_version)),
+            find_previous_translation(previous_version, translated_name))
+
+
+def load_previous_version(previous_version, translated_name=PREVIOUS_JA_NAME):
+    """
+    前バージョンの英語原文と訳（translated_name、既定は日本語訳）を読み込む関数
+    英語原文と同じ値（翻訳に失敗した・飛ばした行）は訳として引き継がず、次のパッチで翻訳し直す
+    リポジトリにある日本語訳（分割済み・global_ja.txt・xlsx）から読んだ訳は、さらに日本語になっているものだけを使う
+    どちらかが無ければ None を返す
+    """
+    en_source, ja_source = find_previous_sources(previous_version, translated_name)
+    if en_source is None or ja_source is None:
+        missing = PREVIOUS_EN_NAME if en_source is None else translated_name
+        print(f"File {os.path.join(version_directory(previous_version), missing)} does not exist!")
+        return None
+
+    old_en = dict(iter_version_items(en_source))
+    if isinstance(ja_source, str) and os.path.basename(ja_source) == translated_name:
+        return old_en, {key: value for key, value in read_txt_as_dict(ja_source).items()
+                        if value != old_en.get(key)}
+    translations = read_translations(ja_source)
+    return old_en, {key: value for key, value in translations.items()
+                    if value != old_en.get(key) and contains_japanese(value)}
+
+
+def fuzzy_references_for(previous_version, translated_name=PREVIOUS_JA_NAME):
+    """
+    前バージョンの訳を fuzzy_tm.build_fuzzy_index に渡す [(英語原文, 訳)] にする関数（無ければ空のリスト）
+    英語原文が表（xlsx）なら、表だけで (英語原文, 日本語訳) の組になる
+    """
+    en_source, ja_source = find_previous_sources(previous_version, translated_name)
+    if is_sheet_path(en_source):
+        return [(None, en_source)]
+    if en_source is None or ja_source is None:
+        return []
+    return [(en_source, ja_source)]
+
+
+def plan_incremental(new_dict, previous_version, translated_name=PREVIOUS_JA_NAME):
+    """
+    差分翻訳の計画を立てる関数
+    変わっていない key は前バージョンの訳（translated_name）を引き継ぎ、それ以外の key だけを翻訳対象として返す
+    戻り値は (引き継ぐ訳の辞書, 翻訳が必要な key の集合, diff)
+    """
+    previous = load_previous_version(previous_version, translated_name)
+    if previous is None:
+        return {}, set(new_dict), None
+
+    old_en, old_ja = previous
+    diff = diff_versions(new_dict, old_en)
+
+    carried = {key: old_ja[key] for key in diff["unchanged"] if key in old_ja}
+    # 原文は同じでも前バージョンで訳が無かったものは翻訳し直す
+    to_translate = set(new_dict) - set(carried)
+    return carried, to_translate, diff
+
+
+def print_diff_summary(diff):
+    for kind in ("added", "removed", "changed", "unchanged"):
+        print(f"{kind}: {len(diff[kind])}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python version_diff.py [新規リソース] [過去リソース]")
+    else:
+        print_diff_summary(diff_versions(read_txt_as_dict(sys.argv[1]), read_txt_as_dict(sys.argv[2])))
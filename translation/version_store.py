@@ -0,0 +1,267 @@
+# -*- coding:utf-8 -*-
+
+import glob
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import time
+from array import array
+
+from chunk_pipeline import find_split_files
+from ini_stream import iter_ini_records_many
+from sheet_import import iter_entries
+
+# 複数バージョンの英語原文を 1 つにまとめて持つ列指向のストア
+#   key は 1 回だけ持ち（key → 番号）、値も全バージョンで重複を除いた 1 つのプールに入れる
+#   バージョンごとには「key の番号 → 値の番号」の配列と、ファイルに出てくる key の順番の配列だけを持つ
+# 使用メモリはバージョン数 × 行数ではなく、異なる文字列の数に比例する
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(script_dir, '..', 'cache')
+
+# 保存形式を変えたら上げる
+CACHE_FORMAT = 1
+# その version に無い key の値の番号
+ABSENT = -1
+
+
+class VersionStore:
+    """
+    バージョン名 → {key: 値} を、共有の key 表と値のプールと整数の配列で持つ
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.pool = []
+        self.versions = []
+        self._key_ids = {}
+        self._pool_ids = {}
+        self._values = {}
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.versions)
+
+    def _intern_key(self, key):
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = self._key_ids[key] = len(self.keys)
+            self.keys.append(key)
+        return key_id
+
+    def _intern_value(self, value):
+        value_id = self._pool_ids.get(value)
+        if value_id is None:
+            value_id = self._pool_ids[value] = len(self.pool)
+            self.pool.append(value)
+        return value_id
+
+    def add_version(self, name, items):
+        """
+        (key, 値) を順番に受け取り、version として追加する関数（同じ名前なら置き換える）
+        """
+        if name in self._values:
+            self.versions.remove(name)
+        order = array('i')
+        values = array('i')
+        for key, value in items:
+            key_id = self._intern_key(key)
+            if key_id >= len(values):
+                values.extend([ABSENT] * (len(self.keys) - len(values)))
+            if values[key_id] == ABSENT:
+                order.append(key_id)
+            values[key_id] = self._intern_value(value)
+        self.versions.append(name)
+        self._values[name] = values
+        self._orders[name] = order
+
+    def _value_id(self, version, key_id):
+        values = self._values[version]
+        return values[key_id] if key_id < len(values) else ABSENT
+
+    def get(self, version, key, default=None):
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            return default
+        value_id = self._value_id(version, key_id)
+        return default if value_id == ABSENT else self.pool[value_id]
+
+    def keys_of(self, version):
+        # その version の key をファイルの順番で返す
+        return [self.keys[key_id] for key_id in self._orders[version]]
+
+    def to_dict(self, version):
+        values = self._values[version]
+        return {self.keys[key_id]: self.pool[values[key_id]] for key_id in self._orders[version]}
+
+    def history(self, key):
+        """
+        key の値の移り変わりを [(version, 値), ...] で返す関数（無かった version は None）
+        """
+        return [(version, self.get(version, key)) for version in self.versions]
+
+    def diff(self, new_version, old_version):
+        """
+        version_diff.diff_versions と同じ形の辞書を返す関数（値の番号どうしを比べるので文字列は比べない）
+        """
+        new_values = self._values[new_version]
+        diff = {"added": [], "removed": [], "changed": [], "unchanged": []}
+        for key_id in self._orders[new_version]:
+            old_value_id = self._value_id(old_version, key_id)
+            if old_value_id == ABSENT:
+                diff["added"].append(self.keys[key_id])
+            elif old_value_id != new_values[key_id]:
+                diff["changed"].append(self.keys[key_id])
+            else:
+                diff["unchanged"].append(self.keys[key_id])
+        diff["removed"] = [self.keys[key_id] for key_id in self._orders[old_version]
+                           if self._value_id(new_version, key_id) == ABSENT]
+        return diff
+
+    def changed_keys(self, new_version, old_version):
+        # 追加・変更された key（翻訳し直しが必要な key）
+        diff = self.diff(new_version, old_version)
+        return diff["added"] + diff["changed"]
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        data = (CACHE_FORMAT, self.keys, self.pool,
+                [(name, self._orders[name].tobytes(), self._values[name].tobytes()) for name in self.versions])
+        # 複数のプロセスが同時に書いても混ざらないよう、書き手ごとに別の一時ファイルに書いてから置き換える
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=directory, prefix=os.path.basename(path) + '.',
+                                             suffix='.tmp', delete=False) as file:
+                tmp_path = file.name
+                marshal.dump(data, file)
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        save() で書き出したストアを読み込む関数（形式が違えば None）
+        """
+        with open(path, 'rb') as file:
+            data = marshal.load(file)
+        if data[0] != CACHE_FORMAT:
+            return None
+        store = cls()
+        _, store.keys, store.pool, versions = data
+        store._key_ids = {key: key_id for key_id, key in enumerate(store.keys)}
+        store._pool_ids = {value: value_id for value_id, value in enumerate(store.pool)}
+        for name, order, values in versions:
+            store.versions.append(name)
+            store._orders[name] = array('i', order)
+            store._values[name] = array('i', values)
+        return store
+
+
+def find_version_source(path_or_version):
+    """
+    version フォルダの英語原文を探す関数（ファイルのパスならそのまま返す）
+    global_en.ini.txt、分割済みの global_en_00...、日本語ローカライズ_*.xlsx（B 列が英語）の順に探す。無ければ None
+    """
+    if os.path.isfile(path_or_version):
+        return path_or_version
+    directory = path_or_version if os.path.isdir(path_or_version) else os.path.join(script_dir, '..', path_or_version)
+    txt_path = os.path.join(directory, 'global_en.ini.txt')
+    if os.path.exists(txt_path):
+        return txt_path
+    split_paths = find_split_files(directory)
+    if split_paths:
+        return split_paths
+    sheets = sorted(glob.glob(os.path.join(directory, '*.xlsx')))
+    return sheets[0] if sheets else None
+
+
+def iter_version_items(source):
+    if isinstance(source, str) and source.lower().endswith('.xlsx'):
+        for values in iter_entries(source, {"key": "A", "source": "B"}):
+            yield values["key"], values["source"]
+        return
+    for key, value, _ in iter_ini_records_many(source):
+        if key is not None:
+            yield key, value
+
+
+def sources_hash(sources):
+    # ファイルのパス・大きさ・更新日時から作る（中身を読まずに古いキャッシュを見分ける）
+    parts = []
+    for name, source in sources:
+        for path in ([source] if isinstance(source, str) else source):
+            stat = os.stat(path)
+            parts.append(f"{name}\t{os.path.abspath(path)}\t{stat.st_size}\t{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
+
+
+def load_or_build_store(versions, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    version フォルダ名（かファイル）のリストから VersionStore を作る関数（英語原文が無い version は飛ばす）
+    同じファイルの組み合わせならキャッシュから読み込む
+    """
+    sources = []
+    for version in versions:
+        source = find_version_source(version)
+        if source is None:
+            print(f"{version} に英語原文がありません")
+            continue
+        sources.append((os.path.normpath(version), source))
+
+    cache_path = os.path.join(cache_dir, f'version_store_{sources_hash(sources)[:16]}.marshal')
+    if os.path.exists(cache_path):
+        try:
+            store = VersionStore.load(cache_path)
+            if store is not None:
+                return store
+        except Exception as e:
+            print(f"Error reading {cache_path}: {str(e)}")
+
+    store = VersionStore()
+    for name, source in sources:
+        store.add_version(name, iter_version_items(source))
+    try:
+        store.save(cache_path)
+    except Exception as e:
+        print(f"Error writing {cache_path}: {str(e)}")
+    return store
+
+
+# ベンチマーク: python version_store.py v3.15.0u v3.16.1 v3.17.2 [key]
+if __name__ == '__main__':
+    import tracemalloc
+
+    names = [arg for arg in sys.argv[1:] if os.path.isdir(os.path.join(script_dir, '..', arg)) or os.path.exists(arg)]
+    names = names or ['v3.15.0u', 'v3.16.1', 'v3.17.2']
+    lookup = [arg for arg in sys.argv[1:] if arg not in names]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    dicts = {name: dict(iter_version_items(find_version_source(name))) for name in names}
+    print(f"dict: {time.perf_counter() - start:.3f}s, {tracemalloc.get_traced_memory()[0] / 1e6:.1f}MB")
+    del dicts
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = VersionStore()
+    for name in names:
+        store.add_version(name, iter_version_items(find_version_source(name)))
+    print(f"store: {time.perf_counter() - start:.3f}s, {tracemalloc.get_traced_memory()[0] / 1e6:.1f}MB, "
+          f"keys {len(store.keys)}, unique values {len(store.pool)}")
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for new_name, old_name in zip(names[1:], names):
+        diff = store.diff(new_name, old_name)
+        print(f"{old_name} -> {new_name}: " + ", ".join(f"{kind} {len(keys)}" for kind, keys in diff.items()))
+    print(f"diff: {time.perf_counter() - start:.3f}s")
+    for key in lookup:
+        for version, value in store.history(key):
+            print(f"{version}\t{value}")